@@ -0,0 +1,159 @@
+"""
+Selectable inference backends for `MultiModalModel`.
+
+Every backend exposes the two calls the batch worker needs:
+
+* `encode_text(input_ids, attention_mask)` -> (batch, 256) text features
+* `classify_features(text_feat, image, image_mask)` -> (batch, num_labels) logits
+
+Available backends (the `MODEL_BACKEND` setting in `main.py`):
+
+* `torch`      - fp32 PyTorch checkpoint (default)
+* `torch-int8` - the same checkpoint with Linear layers dynamically quantized to INT8
+* `onnx`       - ONNX Runtime graphs produced by `scripts/export_model.py`
+* `onnx-int8`  - the INT8 dynamic-quantized ONNX graphs from the same tool
+"""
+
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.instrumentation import stage_timer
+from app.model import MultiModalModel
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# File names written by scripts/export_model.py
+ONNX_TEXT_ENCODER = "text_encoder.onnx"
+ONNX_IMAGE_ENCODER = "image_encoder.onnx"
+ONNX_HEAD = "head.onnx"
+
+
+def onnx_file(onnx_dir: str, name: str, quantized: bool = False) -> str:
+    if quantized:
+        name = name.replace(".onnx", ".int8.onnx")
+    return os.path.join(onnx_dir, name)
+
+
+def load_state_dict_file(path: str, device: torch.device) -> dict:
+    """
+    Load a checkpoint without reading it into memory up front.
+
+    `.safetensors` files and `.pth` zip checkpoints are both memory-mapped, so
+    tensors are paged in from the file (and shared through the page cache)
+    rather than copied into freshly allocated buffers.
+    """
+    if path.endswith(".safetensors"):
+        from safetensors.torch import load_file
+        return load_file(path, device=str(device))
+    return torch.load(path, map_location=device, mmap=True, weights_only=True)
+
+
+def load_torch_model(model_path: str, device: torch.device, num_labels: int = 6) -> MultiModalModel:
+    """Build the `MultiModalModel` architecture (no pretrained downloads) and load the checkpoint once."""
+    logger.info("Loading model from: %s", model_path)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found at {model_path}")
+
+    model = MultiModalModel(num_labels=num_labels, pretrained=False)
+    # assign=True keeps the memory-mapped tensors instead of copying them into the freshly built ones
+    model.load_state_dict(load_state_dict_file(model_path, device), assign=True)
+    model.to(device)
+    model.eval()
+    return model
+
+
+class TorchBackend:
+    """Runs the PyTorch model directly."""
+
+    def __init__(self, model: MultiModalModel, name: str = "torch", checkpoint_id: str = "",
+                 device: torch.device = torch.device("cpu")):
+        self.model = model
+        self.name = name
+        self.device = device
+        # Identifies the weights being served (used to namespace cached features)
+        self.checkpoint_id = f"{name}:{checkpoint_id}"
+
+    def encode_text(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model.encode_text(input_ids, attention_mask)
+
+    def classify_features(self, text_feat: torch.Tensor, image: Optional[torch.Tensor] = None,
+                          image_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        with torch.no_grad():
+            img_feat = None
+            if image is not None:
+                with stage_timer("resnet"):
+                    img_feat = self.model.encode_image(image)
+            with stage_timer("head"):
+                return self.model.classify_features(text_feat, img_feat=img_feat, image_mask=image_mask)
+
+
+def quantize_model(model: MultiModalModel) -> MultiModalModel:
+    """Dynamic INT8 quantization of every Linear layer (BERT, projections, classifier)."""
+    return torch.quantization.quantize_dynamic(model.to("cpu"), {nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend:
+    """Runs the exported text encoder, image encoder and classifier head with ONNX Runtime (CPU)."""
+
+    def __init__(self, onnx_dir: str, quantized: bool = False, name: str = "onnx"):
+        import onnxruntime as ort  # optional dependency, only needed for this backend
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = ["CPUExecutionProvider"]
+
+        paths = [onnx_file(onnx_dir, f, quantized) for f in (ONNX_TEXT_ENCODER, ONNX_IMAGE_ENCODER, ONNX_HEAD)]
+        for path in paths:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX graph not found at {path}; run scripts/export_model.py first")
+        self.text_session = ort.InferenceSession(paths[0], options, providers=providers)
+        self.image_session = ort.InferenceSession(paths[1], options, providers=providers)
+        self.head_session = ort.InferenceSession(paths[2], options, providers=providers)
+        self.name = name
+        self.device = torch.device("cpu")
+        self.checkpoint_id = f"{name}:{os.path.getmtime(paths[0])}"
+
+    def encode_text(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        (text_feat,) = self.text_session.run(None, {
+            "input_ids": input_ids.cpu().numpy().astype(np.int64),
+            "attention_mask": attention_mask.cpu().numpy().astype(np.int64),
+        })
+        return torch.from_numpy(text_feat)
+
+    def classify_features(self, text_feat: torch.Tensor, image: Optional[torch.Tensor] = None,
+                          image_mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        text_feat = text_feat.cpu().numpy().astype(np.float32)
+        img_feat = np.zeros((text_feat.shape[0], 256), dtype=np.float32)
+        if image is not None and image_mask is not None and bool(image_mask.any()):
+            with stage_timer("resnet"):
+                (features,) = self.image_session.run(None, {"image": image.cpu().numpy().astype(np.float32)})
+            img_feat[image_mask.cpu().numpy()] = features
+        with stage_timer("head"):
+            (logits,) = self.head_session.run(None, {"combined": np.concatenate([text_feat, img_feat], axis=1)})
+        return torch.from_numpy(logits)
+
+
+def create_backend(name: str, model_path: str, onnx_dir: str, device: torch.device):
+    """Load the backend called `name` (one of `BACKENDS`)."""
+    if name in ("torch", "torch-int8"):
+        if name == "torch-int8":
+            # Quantized kernels are CPU-only
+            device = torch.device("cpu")
+        model = load_torch_model(model_path, device)
+        if name == "torch-int8":
+            model = quantize_model(model)
+        checkpoint_id = f"{os.path.abspath(model_path)}:{os.path.getmtime(model_path)}"
+        return TorchBackend(model, name, checkpoint_id, device)
+    if name == "onnx":
+        return OnnxBackend(onnx_dir, quantized=False, name=name)
+    if name == "onnx-int8":
+        return OnnxBackend(onnx_dir, quantized=True, name=name)
+    raise ValueError(f"Unknown MODEL_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,166 @@
+"""
+Dynamic micro-batching for model inference.
+
+Requests are queued by the async handlers and collected by a single worker task
+for up to `max_wait_ms` (or until `max_batch_size` items are waiting). The whole
+batch is then handed to `process_batch` in a worker thread, so the event loop
+keeps accepting requests while the model runs, and each caller's future is
+resolved with its own result.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from app.metrics import REGISTRY, STAGE_LATENCY
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "fakenews_batch_queue_depth",
+    "Number of requests waiting to be batched",
+)
+BATCH_SIZE = REGISTRY.histogram(
+    "fakenews_batch_size",
+    "Number of requests served by a single forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+BATCHES_TOTAL = REGISTRY.counter(
+    "fakenews_batches",
+    "Number of batches executed",
+)
+BATCH_ERRORS_TOTAL = REGISTRY.counter(
+    "fakenews_batch_errors",
+    "Number of batches that raised an exception",
+)
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item: Any, future: asyncio.Future):
+        self.item = item
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """Collects individual requests into batches and runs them off the event loop."""
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        # A single inference thread: torch already parallelises inside an op
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue is not None:
+            queued = []
+            while not self._queue.empty():
+                queued.append(self._queue.get_nowait())
+            self._fail_stopped(queued)
+            QUEUE_DEPTH.set(0)
+
+    @staticmethod
+    def _fail_stopped(batch: List[_Pending]) -> None:
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(RuntimeError("Batch scheduler stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """Queue a single item and wait for its result."""
+        if not self.running:
+            raise RuntimeError("Batch scheduler is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Pending(item, future))
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return await future
+
+    async def _collect(self) -> List[_Pending]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size:
+                # Drain whatever is already queued before waiting on the clock
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped while the batch filled: these items have left the queue, where stop() looks
+            self._fail_stopped(batch)
+            raise
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (client disconnect) don't need a forward pass
+            batch = [p for p in batch if not p.future.done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for pending in batch:
+                STAGE_LATENCY.labels(stage="queue").observe(started - pending.enqueued_at)
+            BATCH_SIZE.observe(len(batch))
+            BATCHES_TOTAL.inc()
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.process_batch, [p.item for p in batch]
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(f"process_batch returned {len(results)} results for {len(batch)} items")
+            except asyncio.CancelledError:
+                # Stopped mid-batch: the thread finishes on its own, but nobody will collect its results
+                self._fail_stopped(batch)
+                raise
+            except Exception as e:
+                BATCH_ERRORS_TOTAL.inc()
+                for pending in batch:
+                    if not pending.future.done():
+                        pending.future.set_exception(e)
+                continue
+            finally:
+                STAGE_LATENCY.labels(stage="batch").observe(time.perf_counter() - started)
+
+            for pending, result in zip(batch, results):
+                if not pending.future.done():
+                    pending.future.set_result(result)
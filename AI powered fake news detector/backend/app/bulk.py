@@ -0,0 +1,143 @@
+"""
+Ordered, bounded-memory bulk scoring of JSONL records.
+
+`score_lines` reads records lazily and keeps at most `window` of them in flight
+(image fetch + inference). Every in-flight item goes through the shared
+`BatchScheduler`, which turns the window into full forward passes, and results
+are yielded strictly in input order. Memory is therefore bounded by the window,
+not by the size of the input.
+
+Each record is a JSON object with `text`, an optional `image_url` and an
+optional `id` that is echoed back. A malformed record or a failed item yields
+`{"line": n, "error": ...}` in its place instead of aborting the run. Blank
+lines are not records and are skipped.
+
+Used by the `/predict/stream` endpoint and `scripts/score_jsonl.py`.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import IO, Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BULK_ITEMS = REGISTRY.counter(
+    "fakenews_bulk_items",
+    "Items scored through the bulk endpoints, by result (ok, error)",
+    labelnames=("result",),
+)
+
+# (text, image_url) -> prediction
+ScoreFn = Callable[[str, Optional[str]], Awaitable[dict]]
+
+
+@dataclass
+class BulkStats:
+    items: int = 0
+    errors: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def items_per_sec(self) -> float:
+        return self.items / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "items": self.items,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "items_per_sec": round(self.items_per_sec, 2),
+        }
+
+
+def parse_record(line: str) -> Tuple[str, Optional[str], Any]:
+    """Return (text, image_url, id) for one JSONL line, raising ValueError if it is malformed."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("record must be a JSON object")
+    text = record.get("text")
+    if not isinstance(text, str):
+        raise ValueError("'text' must be a string")
+    image_url = record.get("image_url")
+    if image_url is not None and not isinstance(image_url, str):
+        raise ValueError("'image_url' must be a string")
+    return text, image_url, record.get("id")
+
+
+async def _score_line(line_no: int, line: str, score: ScoreFn) -> dict:
+    try:
+        text, image_url, record_id = parse_record(line)
+    except ValueError as e:
+        return {"line": line_no, "error": f"Invalid record: {e}"}
+
+    try:
+        result = await score(text, image_url)
+    except Exception as e:
+        logger.warning("Bulk item on line %d failed: %s", line_no, e)
+        return {"line": line_no, "error": str(e)}
+
+    if record_id is not None:
+        result = {"id": record_id, **result}
+    return result
+
+
+def _count(stats: BulkStats, result: dict) -> dict:
+    stats.items += 1
+    if "error" in result:
+        stats.errors += 1
+        BULK_ITEMS.labels(result="error").inc()
+    else:
+        BULK_ITEMS.labels(result="ok").inc()
+    return result
+
+
+async def score_lines(
+    lines: AsyncIterable[str],
+    score: ScoreFn,
+    window: int = 64,
+    stats: Optional[BulkStats] = None,
+) -> AsyncIterator[dict]:
+    """Score JSONL `lines` with at most `window` items in flight, yielding results in input order."""
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    stats = stats if stats is not None else BulkStats()
+    pending: "deque[asyncio.Task]" = deque()
+    try:
+        line_no = 0
+        async for line in lines:
+            line_no += 1
+            if not line.strip():
+                continue
+            pending.append(asyncio.ensure_future(_score_line(line_no, line, score)))
+            if len(pending) >= window:
+                yield _count(stats, await pending.popleft())
+        while pending:
+            yield _count(stats, await pending.popleft())
+    finally:
+        # Consumer went away (e.g. client disconnect): drop the work still queued
+        for task in pending:
+            task.cancel()
+        stats.finished = time.perf_counter()
+
+
+async def aiter_file_lines(f: IO, chunk_lines: int = 1024) -> AsyncIterator[str]:
+    """Yield the lines of a text or binary file, reading blocks of lines off the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        block = await loop.run_in_executor(None, lambda: list(itertools.islice(f, chunk_lines)))
+        if not block:
+            return
+        for line in block:
+            yield line.decode("utf-8", errors="replace") if isinstance(line, bytes) else line
@@ -0,0 +1,377 @@
+"""
+Asynchronous, pooled and cached image fetching.
+
+`ImageFetcher` downloads images over a shared aiohttp connection pool (with a
+per-host connection limit), streams the body with a hard size limit and decodes
+it into the 224x224 tensor the model expects. Preprocessed tensors are cached
+in two tiers keyed by URL and ETag:
+
+* an in-memory LRU of tensors, and
+* an optional on-disk store of content-addressed `.pt` files shared by workers,
+  bounded by `disk_cache_bytes`.
+
+Within `ttl` seconds of the last validation a cached URL is served without any
+network traffic; after that it is revalidated with `If-None-Match`, so an
+unchanged image still skips the download and the decode.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import aiohttp
+import torch
+from PIL import UnidentifiedImageError
+
+from app.instrumentation import stage_timer
+from app.metrics import REGISTRY
+from app.utils import preprocess_image_bytes
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_LOOKUPS = REGISTRY.counter(
+    "fakenews_image_cache_lookups",
+    "Image cache lookups by result (memory, disk, revalidated, miss)",
+    labelnames=("result",),
+)
+IMAGE_FETCH_ERRORS = REGISTRY.counter(
+    "fakenews_image_fetch_errors",
+    "Image fetches that failed, by reason",
+    labelnames=("reason",),
+)
+IMAGE_BYTES_DOWNLOADED = REGISTRY.counter(
+    "fakenews_image_bytes_downloaded",
+    "Bytes of image data downloaded",
+)
+
+_CHUNK_SIZE = 64 * 1024
+# A tensor no index points to yet may be another worker's write in progress
+_ORPHAN_GRACE_SECONDS = 60.0
+
+
+class ImageTooLargeError(Exception):
+    """The image body exceeded the configured `max_bytes`."""
+
+
+@dataclass
+class CachedImage:
+    etag: Optional[str]
+    tensor: torch.Tensor
+    validated_at: float
+
+
+class TensorLRUCache:
+    """Bounded in-memory LRU of preprocessed image tensors keyed by URL."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedImage]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[CachedImage]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def put(self, url: str, entry: CachedImage) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskTensorStore:
+    """
+    Content-addressed on-disk store of preprocessed tensors.
+
+    Tensors live in `<key>.pt` where key = sha256(url + etag); a small JSON index
+    file per URL records the current ETag, its tensor file and when it was last
+    validated. Writes go through a temp file and `os.replace`, so several workers
+    can share the same directory.
+
+    When a URL's ETag changes its previous tensor is deleted. Once the tensors
+    add up to more than `max_bytes`, the least recently used entries (by index
+    file mtime, bumped on every read and revalidation) are evicted down to 90%
+    of it, together with tensors no index points to. Each worker keeps a running
+    total of its own writes and rescans the directory every `RECOUNT_EVERY`
+    writes, so several workers can overshoot the cap by that many writes each.
+    """
+
+    RECOUNT_EVERY = 64
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._recount()
+
+    @staticmethod
+    def _digest(*parts: str) -> str:
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, self._digest("url", url) + ".json")
+
+    def _tensor_path(self, url: str, etag: Optional[str]) -> str:
+        return os.path.join(self.cache_dir, self._digest(url, etag or "") + ".pt")
+
+    def _atomic_write(self, path: str, write) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Another worker got there first
+            pass
+
+    def _read_index(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url: str) -> Optional[CachedImage]:
+        index_path = self._index_path(url)
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            tensor = torch.load(self._tensor_path(url, index.get("etag")), map_location="cpu", weights_only=True)
+            # Recently used entries are evicted last
+            os.utime(index_path)
+        except (OSError, ValueError, RuntimeError, pickle.UnpicklingError):
+            # Missing, half-written or not a plain tensor file (weights_only refuses to unpickle it)
+            return None
+        return CachedImage(etag=index.get("etag"), tensor=tensor, validated_at=index.get("validated_at", 0.0))
+
+    def put(self, url: str, entry: CachedImage) -> None:
+        tensor_path = self._tensor_path(url, entry.etag)
+        previous = self._read_index(self._index_path(url))
+        self._atomic_write(tensor_path, lambda f: torch.save(entry.tensor, f))
+        self.touch(url, entry)
+        if previous is not None and previous.get("etag") != entry.etag:
+            # The image changed: nothing points to its old tensor any more
+            self._remove(self._tensor_path(url, previous.get("etag")))
+        with self._lock:
+            self._nbytes += os.path.getsize(tensor_path)
+            self._writes_since_count += 1
+            if self._nbytes > self.max_bytes or self._writes_since_count >= self.RECOUNT_EVERY:
+                self._recount()
+                if self._nbytes > self.max_bytes:
+                    self._evict()
+
+    def touch(self, url: str, entry: CachedImage) -> None:
+        """Record a successful (re)validation of the cached entry."""
+        index = json.dumps({
+            "etag": entry.etag,
+            "tensor": os.path.basename(self._tensor_path(url, entry.etag)),
+            "validated_at": entry.validated_at,
+        }).encode("utf-8")
+        self._atomic_write(self._index_path(url), lambda f: f.write(index))
+
+    def _scan(self):
+        """Index files as (mtime, path, tensor name) and tensors as {name: (size, mtime)} in the cache directory."""
+        indexes, tensors = [], {}
+        with os.scandir(self.cache_dir) as entries:
+            for item in entries:
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                if item.name.endswith(".pt"):
+                    tensors[item.name] = (stat.st_size, stat.st_mtime)
+                elif item.name.endswith(".json"):
+                    indexes.append((stat.st_mtime, item.path))
+        return [(mtime, path, (self._read_index(path) or {}).get("tensor")) for mtime, path in indexes], tensors
+
+    def _recount(self) -> None:
+        self._nbytes = sum(size for size, _ in self._scan()[1].values())
+        self._writes_since_count = 0
+
+    def _evict(self) -> None:
+        indexes, tensors = self._scan()
+        referenced = {tensor for _, _, tensor in indexes}
+        now = time.time()
+        for name in set(tensors) - referenced:
+            if now - tensors[name][1] > _ORPHAN_GRACE_SECONDS:
+                self._remove(os.path.join(self.cache_dir, name))
+                del tensors[name]
+        total, target = sum(size for size, _ in tensors.values()), self.max_bytes * 0.9
+        for _, index_path, tensor in sorted(indexes):
+            if total <= target:
+                break
+            self._remove(index_path)
+            if tensor in tensors:
+                self._remove(os.path.join(self.cache_dir, tensor))
+                total -= tensors.pop(tensor)[0]
+        self._nbytes = total
+
+
+class ImageFetcher:
+    """Fetches and preprocesses images without blocking the event loop."""
+
+    def __init__(
+        self,
+        max_connections: int = 64,
+        per_host_limit: int = 8,
+        max_bytes: int = 10 * 1024 * 1024,
+        timeout: float = 10.0,
+        memory_cache_size: int = 256,
+        cache_dir: Optional[str] = None,
+        ttl: float = 300.0,
+        disk_cache_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.ttl = ttl
+        self.memory = TensorLRUCache(memory_cache_size)
+        self.disk = DiskTensorStore(cache_dir, disk_cache_bytes) if cache_dir else None
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Concurrent requests for the same URL share one download
+        self._inflight: Dict[str, "asyncio.Task[Optional[torch.Tensor]]"] = {}
+
+    async def start(self) -> None:
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.per_host_limit)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': 'Mozilla/5.0'},
+        )
+
+    async def close(self) -> None:
+        inflight = list(self._inflight.values())
+        for task in inflight:
+            task.cancel()
+        await asyncio.gather(*inflight, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def fetch(self, url: str) -> Optional[torch.Tensor]:
+        """Return the preprocessed (1, 3, 224, 224) tensor for `url`, or None if it can't be used."""
+        task = self._inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_or_none(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # The download is its own task: a caller that is cancelled stops waiting
+        # for it, but the download goes on for the other callers and the cache
+        return await asyncio.shield(task)
+
+    async def _fetch_or_none(self, url: str) -> Optional[torch.Tensor]:
+        try:
+            return await self._fetch(url)
+        except Exception:
+            logger.exception("Unexpected error fetching %s", url)
+            IMAGE_FETCH_ERRORS.labels(reason="unexpected").inc()
+            return None
+
+    async def _fetch(self, url: str) -> Optional[torch.Tensor]:
+        loop = asyncio.get_running_loop()
+        now = time.time()
+
+        cached = self.memory.get(url)
+        tier = "memory"
+        if cached is None and self.disk is not None:
+            cached = await loop.run_in_executor(None, self.disk.get, url)
+            tier = "disk"
+            if cached is not None:
+                self.memory.put(url, cached)
+
+        if cached is not None and now - cached.validated_at < self.ttl:
+            IMAGE_CACHE_LOOKUPS.labels(result=tier).inc()
+            return cached.tensor
+
+        if self._session is None:
+            await self.start()
+
+        headers = {}
+        if cached is not None and cached.etag:
+            headers["If-None-Match"] = cached.etag
+
+        with stage_timer("fetch"):
+            try:
+                async with self._session.get(url, headers=headers) as response:
+                    if response.status == 304 and cached is not None:
+                        IMAGE_CACHE_LOOKUPS.labels(result="revalidated").inc()
+                        cached.validated_at = now
+                        if self.disk is not None:
+                            await loop.run_in_executor(None, self.disk.touch, url, cached)
+                        return cached.tensor
+
+                    response.raise_for_status()
+                    content_type = response.headers.get('Content-Type', '')
+                    if 'image' not in content_type:
+                        logger.info("Content-Type is not an image: %s (%s)", content_type, url)
+                        IMAGE_FETCH_ERRORS.labels(reason="content_type").inc()
+                        return None
+
+                    data = await self._read_limited(response)
+                    etag = response.headers.get('ETag')
+            except ImageTooLargeError as e:
+                logger.info("Image rejected: %s (%s)", e, url)
+                IMAGE_FETCH_ERRORS.labels(reason="too_large").inc()
+                return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.info("Request error: %s (%s)", e, url)
+                IMAGE_FETCH_ERRORS.labels(reason="request").inc()
+                return None
+
+        IMAGE_CACHE_LOOKUPS.labels(result="miss").inc()
+        try:
+            with stage_timer("preprocess"):
+                tensor = await loop.run_in_executor(None, preprocess_image_bytes, data)
+        except (UnidentifiedImageError, OSError) as e:
+            logger.info("Image identification error: %s (%s)", e, url)
+            IMAGE_FETCH_ERRORS.labels(reason="decode").inc()
+            return None
+
+        entry = CachedImage(etag=etag, tensor=tensor, validated_at=now)
+        self.memory.put(url, entry)
+        if self.disk is not None:
+            await loop.run_in_executor(None, self.disk.put, url, entry)
+        return tensor
+
+    async def _read_limited(self, response: aiohttp.ClientResponse) -> bytes:
+        if response.content_length is not None and response.content_length > self.max_bytes:
+            raise ImageTooLargeError(f"Content-Length {response.content_length} exceeds {self.max_bytes} bytes")
+
+        chunks = []
+        total = 0
+        async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+            total += len(chunk)
+            if total > self.max_bytes:
+                raise ImageTooLargeError(f"Body exceeds {self.max_bytes} bytes")
+            chunks.append(chunk)
+        IMAGE_BYTES_DOWNLOADED.inc(total)
+        return b"".join(chunks)
@@ -0,0 +1,131 @@
+"""
+Structured, leveled instrumentation for the request path.
+
+* `stage_timer(stage)` records the duration of a stage (tokenize, fetch,
+  preprocess, bert, resnet, head, ...) into the `fakenews_stage_latency_seconds`
+  histogram served on `/metrics`.
+* `tracer.trace(name)` samples a fraction of requests/batches; for a sampled one,
+  every stage timed inside it is collected and written as a single JSON log
+  line when it finishes.
+
+Nothing is written per request by default: the sample rate starts at
+`TRACE_SAMPLE_RATE` (0) and log level at `LOG_LEVEL` (WARNING), and both can be
+changed at runtime through `/debug/tracing` without a restart.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app.metrics import STAGE_LATENCY
+
+TRACE_LOGGER = "app.trace"
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """Set up leveled logging for the `app` loggers (to stderr)."""
+    level = (level or os.environ.get("LOG_LEVEL", "WARNING")).upper()
+    logger = logging.getLogger("app")
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(level)
+    # Sampled traces are emitted whenever sampling is on, independent of the app level
+    logging.getLogger(TRACE_LOGGER).setLevel(logging.INFO)
+
+
+def set_log_level(level: str) -> None:
+    logging.getLogger("app").setLevel(level.upper())
+
+
+def get_log_level() -> str:
+    return logging.getLevelName(logging.getLogger("app").getEffectiveLevel())
+
+
+class Trace:
+    """Stage timings and fields of one sampled request or batch."""
+
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def finish(self) -> None:
+        record = {
+            "trace": self.name,
+            "total_ms": round((time.perf_counter() - self._start) * 1000, 3),
+            "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()},
+        }
+        record.update(self.fields)
+        logging.getLogger(TRACE_LOGGER).info(json.dumps(record, default=str))
+
+
+class Tracer:
+    """Samples traces at a rate that can be changed at runtime."""
+
+    def __init__(self, sample_rate: float = 0.0):
+        self.sample_rate = sample_rate
+
+    @property
+    def sample_rate(self) -> float:
+        return self._sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, rate: float) -> None:
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        self._sample_rate = rate
+
+    @contextmanager
+    def trace(self, name: str, **fields) -> Iterator[Optional[Trace]]:
+        """Yield a `Trace` for sampled calls and None otherwise."""
+        if self._sample_rate <= 0.0 or random.random() >= self._sample_rate:
+            yield None
+            return
+        trace = Trace(name, **fields)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        except Exception as e:
+            trace.fields["error"] = str(e)
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace.finish()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time a stage into the latency histogram and the current trace, if any."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(stage, elapsed)
+
+
+tracer = Tracer(sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "0")))
@@ -1,12 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
-from app.utils import preprocess_image_from_url  # renamed for clarity
-from app.model import MultiModalModel
+from starlette.background import BackgroundTask
+from typing import List, Optional, Tuple
+from app.image_fetcher import ImageFetcher
+from app.backends import create_backend
+from app.batching import BatchScheduler
+from app.bulk import BulkStats, aiter_file_lines, score_lines
+from app.instrumentation import configure_logging, get_log_level, set_log_level, stage_timer, tracer
+from app.metrics import REGISTRY
+from app.text_cache import create_text_cache, text_cache_key
+from app.tokenization import load_tokenizer, tokenize_batch
 import torch
-from transformers import BertTokenizer
+import asyncio
+import json
+import logging
 import os
+import tempfile
+import threading
+import time
+
+configure_logging()
+logger = logging.getLogger("app.main")
 
 app = FastAPI()
 
@@ -20,7 +36,9 @@ app.add_middleware(
 )
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = MultiModalModel(num_labels=6).to(device)
+
+# Inference backend: torch (fp32), torch-int8, onnx or onnx-int8 (see app/backends.py)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "torch")
 
 # Get model path from environment variable or use default path
 model_path = os.environ.get('MODEL_PATH')
@@ -38,27 +56,23 @@ if not model_path:
     if not os.path.exists(model_path):
         model_path = "/app/app/models/multimodal_model.pth"
 
-print(f"Loading model from: {model_path}")
-try:
-    # Check if model file exists
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model file not found at {model_path}")
-        
-    # Load model with error handling
-    state_dict = torch.load(model_path, map_location=device)
-    print(f"Model loaded successfully. Keys: {list(state_dict.keys())[:5]}...")
-    
-    model.load_state_dict(state_dict)
-    print("Model state dictionary loaded successfully")
-    model.eval()
-    print("Model set to evaluation mode")
-except Exception as e:
-    print(f"Error loading model: {str(e)}")
-    import traceback
-    traceback.print_exc()
-    raise RuntimeError(f"Failed to load model: {str(e)}")
-
-tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+# Exported graphs from scripts/export_model.py, used by the onnx backends
+onnx_dir = os.environ.get("ONNX_MODEL_DIR") or os.path.join(os.path.dirname(model_path), "onnx")
+
+# Local tokenizer directory for fully offline starts (otherwise the Hugging Face cache is used)
+TOKENIZER_PATH = os.environ.get("TOKENIZER_PATH", "bert-base-uncased")
+
+# Loaded in the background after the server starts; /ready flips once warm-up completes
+backend = None
+tokenizer = None
+ready = threading.Event()
+startup_error = None
+
+STARTUP_SECONDS = REGISTRY.gauge(
+    "fakenews_startup_seconds",
+    "Time spent in each startup phase",
+    labelnames=("phase",),
+)
 
 class_names = ["real", "fake", "satire", "clickbait", "bias", "conspiracy"]
 
@@ -66,48 +80,265 @@ class InputData(BaseModel):
     text: str
     image_url: Optional[str] = None  # Make sure this matches your frontend key
 
-@app.post("/predict")
-async def predict(data: InputData):
+
+# Largest list accepted by /predict/batch; bigger jobs should use /predict/stream
+PREDICT_BATCH_MAX_ITEMS = int(os.environ.get("PREDICT_BATCH_MAX_ITEMS", "256"))
+# Items in flight (image fetch + inference) per /predict/stream request
+BULK_WINDOW = int(os.environ.get("BULK_WINDOW", "64"))
+# Streamed request bodies are kept in memory up to this size, then spooled to disk
+BULK_SPOOL_BYTES = 1024 * 1024
+
+
+text_cache = create_text_cache(
+    backend=os.environ.get("TEXT_CACHE_BACKEND", "memory"),
+    max_entries=int(os.environ.get("TEXT_CACHE_MAX_ENTRIES", "100000")),
+    max_bytes=int(os.environ.get("TEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    ttl=float(os.environ["TEXT_CACHE_TTL"]) if os.environ.get("TEXT_CACHE_TTL") else None,
+    path=os.environ.get("TEXT_CACHE_PATH", "text_features.sqlite3"),
+)
+# Features from one checkpoint must never be served for another (set once the backend is loaded)
+text_cache_namespace = None
+
+
+def encode_texts(texts: List[str]) -> torch.Tensor:
+    """Return text features for `texts`, running BERT only on texts not in the cache."""
+    keys = [text_cache_key(text, text_cache_namespace) for text in texts]
+    cached = text_cache.get_many(keys)
+
+    # Duplicates within a batch are encoded once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+
+    features = dict(cached)
+    if missing:
+        with stage_timer("tokenize"):
+            input_ids, attention_mask = tokenize_batch(tokenizer, list(missing.values()))
+            input_ids = input_ids.to(device)
+            attention_mask = attention_mask.to(device)
+
+        with stage_timer("bert"):
+            text_feat = backend.encode_text(input_ids, attention_mask)
+
+        encoded = list(zip(missing.keys(), text_feat))
+        text_cache.put_many(encoded)
+        features.update(encoded)
+
+    return torch.stack([features[key].to(device) for key in keys])
+
+
+def run_batch(items: List[Tuple[str, Optional[torch.Tensor]]]) -> List[dict]:
+    """Run one batched forward pass for a list of (text, image_tensor) requests.
+
+    Text features come from the cache where possible; the rest are encoded with
+    text padded to the longest sequence (bucketed to a multiple of 8). Text-only
+    and image rows share the pass via the model's per-row image mask.
+    """
+    image_mask = torch.tensor([image is not None for _, image in items], device=device)
+    images = [image for _, image in items if image is not None]
+    image = torch.cat(images).to(device) if images else None
+
+    with tracer.trace("batch", size=len(items), images=len(images)), torch.no_grad():
+        text_feat = encode_texts([text for text, _ in items])
+        # resnet and head stages are timed inside the backend
+        outputs = backend.classify_features(text_feat, image=image, image_mask=image_mask)
+        confidences, predicted = torch.softmax(outputs, dim=1).max(dim=1)
+
+    results = []
+    for has_image, predicted_class, confidence in zip(image_mask.tolist(), predicted.tolist(), confidences.tolist()):
+        results.append({
+            "label": class_names[predicted_class],
+            "confidence": float(confidence),
+            "mode": "multimodal" if has_image else "text-only"
+        })
+    return results
+
+
+scheduler = BatchScheduler(
+    run_batch,
+    max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", "16")),
+    max_wait_ms=float(os.environ.get("BATCH_MAX_WAIT_MS", "10")),
+)
+
+
+image_fetcher = ImageFetcher(
+    per_host_limit=int(os.environ.get("IMAGE_PER_HOST_LIMIT", "8")),
+    max_bytes=int(os.environ.get("IMAGE_MAX_BYTES", str(10 * 1024 * 1024))),
+    memory_cache_size=int(os.environ.get("IMAGE_CACHE_SIZE", "256")),
+    cache_dir=os.environ.get("IMAGE_CACHE_DIR") or None,
+    disk_cache_bytes=int(os.environ.get("IMAGE_DISK_CACHE_BYTES", str(1024 * 1024 * 1024))),
+    ttl=float(os.environ.get("IMAGE_CACHE_TTL", "300")),
+)
+
+
+async def score_item(text: str, image_url: Optional[str]) -> dict:
+    """Fetch the image (if any) and score one item through the batch scheduler."""
+    image_tensor = None
+    if image_url and image_url.strip() != "":
+        # Falls back to text-only mode when the image can't be used
+        with stage_timer("image"):
+            image_tensor = await image_fetcher.fetch(image_url)
+
+    # Queued and executed together with other concurrent requests
+    return await scheduler.submit((text, image_tensor))
+
+
+def load_model_and_warm_up():
+    """Load backend and tokenizer, then run one warm-up batch before declaring the service ready."""
+    global backend, tokenizer, device, text_cache_namespace, startup_error
     try:
-        print(f"Received prediction request with text: {data.text[:50]}... and image URL: {data.image_url}")
-        
-        inputs = tokenizer(data.text, padding='max_length', truncation=True, max_length=128, return_tensors="pt")
-        input_ids = inputs["input_ids"].to(device)
-        attention_mask = inputs["attention_mask"].to(device)
-
-        image_tensor = None
-        if data.image_url and data.image_url.strip() != "":
-            print("Processing image from URL...")
-            image_tensor = preprocess_image_from_url(data.image_url)
-            if image_tensor is None:
-                print("Warning: Image could not be processed. Falling back to text-only mode.")
-            else:
-                print("Image processed successfully, moving to device...")
-                image_tensor = image_tensor.to(device)
-        else:
-            print("No image URL provided. Using text-only mode.")
-
-        print("Running model prediction...")
+        start = time.perf_counter()
+        logger.info("Loading %s backend", MODEL_BACKEND)
+        backend = create_backend(MODEL_BACKEND, model_path, onnx_dir, device)
+        device = backend.device
+        tokenizer = load_tokenizer(TOKENIZER_PATH)
+        text_cache_namespace = backend.checkpoint_id
+        STARTUP_SECONDS.labels(phase="load").set(time.perf_counter() - start)
+
+        # Warm-up bypasses the text cache so no placeholder features are stored
+        start = time.perf_counter()
         with torch.no_grad():
-            outputs = model(input_ids=input_ids, attention_mask=attention_mask, image=image_tensor)
-            predicted_class = torch.argmax(outputs, dim=1).item()
-            label = class_names[predicted_class]
-            confidence = float(torch.softmax(outputs, dim=1)[0][predicted_class])
-            
-            # Add a note if text-only mode was used
-            mode = "text-only" if image_tensor is None else "multimodal"
-        
-        print(f"Prediction complete: {label} with confidence {confidence}, mode: {mode}")
-        return {
-            "label": label,
-            "confidence": confidence,
-            "mode": mode
-        }
+            input_ids, attention_mask = tokenize_batch(tokenizer, ["warm up", "warm up with an image"])
+            text_feat = backend.encode_text(input_ids.to(device), attention_mask.to(device))
+            backend.classify_features(
+                text_feat,
+                image=torch.zeros(1, 3, 224, 224, device=device),
+                image_mask=torch.tensor([False, True], device=device),
+            )
+        STARTUP_SECONDS.labels(phase="warmup").set(time.perf_counter() - start)
     except Exception as e:
-        print(f"Error in prediction: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        startup_error = str(e)
+        logger.exception("Error loading model")
+        return
+    ready.set()
+    logger.info("Model ready")
+
+
+@app.on_event("startup")
+async def start_services():
+    await image_fetcher.start()
+    await scheduler.start()
+    # Runs on the inference thread, so no batch can start before the model is loaded
+    asyncio.get_running_loop().run_in_executor(scheduler.executor, load_model_and_warm_up)
+
+
+@app.on_event("shutdown")
+async def stop_services():
+    await scheduler.stop()
+    await image_fetcher.close()
+
+
+@app.get("/health")
+async def health():
+    """Liveness probe: the process is up (the model may still be loading)."""
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the model is loaded and warmed up."""
+    if ready.is_set():
+        return {"status": "ready", "backend": MODEL_BACKEND}
+    if startup_error is not None:
+        raise HTTPException(status_code=503, detail=f"Model failed to load: {startup_error}")
+    raise HTTPException(status_code=503, detail="Model still loading")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return REGISTRY.render()
+
+
+class TracingSettings(BaseModel):
+    sample_rate: Optional[float] = None  # fraction of requests/batches to trace (0 disables)
+    log_level: Optional[str] = None
+
+
+@app.get("/debug/tracing")
+async def get_tracing():
+    return {"sample_rate": tracer.sample_rate, "log_level": get_log_level()}
+
+
+@app.put("/debug/tracing")
+async def update_tracing(settings: TracingSettings):
+    """Change trace sampling and log level at runtime."""
+    try:
+        if settings.sample_rate is not None:
+            tracer.sample_rate = settings.sample_rate
+        if settings.log_level is not None:
+            set_log_level(settings.log_level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"sample_rate": tracer.sample_rate, "log_level": get_log_level()}
+
+
+@app.post("/predict")
+async def predict(data: InputData):
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail="Model still loading, please wait...")
+
+    has_image = bool(data.image_url and data.image_url.strip() != "")
+    with tracer.trace("predict", has_image=has_image) as trace:
+        try:
+            with stage_timer("request"):
+                result = await score_item(data.text, data.image_url)
+
+            if trace is not None:
+                trace.fields.update(result)
+            return result
+        except Exception as e:
+            logger.exception("Error in prediction")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/batch")
+async def predict_batch(items: List[InputData]):
+    """Score a list of items in one round trip; results are returned in input order."""
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail="Model still loading, please wait...")
+    if len(items) > PREDICT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {PREDICT_BATCH_MAX_ITEMS} items per request, use /predict/stream for larger jobs",
+        )
+
+    with tracer.trace("predict_batch", size=len(items)):
+        try:
+            # Images are fetched concurrently and the items share forward passes in the scheduler
+            return await asyncio.gather(*(score_item(data.text, data.image_url) for data in items))
+        except Exception as e:
+            logger.exception("Error in batch prediction")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """Score an NDJSON body (one `InputData` object per line) and stream NDJSON results.
+
+    Results come back in input order, one line per record, followed by a final
+    `{"summary": {...}}` line with the item count, errors and items/sec. Blank
+    lines are skipped, so results don't line up with input lines one for one;
+    an error result names its input line in `line`.
+    """
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail="Model still loading, please wait...")
+
+    # The body is spooled before streaming starts: StreamingResponse listens for
+    # disconnects on the same receive channel, so it can't be read concurrently
+    spool = tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    async def results():
+        stats = BulkStats()
+        async for result in score_lines(aiter_file_lines(spool), score_item, window=BULK_WINDOW, stats=stats):
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"summary": stats.as_dict()}) + "\n"
+        logger.info("Bulk scoring finished: %s", stats.as_dict())
+
+    return StreamingResponse(results(), media_type="application/x-ndjson", background=BackgroundTask(spool.close))
 
 if __name__ == '__main__':
     import uvicorn
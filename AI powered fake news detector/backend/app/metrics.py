@@ -0,0 +1,256 @@
+"""
+Minimal in-process metrics (counters, gauges, histograms) for the inference service.
+
+Metrics are registered on a process-wide registry and rendered in the Prometheus
+text exposition format by the `/metrics` endpoint in `main.py`.
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds (1ms .. 10s)
+DEFAULT_LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, labelvalues))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{value}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, **labels: str) -> "_Metric":
+        """Return the child metric for the given label values."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._new_child()
+                self._children[key] = child
+            return child
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def _series(self) -> Iterable[Tuple[Tuple[str, ...], "_Metric"]]:
+        if self.labelnames:
+            with self._lock:
+                return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in self._series():
+            lines.extend(child._render_samples(self.name, self.labelnames, labelvalues))
+        return lines
+
+    def snapshot(self):
+        if self.labelnames:
+            return {",".join(key): child._snapshot() for key, child in self._series()}
+        return self._snapshot()
+
+    def _render_samples(self, name, labelnames, labelvalues) -> List[str]:
+        raise NotImplementedError
+
+    def _snapshot(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _render_samples(self, name, labelnames, labelvalues):
+        return [f"{name}_total{_format_labels(labelnames, labelvalues)} {_format_value(self._value)}"]
+
+    def _snapshot(self):
+        return self._value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (e.g. queue depth)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def _render_samples(self, name, labelnames, labelvalues):
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(self._value)}"]
+
+    def _snapshot(self):
+        return self._value
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed histogram, compatible with Prometheus histograms."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        if not self.buckets or not math.isinf(self.buckets[-1]):
+            self.buckets = self.buckets + (math.inf,)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def _render_samples(self, name, labelnames, labelvalues):
+        lines = []
+        cumulative = 0
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(labelnames, labelvalues, ("le", _format_value(bound)))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, labelvalues)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+    def _snapshot(self):
+        with self._lock:
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "buckets": {_format_value(b): c for b, c in zip(self.buckets, self._counts)},
+            }
+
+
+class MetricsRegistry:
+    """Holds every metric of the process; registering the same name twice returns the existing metric."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return a JSON-serialisable view of all metrics."""
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return {name: metric.snapshot() for name, metric in metrics}
+
+
+REGISTRY = MetricsRegistry()
+
+# Per-stage latency shared by every part of the request path
+STAGE_LATENCY = REGISTRY.histogram(
+    "fakenews_stage_latency_seconds",
+    "Latency of each inference stage in seconds",
+    labelnames=("stage",),
+)
@@ -1,18 +1,30 @@
 import torch
 import torch.nn as nn
-from transformers import BertModel
+from transformers import BertConfig, BertModel
+from transformers.modeling_utils import no_init_weights
 import torchvision.models as models
 
 class MultiModalModel(nn.Module):
-    def __init__(self, num_labels):
+    def __init__(self, num_labels, pretrained=True):
+        """
+        With `pretrained=True` (training) BERT and ResNet50 start from their
+        pretrained weights. With `pretrained=False` (serving) only the architecture
+        is built - no downloads, no random init - since every weight is
+        overwritten by the fine-tuned checkpoint anyway.
+        """
         super(MultiModalModel, self).__init__()
 
         # BERT for text
-        self.bert = BertModel.from_pretrained('bert-base-uncased')
+        if pretrained:
+            self.bert = BertModel.from_pretrained('bert-base-uncased')
+        else:
+            # BertConfig defaults match bert-base-uncased
+            with no_init_weights():
+                self.bert = BertModel(BertConfig())
         self.text_fc = nn.Linear(self.bert.config.hidden_size, 256)
 
         # ResNet50 for image
-        resnet = models.resnet50(pretrained=True)
+        resnet = models.resnet50(weights=models.ResNet50_Weights.IMAGENET1K_V1 if pretrained else None)
         for param in resnet.parameters():
             param.requires_grad = False  # Freeze resnet
         resnet.fc = nn.Identity()  # Remove last layer
@@ -27,48 +39,61 @@ class MultiModalModel(nn.Module):
             nn.Linear(256, num_labels)
         )
 
-    def forward(self, input_ids, attention_mask, image=None):
-        try:
-            # Process text
-            print("Processing text with BERT...")
-            text_output = self.bert(input_ids=input_ids, attention_mask=attention_mask)
-            text_feat = text_output.pooler_output
-            print(f"BERT output shape: {text_feat.shape}")
-            text_feat = self.text_fc(text_feat)
-            print(f"Text feature shape after FC: {text_feat.shape}")
+    def encode_text(self, input_ids, attention_mask):
+        """Return the 256-d text features (BERT pooler output through `text_fc`)."""
+        text_output = self.bert(input_ids=input_ids, attention_mask=attention_mask)
+        return self.text_fc(text_output.pooler_output)
 
-            # If image is provided, process it and combine with text features
-            if image is not None:
-                print(f"Forward pass - Input shapes: text={input_ids.shape}, image={image.shape}")
-                
-                # Process image
-                print("Processing image with ResNet...")
-                img_feat = self.resnet(image)
-                print(f"ResNet output shape: {img_feat.shape}")
-                img_feat = self.image_fc(img_feat)
-                print(f"Image feature shape after FC: {img_feat.shape}")
+    def encode_image(self, image):
+        """Return the 256-d image features (ResNet50 through `image_fc`)."""
+        return self.image_fc(self.resnet(image))
 
-                # Combine features
-                print("Combining text and image features...")
-                combined = torch.cat((text_feat, img_feat), dim=1)
-                print(f"Combined feature shape: {combined.shape}")
-            else:
-                # For text-only mode, create a zero tensor with the same shape as image features
-                print("Image not provided, using text-only mode")
-                batch_size = text_feat.size(0)
-                img_feat = torch.zeros(batch_size, 256, device=text_feat.device)
-                combined = torch.cat((text_feat, img_feat), dim=1)
-                print(f"Combined feature shape (text-only): {combined.shape}")
-            
-            # Final classification
-            print("Running classifier...")
-            output = self.classifier(combined)
-            print(f"Output shape: {output.shape}")
-            
-            return output
-            
-        except Exception as e:
-            print(f"Error in model forward pass: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise
+    def combine_features(self, text_feat, img_feat, image_mask):
+        """
+        Concatenate text features with image features for a mixed batch.
+
+        `img_feat` holds only the rows where the boolean `image_mask` is True (or is
+        None when no row has an image); the other rows get zero image features.
+        """
+        batch_size = text_feat.size(0)
+        num_images = int(image_mask.sum())
+        if image_mask.shape != (batch_size,):
+            raise ValueError(f"image_mask must have shape ({batch_size},), got {tuple(image_mask.shape)}")
+        if num_images != (0 if img_feat is None else img_feat.size(0)):
+            raise ValueError(f"image_mask selects {num_images} rows but {0 if img_feat is None else img_feat.size(0)} images were given")
+
+        # Preallocated zeros for text-only rows, image features scattered in
+        combined_img_feat = text_feat.new_zeros(batch_size, 256)
+        if num_images:
+            combined_img_feat[image_mask] = img_feat.to(combined_img_feat.dtype)
+        return torch.cat((text_feat, combined_img_feat), dim=1)
+
+    def classify_features(self, text_feat, img_feat=None, image_mask=None):
+        """Run the classifier on precomputed text (and image) features."""
+        if image_mask is None:
+            image_mask = torch.zeros(text_feat.size(0), dtype=torch.bool, device=text_feat.device)
+        return self.classifier(self.combine_features(text_feat, img_feat, image_mask))
+
+    def forward(self, input_ids, attention_mask, image=None, image_mask=None):
+        """
+        Classify a batch of text (and optionally images).
+
+        Without `image_mask`, `image` applies to every row or is None for a text-only
+        batch. With a boolean `image_mask` of shape (batch,), `image` holds only the
+        rows where the mask is True, so text-only and multimodal requests can share
+        one pass: ResNet runs on the image rows only and the text-only rows get zero
+        image features, exactly as in text-only mode.
+        """
+        text_feat = self.encode_text(input_ids, attention_mask)
+
+        if image_mask is not None:
+            img_feat = self.encode_image(image) if image is not None else None
+            combined = self.combine_features(text_feat, img_feat, image_mask)
+        elif image is not None:
+            combined = torch.cat((text_feat, self.encode_image(image)), dim=1)
+        else:
+            # For text-only mode, use zero image features
+            img_feat = torch.zeros(text_feat.size(0), 256, device=text_feat.device)
+            combined = torch.cat((text_feat, img_feat), dim=1)
+
+        return self.classifier(combined)
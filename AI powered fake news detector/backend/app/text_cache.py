@@ -0,0 +1,261 @@
+"""
+Cache of 256-d text features (`MultiModalModel.encode_text` outputs).
+
+Repeated claims skip tokenization and the BERT encoder entirely; only the
+classifier head (and ResNet, if an image is attached) runs for them. Two
+interchangeable backends are provided:
+
+* `MemoryTextFeatureCache` - in-process LRU with TTL and byte accounting.
+* `DiskTextFeatureCache` - SQLite file shared by every worker on the host.
+
+Use `create_text_cache` to build one from configuration.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from app.metrics import REGISTRY
+
+TEXT_CACHE_LOOKUPS = REGISTRY.counter(
+    "fakenews_text_cache_lookups",
+    "Text feature cache lookups by result (hit, miss)",
+    labelnames=("result",),
+)
+TEXT_CACHE_HIT_RATIO = REGISTRY.gauge(
+    "fakenews_text_cache_hit_ratio",
+    "Fraction of text feature lookups served from cache since startup",
+)
+TEXT_CACHE_ENTRIES = REGISTRY.gauge(
+    "fakenews_text_cache_entries",
+    "Number of cached text feature vectors",
+)
+TEXT_CACHE_BYTES = REGISTRY.gauge(
+    "fakenews_text_cache_bytes",
+    "Bytes used by cached text feature vectors",
+)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text the way the uncased tokenizer would see it (case and whitespace)."""
+    return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+
+def text_cache_key(text: str, namespace: str = "") -> str:
+    """Hash of the normalized text; `namespace` separates features of different checkpoints."""
+    return hashlib.sha256(f"{namespace}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class TextFeatureCache:
+    """Interface shared by the cache backends. Feature tensors are 1-d and on CPU."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, torch.Tensor]:
+        found = self._get_many(keys)
+        hits = sum(1 for key in keys if key in found)
+        self._record(hits, len(keys) - hits)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, torch.Tensor]]) -> None:
+        # Always a copy: the features are usually rows of a batch tensor, and a row
+        # view would keep the whole batch's storage alive behind one row's bytes
+        self._put_many([(key, feat.detach().to("cpu", torch.float32, copy=True)) for key, feat in items])
+        self._update_size_metrics()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": TEXT_CACHE_ENTRIES.value,
+            "bytes": TEXT_CACHE_BYTES.value,
+        }
+
+    def _record(self, hits: int, misses: int) -> None:
+        self.hits += hits
+        self.misses += misses
+        TEXT_CACHE_LOOKUPS.labels(result="hit").inc(hits)
+        TEXT_CACHE_LOOKUPS.labels(result="miss").inc(misses)
+        total = self.hits + self.misses
+        TEXT_CACHE_HIT_RATIO.set(self.hits / total if total else 0.0)
+
+    def _get_many(self, keys: Sequence[str]) -> Dict[str, torch.Tensor]:
+        raise NotImplementedError
+
+    def _put_many(self, items: Sequence[Tuple[str, torch.Tensor]]) -> None:
+        raise NotImplementedError
+
+    def _update_size_metrics(self) -> None:
+        pass
+
+
+class NullTextFeatureCache(TextFeatureCache):
+    """Disables caching while keeping the same call sites."""
+
+    def _get_many(self, keys):
+        return {}
+
+    def _put_many(self, items):
+        pass
+
+
+class MemoryTextFeatureCache(TextFeatureCache):
+    """In-process LRU bounded by entry count and bytes, with optional TTL."""
+
+    def __init__(self, max_entries: int = 100_000, max_bytes: int = 256 * 1024 * 1024, ttl: Optional[float] = None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._entries: "OrderedDict[str, Tuple[torch.Tensor, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                feat, stored_at = entry
+                if self.ttl is not None and now - stored_at > self.ttl:
+                    self._evict(key)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = feat
+        return found
+
+    def _put_many(self, items):
+        now = time.monotonic()
+        with self._lock:
+            for key, feat in items:
+                if key in self._entries:
+                    self._evict(key)
+                self._entries[key] = (feat, now)
+                self.nbytes += feat.element_size() * feat.nelement()
+            while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str) -> None:
+        feat, _ = self._entries.pop(key)
+        self.nbytes -= feat.element_size() * feat.nelement()
+
+    def _update_size_metrics(self):
+        TEXT_CACHE_ENTRIES.set(len(self._entries))
+        TEXT_CACHE_BYTES.set(self.nbytes)
+
+
+class DiskTextFeatureCache(TextFeatureCache):
+    """
+    SQLite-backed cache shared across worker processes on one host.
+
+    Entries are evicted least-recently-used once `max_entries` is exceeded and
+    ignored (then overwritten) after `ttl` seconds.
+    """
+
+    RECOUNT_EVERY = 4096
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, ttl: Optional[float] = None):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS text_features ("
+            "key TEXT PRIMARY KEY, feat BLOB NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS text_features_accessed ON text_features(accessed)")
+        with self._lock:
+            self._recount()
+        self._update_size_metrics()
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, feat, created FROM text_features WHERE key IN ({placeholders})", list(keys)
+            ).fetchall()
+            found = {}
+            for key, blob, created in rows:
+                if self.ttl is not None and now - created > self.ttl:
+                    continue
+                found[key] = torch.from_numpy(np.frombuffer(blob, dtype=np.float32).copy())
+            if found:
+                self._conn.executemany(
+                    "UPDATE text_features SET accessed = ? WHERE key = ?", [(now, key) for key in found]
+                )
+        return found
+
+    def _put_many(self, items):
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, feat.numpy().tobytes(), now, now) for key, feat in items]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO text_features VALUES (?, ?, ?, ?)", rows)
+                # Counting is a table scan, so only reconcile every few thousand writes
+                self._count += len(rows)
+                self._nbytes += sum(len(row[1]) for row in rows)
+                self._writes_since_count += len(rows)
+                if self._count > self.max_entries or self._writes_since_count >= self.RECOUNT_EVERY:
+                    self._recount()
+                    if self._count > self.max_entries:
+                        self._conn.execute(
+                            "DELETE FROM text_features WHERE key IN "
+                            "(SELECT key FROM text_features ORDER BY accessed LIMIT ?)",
+                            (self._count - self.max_entries,),
+                        )
+                        self._recount()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _recount(self) -> None:
+        self._count, self._nbytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(feat)), 0) FROM text_features"
+        ).fetchone()
+        self._writes_since_count = 0
+
+    def _update_size_metrics(self):
+        TEXT_CACHE_ENTRIES.set(self._count)
+        TEXT_CACHE_BYTES.set(self._nbytes)
+
+
+def create_text_cache(
+    backend: str = "memory",
+    max_entries: int = 100_000,
+    max_bytes: int = 256 * 1024 * 1024,
+    ttl: Optional[float] = None,
+    path: str = "text_features.sqlite3",
+) -> TextFeatureCache:
+    """Build a cache backend: "memory", "disk" or "none"."""
+    if backend == "memory":
+        return MemoryTextFeatureCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+    if backend == "disk":
+        return DiskTextFeatureCache(path, max_entries=max_entries, ttl=ttl)
+    if backend == "none":
+        return NullTextFeatureCache()
+    raise ValueError(f"Unknown text cache backend: {backend}")
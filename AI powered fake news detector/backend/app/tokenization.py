@@ -0,0 +1,49 @@
+"""
+Text tokenization for the request path.
+
+Uses the Rust-backed `BertTokenizerFast` and pads a batch only to its longest
+item, rounded up to a multiple of 8, instead of always padding to 128 tokens.
+Padded positions are masked out, so BERT's pooled output is unchanged while a
+short headline costs a fraction of the attention work.
+"""
+
+from typing import List, Tuple
+
+import torch
+from transformers import BertTokenizerFast
+
+from app.metrics import REGISTRY
+
+MAX_LENGTH = 128
+PAD_TO_MULTIPLE_OF = 8
+
+TOKEN_LENGTH = REGISTRY.histogram(
+    "fakenews_token_length",
+    "Number of real (non-padding) tokens per text",
+    buckets=(8, 16, 24, 32, 48, 64, 96, 128),
+)
+PADDED_LENGTH = REGISTRY.histogram(
+    "fakenews_padded_sequence_length",
+    "Sequence length of each tokenized batch after padding",
+    buckets=(8, 16, 24, 32, 48, 64, 96, 128),
+)
+
+
+def load_tokenizer(name_or_path: str = "bert-base-uncased") -> BertTokenizerFast:
+    return BertTokenizerFast.from_pretrained(name_or_path)
+
+
+def tokenize_batch(tokenizer, texts: List[str], pad_to_multiple_of: int = PAD_TO_MULTIPLE_OF) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Tokenize `texts` padded to the longest item (bucketed), returning input_ids and attention_mask."""
+    inputs = tokenizer(
+        texts,
+        padding='longest',
+        truncation=True,
+        max_length=MAX_LENGTH,
+        pad_to_multiple_of=pad_to_multiple_of,
+        return_tensors="pt",
+    )
+    for length in inputs["attention_mask"].sum(dim=1).tolist():
+        TOKEN_LENGTH.observe(length)
+    PADDED_LENGTH.observe(inputs["input_ids"].size(1))
+    return inputs["input_ids"], inputs["attention_mask"]
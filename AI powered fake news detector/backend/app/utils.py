@@ -3,45 +3,44 @@ import requests
 from io import BytesIO
 import torchvision.transforms as transforms
 import torch
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_TRANSFORM = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                         std=[0.229, 0.224, 0.225]),
+])
+
+
+def preprocess_image_bytes(data: bytes) -> torch.Tensor:
+    """Decode raw image bytes into a normalized (1, 3, 224, 224) tensor."""
+    image = Image.open(BytesIO(data)).convert("RGB")
+    return IMAGE_TRANSFORM(image).unsqueeze(0)
+
 
 def preprocess_image_from_url(image_url: str) -> torch.Tensor:
+    """Blocking download + preprocessing; the service uses `app.image_fetcher.ImageFetcher` instead."""
     try:
-        print(f"Fetching image from URL: {image_url}")
         headers = {'User-Agent': 'Mozilla/5.0'}
         response = requests.get(image_url, headers=headers, timeout=10)
         response.raise_for_status()
 
         content_type = response.headers.get('Content-Type', '')
-        print(f"Content-Type: {content_type}")
-        
         if 'image' not in content_type:
-            print(f"Error: Content-Type is not an image: {content_type}")
+            logger.info("Content-Type is not an image: %s", content_type)
             return None
 
-        print("Opening image...")
-        image = Image.open(BytesIO(response.content)).convert("RGB")
-        print(f"Image opened successfully. Size: {image.size}")
-        
-        transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                                 std=[0.229, 0.224, 0.225]),
-        ])
-        
-        print("Applying transformations...")
-        tensor = transform(image).unsqueeze(0)
-        print(f"Image transformed to tensor of shape: {tensor.shape}")
-        return tensor
+        return preprocess_image_bytes(response.content)
 
     except requests.RequestException as e:
-        print(f"Request error: {str(e)}")
+        logger.info("Request error: %s", e)
         return None
     except UnidentifiedImageError as e:
-        print(f"Image identification error: {str(e)}")
+        logger.info("Image identification error: %s", e)
         return None
-    except Exception as e:
-        print(f"Unexpected error in image processing: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Unexpected error in image processing")
         return None
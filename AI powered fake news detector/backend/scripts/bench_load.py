@@ -0,0 +1,336 @@
+"""
+Load and latency benchmark for the /predict service.
+
+Starts the FastAPI app in-process under uvicorn next to a local image server,
+drives `/predict` from `--concurrency` closed-loop clients with a configurable
+mix of text-only and image requests, and reports requests/sec, p50/p95/p99
+latency (overall and per mode), process CPU and memory, and the server-side
+batch, cache and per-stage metrics for the timed window.
+
+The real model is served when its checkpoint exists. Otherwise (or with
+`--stub`) a stub backend with a fixed cost per batch, per text and per image
+stands in for MultiModalModel and a generated vocabulary replaces the BERT
+tokenizer, so the batching, caching and fetching paths can be benchmarked
+offline on any machine. The stub sleeps rather than spins, like torch ops it
+releases the GIL.
+
+The load generator, image server and service share one process, so the CPU and
+memory figures include the client. Server settings come from the usual
+environment variables (BATCH_MAX_SIZE, TEXT_CACHE_BACKEND, ...), which are
+recorded in the output.
+
+Usage (from the backend directory):
+    python -m scripts.bench_load --stub --requests 2000 --concurrency 32 --image-ratio 0.3 --output load.json
+    BATCH_MAX_SIZE=32 TEXT_CACHE_BACKEND=none python -m scripts.bench_load --stub --output no_text_cache.json
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import aiohttp
+import torch
+from aiohttp import web
+from PIL import Image
+
+from scripts.compare_backends import percentile
+
+ENV_PREFIXES = ("MODEL_", "ONNX_", "TOKENIZER_", "BATCH_", "IMAGE_", "TEXT_CACHE_", "PREDICT_", "BULK_")
+
+# Width of the model's text features (MultiModalModel.text_fc), so the text cache holds what it would in production
+TEXT_FEATURES = 256
+
+WORDS = (
+    "government announces new policy study finds scientists confirm local man wins lottery celebrity claims "
+    "moon landing aliens pyramids vaccine election results viral video shows breaking report reveals secret "
+    "plan city council votes tax cut climate change record heat storm warning experts say market crash "
+    "president senator interview leaked documents miracle cure doctors hate this one weird trick"
+).split()
+
+
+class StubBackend:
+    """Stand-in for an inference backend with a fixed cost per call, per text and per image."""
+
+    name = "stub"
+
+    def __init__(self, batch_ms: float, text_ms: float, image_ms: float):
+        self.batch_ms = batch_ms
+        self.text_ms = text_ms
+        self.image_ms = image_ms
+        self.device = torch.device("cpu")
+        self.checkpoint_id = f"stub:{batch_ms}:{text_ms}:{image_ms}"
+
+    def encode_text(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        time.sleep((self.batch_ms + self.text_ms * input_ids.size(0)) / 1000)
+        return torch.zeros(input_ids.size(0), TEXT_FEATURES)
+
+    def classify_features(self, text_feat, image=None, image_mask=None) -> torch.Tensor:
+        images = image.size(0) if image is not None else 0
+        time.sleep((self.batch_ms + self.image_ms * images) / 1000)
+        return torch.randn(text_feat.size(0), 6)
+
+
+def build_stub_tokenizer(directory):
+    from transformers import BertTokenizerFast
+
+    vocab_file = os.path.join(directory, "vocab.txt")
+    with open(vocab_file, "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(WORDS))))
+    return BertTokenizerFast(vocab_file=vocab_file)
+
+
+def make_texts(count, rng):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))) for _ in range(count)]
+
+
+def make_images(count, size, rng):
+    images = []
+    for _ in range(count):
+        image = Image.effect_noise(size, rng.uniform(20, 80)).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+async def start_image_server(images, port):
+    """Serve the generated JPEGs at /images/<n>.jpg with ETags, honouring If-None-Match."""
+
+    async def handle(request):
+        index = int(request.match_info["index"])
+        etag = f'"bench-{index}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=images[index], content_type="image/jpeg", headers={"ETag": etag})
+
+    image_app = web.Application()
+    image_app.router.add_get("/images/{index}.jpg", handle)
+    runner = web.AppRunner(image_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def start_service(app, port):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server, thread
+
+
+async def wait_until_ready(session, base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/ready") as response:
+                if response.status == 200:
+                    return
+                detail = await response.text()
+                if "failed" in detail:
+                    raise RuntimeError(detail)
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Service not ready after {timeout}s")
+
+
+async def drive(session, url, payloads, concurrency):
+    """Send `payloads` from `concurrency` closed-loop clients; return (latency_s, status, mode) per request."""
+    samples = []
+    next_index = iter(range(len(payloads)))
+
+    async def client():
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=payloads[i]) as response:
+                    body = await response.json() if response.status == 200 else None
+                    status = response.status
+            except aiohttp.ClientError:
+                body, status = None, 0
+            mode = body["mode"] if body else ("multimodal" if payloads[i].get("image_url") else "text-only")
+            samples.append((time.perf_counter() - start, status, mode))
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {}
+    return {
+        "count": len(latencies),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def _delta(before, after):
+    if isinstance(after, dict):
+        return {k: _delta((before or {}).get(k), v) for k, v in after.items()}
+    return after - (before or 0)
+
+
+def server_summary(before, after):
+    """Batch, cache and per-stage figures from the metrics registry for the timed window."""
+    delta = _delta(before, after)
+    batch_size = delta["fakenews_batch_size"]
+    stages = delta["fakenews_stage_latency_seconds"]
+    return {
+        "batches": delta["fakenews_batches"],
+        "mean_batch_size": batch_size["sum"] / batch_size["count"] if batch_size["count"] else 0.0,
+        "batch_errors": delta["fakenews_batch_errors"],
+        "image_cache_lookups": delta["fakenews_image_cache_lookups"],
+        "image_fetch_errors": delta["fakenews_image_fetch_errors"],
+        "text_cache_lookups": delta["fakenews_text_cache_lookups"],
+        "stage_mean_ms": {
+            stage: h["sum"] / h["count"] * 1000 for stage, h in stages.items() if h["count"]
+        },
+    }
+
+
+def process_usage():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024  # ru_maxrss is in kilobytes on Linux
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return None
+
+
+async def run(args, main):
+    from app.metrics import REGISTRY
+
+    rng = random.Random(args.seed)
+    texts = make_texts(args.distinct_texts, rng)
+    images = make_images(args.distinct_images, (args.image_size, args.image_size * 3 // 4), rng)
+    image_base = f"http://127.0.0.1:{args.image_port}/images"
+
+    def payload():
+        data = {"text": rng.choice(texts)}
+        if images and rng.random() < args.image_ratio:
+            data["image_url"] = f"{image_base}/{rng.randrange(len(images))}.jpg"
+        return data
+
+    warmup = [payload() for _ in range(args.warmup_requests)]
+    timed = [payload() for _ in range(args.requests)]
+
+    image_server = await start_image_server(images, args.image_port)
+    server, thread = start_service(main.app, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_until_ready(session, base_url, args.ready_timeout)
+            await drive(session, f"{base_url}/predict", warmup, args.concurrency)
+
+            metrics_before = REGISTRY.snapshot()
+            cpu_before, _ = process_usage()
+            start = time.perf_counter()
+            samples = await drive(session, f"{base_url}/predict", timed, args.concurrency)
+            elapsed = time.perf_counter() - start
+            cpu_after, peak_rss_mb = process_usage()
+            metrics_after = REGISTRY.snapshot()
+    finally:
+        server.should_exit = True
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        await image_server.cleanup()
+
+    ok = [latency for latency, status, _ in samples if status == 200]
+    by_mode = {}
+    for latency, status, mode in samples:
+        if status == 200:
+            by_mode.setdefault(mode, []).append(latency)
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "duration_s": elapsed,
+        "rps": len(samples) / elapsed,
+        "latency": latency_summary(ok),
+        "latency_by_mode": {mode: latency_summary(values) for mode, values in sorted(by_mode.items())},
+        "cpu": {"seconds": cpu_after - cpu_before, "percent_of_one_core": (cpu_after - cpu_before) / elapsed * 100},
+        "memory": {"rss_mb": current_rss_mb(), "peak_rss_mb": peak_rss_mb},
+        "server": server_summary(metrics_before, metrics_after),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default="app/models/multimodal_model.pth")
+    parser.add_argument("--stub", action="store_true", help="Use the stub backend even if the checkpoint exists")
+    parser.add_argument("--stub-batch-ms", type=float, default=2.0, help="Stub cost per backend call")
+    parser.add_argument("--stub-text-ms", type=float, default=4.0, help="Stub cost per text encoded (cache misses)")
+    parser.add_argument("--stub-image-ms", type=float, default=8.0, help="Stub cost per image encoded")
+    parser.add_argument("--requests", type=int, default=2000, help="Timed requests")
+    parser.add_argument("--warmup-requests", type=int, default=100, help="Untimed requests sent first")
+    parser.add_argument("--concurrency", type=int, default=32, help="Closed-loop clients")
+    parser.add_argument("--image-ratio", type=float, default=0.3, help="Share of requests with an image")
+    parser.add_argument("--distinct-texts", type=int, default=500, help="Text pool size (controls text cache hits)")
+    parser.add_argument("--distinct-images", type=int, default=50, help="Image pool size (controls image cache hits)")
+    parser.add_argument("--image-size", type=int, default=640, help="Width of the served JPEGs (4:3)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--image-port", type=int, default=8766)
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    use_stub = args.stub or not (os.path.exists(args.model_path) and os.path.getsize(args.model_path) > 0)
+    os.environ["MODEL_PATH"] = os.path.abspath(args.model_path)
+    import app.main as main
+
+    with tempfile.TemporaryDirectory() as vocab_dir:
+        if use_stub:
+            stub = StubBackend(args.stub_batch_ms, args.stub_text_ms, args.stub_image_ms)
+            stub_tokenizer = build_stub_tokenizer(vocab_dir)
+            main.create_backend = lambda *_, **__: stub
+            main.load_tokenizer = lambda *_: stub_tokenizer
+        results = asyncio.run(run(args, main))
+
+    report = {
+        "model": "stub" if use_stub else main.MODEL_BACKEND,
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "port", "image_port")},
+        "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith(ENV_PREFIXES)},
+        "results": results,
+    }
+
+    lat = results["latency"]
+    print(f"model={report['model']} requests={results['requests']} errors={results['errors']} "
+          f"rps={results['rps']:.1f} concurrency={args.concurrency}")
+    if lat:
+        print(f"latency ms: p50={lat['p50_ms']:.1f} p95={lat['p95_ms']:.1f} p99={lat['p99_ms']:.1f} "
+              f"max={lat['max_ms']:.1f}")
+    for mode, mode_lat in results["latency_by_mode"].items():
+        print(f"  {mode:<11} n={mode_lat['count']:<6} p50={mode_lat['p50_ms']:.1f} p95={mode_lat['p95_ms']:.1f} "
+              f"p99={mode_lat['p99_ms']:.1f}")
+    print(f"cpu={results['cpu']['percent_of_one_core']:.0f}% of one core, "
+          f"rss={results['memory']['rss_mb'] or 0:.0f} MB (peak {results['memory']['peak_rss_mb']:.0f} MB), "
+          f"mean batch size={results['server']['mean_batch_size']:.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0 if results["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
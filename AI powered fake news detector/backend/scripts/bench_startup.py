@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark for the fake-news service, run fully offline.
+
+Each run starts a fresh interpreter with HF_HUB_OFFLINE / TRANSFORMERS_OFFLINE
+set, imports `app.main` and runs the same load + warm-up the server does in the
+background, then reports import time, load time, warm-up time, total time to
+ready and the process's peak RSS.
+
+Usage (from the backend directory):
+    python -m scripts.bench_startup --model-path app/models/multimodal_model.pth --runs 3 [--output startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+import app.main as main
+imported = time.perf_counter()
+main.load_model_and_warm_up()
+done = time.perf_counter()
+if not main.ready.is_set():
+    print(json.dumps({"error": main.startup_error}))
+    sys.exit(1)
+print(json.dumps({
+    "import_s": imported - start,
+    "load_s": main.STARTUP_SECONDS.labels(phase="load").value,
+    "warmup_s": main.STARTUP_SECONDS.labels(phase="warmup").value,
+    "ready_s": done - start,
+    # ru_maxrss is in kilobytes on Linux
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+FIELDS = ("import_s", "load_s", "warmup_s", "ready_s", "peak_rss_mb")
+
+
+def run_once(env, cwd):
+    proc = subprocess.run([sys.executable, "-c", CHILD], env=env, cwd=cwd, capture_output=True, text=True)
+    lines = proc.stdout.strip().splitlines()
+    result = json.loads(lines[-1]) if lines else {"error": proc.stderr.strip()[-2000:]}
+    if proc.returncode != 0 or "error" in result:
+        raise RuntimeError(f"Startup failed: {result.get('error')}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default="app/models/multimodal_model.pth")
+    parser.add_argument("--backend", default="torch", help="MODEL_BACKEND to start")
+    parser.add_argument("--tokenizer-path", help="TOKENIZER_PATH (local tokenizer directory)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update({
+        "MODEL_PATH": os.path.abspath(args.model_path),
+        "MODEL_BACKEND": args.backend,
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "LOG_LEVEL": "WARNING",
+    })
+    if args.tokenizer_path:
+        env["TOKENIZER_PATH"] = os.path.abspath(args.tokenizer_path)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    runs = []
+    for i in range(args.runs):
+        result = run_once(env, backend_dir)
+        runs.append(result)
+        print(f"run {i + 1}: " + ", ".join(f"{k}={result[k]:.2f}" for k in FIELDS))
+
+    summary = {k: {"mean": statistics.mean(r[k] for r in runs), "min": min(r[k] for r in runs)} for k in FIELDS}
+    print("mean:  " + ", ".join(f"{k}={summary[k]['mean']:.2f}" for k in FIELDS))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "runs": runs, "summary": summary}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Parity and latency check: fast tokenizer with dynamic padding vs. the original path.
+
+The original request path used the pure-Python `BertTokenizer` with
+`padding='max_length', max_length=128`. This script runs both paths on the same
+texts through the real checkpoint and reports token-id agreement, text-feature
+drift, label agreement and per-text latency.
+
+Usage (from the backend directory):
+    python -m scripts.check_tokenizer_parity --model-path app/models/multimodal_model.pth [--texts texts.txt]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import torch
+from transformers import BertTokenizer
+
+from app.backends import load_torch_model
+from app.tokenization import MAX_LENGTH, load_tokenizer, tokenize_batch
+
+SAMPLE_TEXTS = [
+    "Scientists confirm water is wet",
+    "Local man wins lottery for the third time this year",
+    "BREAKING: Government announces new policy on renewable energy subsidies starting next month",
+    "You won't believe what this celebrity said about the moon landing",
+    "Study finds that people who drink coffee live longer, according to researchers at a major university "
+    "who followed more than half a million participants for over a decade and controlled for smoking, "
+    "diet, alcohol consumption and other lifestyle factors that could influence mortality",
+    "Aliens built the pyramids, claims viral video",
+]
+
+
+def load_texts(path):
+    if not path:
+        return SAMPLE_TEXTS
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default="app/models/multimodal_model.pth")
+    parser.add_argument("--texts", help="File with one text per line (defaults to built-in samples)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--atol", type=float, default=1e-4, help="Maximum allowed text-feature difference")
+    args = parser.parse_args()
+
+    texts = load_texts(args.texts)
+    model = load_torch_model(args.model_path, torch.device("cpu"))
+
+    slow_tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
+    fast_tokenizer = load_tokenizer("bert-base-uncased")
+
+    # Original path: one text at a time, padded to 128 tokens
+    reference_feats, reference_times = [], []
+    with torch.no_grad():
+        for text in texts:
+            start = time.perf_counter()
+            inputs = slow_tokenizer(text, padding='max_length', truncation=True, max_length=MAX_LENGTH, return_tensors="pt")
+            reference_feats.append(model.encode_text(inputs["input_ids"], inputs["attention_mask"])[0])
+            reference_times.append(time.perf_counter() - start)
+
+    # New path: fast tokenizer, padded to the longest item in each batch
+    new_feats, new_times = [], []
+    with torch.no_grad():
+        for i in range(0, len(texts), args.batch_size):
+            chunk = texts[i:i + args.batch_size]
+            start = time.perf_counter()
+            input_ids, attention_mask = tokenize_batch(fast_tokenizer, chunk)
+            new_feats.extend(model.encode_text(input_ids, attention_mask))
+            new_times.extend([(time.perf_counter() - start) / len(chunk)] * len(chunk))
+
+    ids_match = 0
+    for text in texts:
+        slow_ids = slow_tokenizer(text, truncation=True, max_length=MAX_LENGTH)["input_ids"]
+        fast_ids = fast_tokenizer(text, truncation=True, max_length=MAX_LENGTH)["input_ids"]
+        ids_match += slow_ids == fast_ids
+
+    reference = torch.stack(reference_feats)
+    new = torch.stack(new_feats)
+    max_diff = (reference - new).abs().max().item()
+    with torch.no_grad():
+        reference_labels = model.classify_features(reference).argmax(dim=1)
+        new_labels = model.classify_features(new).argmax(dim=1)
+    label_agreement = (reference_labels == new_labels).float().mean().item()
+
+    print(f"Texts:                  {len(texts)}")
+    print(f"Token ids identical:    {ids_match}/{len(texts)}")
+    print(f"Max text-feature diff:  {max_diff:.2e} (atol {args.atol:.0e})")
+    print(f"Label agreement:        {label_agreement:.2%}")
+    print(f"Original path latency:  {statistics.mean(reference_times) * 1000:.1f} ms/text")
+    print(f"New path latency:       {statistics.mean(new_times) * 1000:.1f} ms/text")
+
+    ok = ids_match == len(texts) and max_diff <= args.atol and label_agreement == 1.0
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Accuracy-parity and latency comparison of inference backends against fp32 PyTorch.
+
+For every candidate backend the script reports, relative to the fp32 `torch`
+backend on the same inputs:
+
+* label agreement (share of rows with the same predicted class)
+* confidence drift (mean / max absolute difference of the top-1 confidence)
+* latency (p50 / p95 per batch) and throughput (items/sec) per batch size
+
+Usage (from the backend directory):
+    python -m scripts.compare_backends --backends torch-int8 onnx onnx-int8 \
+        --texts texts.txt --images path/to/images --output report.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+
+from app.backends import create_backend
+from app.tokenization import load_tokenizer, tokenize_batch
+from app.utils import preprocess_image_bytes
+from scripts.check_tokenizer_parity import load_texts
+
+
+def load_images(image_dir, limit):
+    if not image_dir:
+        return []
+    images = []
+    for name in sorted(os.listdir(image_dir))[:limit]:
+        with open(os.path.join(image_dir, name), "rb") as f:
+            images.append(preprocess_image_bytes(f.read()))
+    return images
+
+
+def make_batches(texts, images, batch_size):
+    """Yield (texts, image, image_mask); every other row gets an image when images are available."""
+    for i in range(0, len(texts), batch_size):
+        chunk = texts[i:i + batch_size]
+        mask = [bool(images) and (i + j) % 2 == 0 for j in range(len(chunk))]
+        rows = [images[(i + j) % len(images)] for j, has_image in enumerate(mask) if has_image]
+        yield chunk, torch.cat(rows) if rows else None, torch.tensor(mask)
+
+
+def run(backend, tokenizer, texts, images, batch_size):
+    """Return (softmax probabilities for every row, per-batch latencies)."""
+    probs, latencies = [], []
+    for chunk, image, image_mask in make_batches(texts, images, batch_size):
+        start = time.perf_counter()
+        input_ids, attention_mask = tokenize_batch(tokenizer, chunk)
+        text_feat = backend.encode_text(input_ids.to(backend.device), attention_mask.to(backend.device))
+        image = image.to(backend.device) if image is not None else None
+        logits = backend.classify_features(text_feat, image=image, image_mask=image_mask.to(backend.device))
+        latencies.append(time.perf_counter() - start)
+        probs.append(torch.softmax(logits.float().cpu(), dim=1))
+    return torch.cat(probs), latencies
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default="app/models/multimodal_model.pth")
+    parser.add_argument("--onnx-dir", default="app/models/onnx")
+    parser.add_argument("--backends", nargs="+", default=["torch-int8", "onnx", "onnx-int8"])
+    parser.add_argument("--texts", help="File with one text per line (defaults to built-in samples)")
+    parser.add_argument("--images", help="Directory of image files mixed into every other row")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes over the data per batch size")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    torch.set_grad_enabled(False)
+    texts = load_texts(args.texts)
+    images = load_images(args.images, limit=64)
+    tokenizer = load_tokenizer("bert-base-uncased")
+    device = torch.device("cpu")
+
+    report = {"rows": len(texts), "images": len(images), "backends": {}}
+    reference_probs = None
+    for name in ["torch"] + [b for b in args.backends if b != "torch"]:
+        backend = create_backend(name, args.model_path, args.onnx_dir, device)
+        probs, _ = run(backend, tokenizer, texts, images, batch_size=max(args.batch_sizes))
+        result = {"latency": {}}
+
+        if reference_probs is None:
+            reference_probs = probs
+        else:
+            reference_conf, reference_labels = reference_probs.max(dim=1)
+            labels = probs.argmax(dim=1)
+            drift = (probs.gather(1, labels[:, None])[:, 0] - reference_conf).abs()
+            result["label_agreement"] = (labels == reference_labels).float().mean().item()
+            result["confidence_drift_mean"] = drift.mean().item()
+            result["confidence_drift_max"] = drift.max().item()
+
+        for batch_size in args.batch_sizes:
+            run(backend, tokenizer, texts[:batch_size], images, batch_size)  # warm-up
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                latencies.extend(run(backend, tokenizer, texts, images, batch_size)[1])
+            elapsed = time.perf_counter() - start
+            result["latency"][str(batch_size)] = {
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "mean_ms": statistics.mean(latencies) * 1000,
+                "items_per_sec": len(texts) * args.repeat / elapsed,
+            }
+        report["backends"][name] = result
+
+    print(f"{'backend':<12} {'agree':>7} {'drift(mean/max)':>17} " + " ".join(
+        f"{'bs=' + str(b) + ' p50/p95 ms, items/s':>34}" for b in args.batch_sizes))
+    for name, result in report["backends"].items():
+        agreement = f"{result['label_agreement']:.2%}" if "label_agreement" in result else "ref"
+        drift = (f"{result['confidence_drift_mean']:.4f}/{result['confidence_drift_max']:.4f}"
+                 if "confidence_drift_mean" in result else "-")
+        timings = " ".join(
+            f"{lat['p50_ms']:>9.1f}/{lat['p95_ms']:<9.1f} {lat['items_per_sec']:>12.1f}"
+            for lat in result["latency"].values()
+        )
+        print(f"{name:<12} {agreement:>7} {drift:>17} {timings}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Convert the `.pth` checkpoint to `.safetensors` for zero-copy, memory-mapped loading.
+
+Usage (from the backend directory):
+    python -m scripts.convert_checkpoint app/models/multimodal_model.pth app/models/multimodal_model.safetensors
+
+Then point MODEL_PATH at the `.safetensors` file.
+"""
+
+import argparse
+
+import torch
+from safetensors.torch import save_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="PyTorch state_dict checkpoint (.pth)")
+    parser.add_argument("destination", help="Output .safetensors file")
+    args = parser.parse_args()
+
+    state_dict = torch.load(args.source, map_location="cpu", weights_only=True)
+    save_file({name: tensor.contiguous() for name, tensor in state_dict.items()}, args.destination)
+    print(f"Wrote {len(state_dict)} tensors to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
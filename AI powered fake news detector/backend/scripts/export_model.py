@@ -0,0 +1,112 @@
+"""
+Export the fp32 `MultiModalModel` checkpoint to ONNX for the onnx backends.
+
+Writes three graphs with dynamic batch (and sequence) axes:
+
+* text_encoder.onnx  - BERT + text_fc:      (input_ids, attention_mask) -> text_feat
+* image_encoder.onnx - ResNet50 + image_fc: image -> img_feat
+* head.onnx          - classifier:          combined -> logits
+
+With --quantize, an INT8 dynamic-quantized copy of each graph (`*.int8.onnx`,
+MatMul/Gemm weights only, i.e. the Linear layers) is written next to it.
+
+Usage (from the backend directory):
+    python -m scripts.export_model --model-path app/models/multimodal_model.pth --output-dir app/models/onnx --quantize
+"""
+
+import argparse
+import os
+
+import torch
+import torch.nn as nn
+
+from app.backends import ONNX_HEAD, ONNX_IMAGE_ENCODER, ONNX_TEXT_ENCODER, load_torch_model, onnx_file
+
+OPSET = 14
+
+
+class TextEncoder(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model.encode_text(input_ids, attention_mask)
+
+
+class ImageEncoder(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        return self.model.image_fc(self.model.resnet(image))
+
+
+class Head(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, combined):
+        return self.model.classifier(combined)
+
+
+def export(model, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    batch = {0: "batch"}
+
+    input_ids = torch.randint(1000, 2000, (2, 16), dtype=torch.long)
+    attention_mask = torch.ones_like(input_ids)
+    torch.onnx.export(
+        TextEncoder(model), (input_ids, attention_mask), onnx_file(output_dir, ONNX_TEXT_ENCODER),
+        input_names=["input_ids", "attention_mask"], output_names=["text_feat"],
+        dynamic_axes={"input_ids": {0: "batch", 1: "sequence"}, "attention_mask": {0: "batch", 1: "sequence"},
+                      "text_feat": batch},
+        opset_version=OPSET,
+    )
+    torch.onnx.export(
+        ImageEncoder(model), (torch.randn(2, 3, 224, 224),), onnx_file(output_dir, ONNX_IMAGE_ENCODER),
+        input_names=["image"], output_names=["img_feat"],
+        dynamic_axes={"image": batch, "img_feat": batch},
+        opset_version=OPSET,
+    )
+    torch.onnx.export(
+        Head(model), (torch.randn(2, 512),), onnx_file(output_dir, ONNX_HEAD),
+        input_names=["combined"], output_names=["logits"],
+        dynamic_axes={"combined": batch, "logits": batch},
+        opset_version=OPSET,
+    )
+
+
+def quantize(output_dir):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    for name in (ONNX_TEXT_ENCODER, ONNX_IMAGE_ENCODER, ONNX_HEAD):
+        quantize_dynamic(
+            onnx_file(output_dir, name),
+            onnx_file(output_dir, name, quantized=True),
+            op_types_to_quantize=["MatMul", "Gemm"],
+            weight_type=QuantType.QInt8,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default="app/models/multimodal_model.pth")
+    parser.add_argument("--output-dir", default="app/models/onnx")
+    parser.add_argument("--quantize", action="store_true", help="Also write INT8 dynamic-quantized graphs")
+    args = parser.parse_args()
+
+    model = load_torch_model(args.model_path, torch.device("cpu"))
+    with torch.no_grad():
+        export(model, args.output_dir)
+    print(f"Exported ONNX graphs to {args.output_dir}")
+
+    if args.quantize:
+        quantize(args.output_dir)
+        print(f"Wrote INT8 graphs to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
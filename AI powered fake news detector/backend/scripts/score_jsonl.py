@@ -0,0 +1,69 @@
+"""
+Offline bulk scoring of a JSONL file, without the HTTP server.
+
+Each input line is a JSON object with `text`, an optional `image_url` and an
+optional `id` (echoed back). Images are fetched concurrently, items are scored
+in batches by the same scheduler the API uses, and results are written to the
+output in input order, one JSON object per line. Memory stays bounded by
+`--window`, whatever the size of the input. Throughput is printed at the end.
+
+Usage (from the backend directory):
+    python -m scripts.score_jsonl articles.jsonl scores.jsonl [--window 256] [--batch-size 32]
+
+The model, backend and caches are configured through the same environment
+variables as the server (MODEL_PATH, MODEL_BACKEND, IMAGE_CACHE_DIR, ...).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+
+async def run(args):
+    # Imported here so --batch-size can be applied through the environment first
+    import app.main as main
+    from app.bulk import BulkStats, aiter_file_lines, score_lines
+
+    await main.image_fetcher.start()
+    await main.scheduler.start()
+    try:
+        await asyncio.get_running_loop().run_in_executor(main.scheduler.executor, main.load_model_and_warm_up)
+        if not main.ready.is_set():
+            raise SystemExit(f"Model failed to load: {main.startup_error}")
+
+        stats = BulkStats()
+        with open(args.input, "r", encoding="utf-8") as src, open(args.output, "w", encoding="utf-8") as dst:
+            async for result in score_lines(aiter_file_lines(src), main.score_item, window=args.window, stats=stats):
+                dst.write(json.dumps(result) + "\n")
+                if args.progress and stats.items % args.progress == 0:
+                    print(f"{stats.items} items, {stats.items_per_sec:.1f} items/sec", file=sys.stderr)
+    finally:
+        await main.scheduler.stop()
+        await main.image_fetcher.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one {text, image_url, id} object per line")
+    parser.add_argument("output", help="JSONL file to write the results to")
+    parser.add_argument("--window", type=int, default=256, help="Items in flight (image fetch + inference)")
+    parser.add_argument("--batch-size", type=int, help="Maximum items per forward pass (BATCH_MAX_SIZE)")
+    parser.add_argument("--progress", type=int, default=10000, help="Report progress every N items (0 disables)")
+    args = parser.parse_args()
+
+    if args.batch_size:
+        os.environ["BATCH_MAX_SIZE"] = str(args.batch_size)
+
+    stats = asyncio.run(run(args))
+    print(
+        f"Scored {stats.items} items ({stats.errors} errors) in {stats.seconds:.1f}s: "
+        f"{stats.items_per_sec:.1f} items/sec",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""A local image server for the image fetcher tests."""
+
+import io
+import random
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from PIL import Image
+
+
+def make_images(count, size=(320, 240), seed=0):
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.effect_noise(size, rng.uniform(20, 80)).convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        images.append(buffer.getvalue())
+    return images
+
+
+class ImageServer:
+    """Serves `images` at /images/<n>.jpg with ETags, honouring If-None-Match, and counts the requests."""
+
+    def __init__(self, images):
+        self.images = list(images)
+        self.etags = [f'"v1-{index}"' for index in range(len(images))]
+        self.requests = 0
+        self.base_url = None
+
+    def url(self, index=0):
+        return f"{self.base_url}/images/{index}.jpg"
+
+    async def handle(self, request):
+        self.requests += 1
+        index = int(request.match_info["index"])
+        etag = self.etags[index]
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=self.images[index], content_type="image/jpeg", headers={"ETag": etag})
+
+
+@asynccontextmanager
+async def serve_images(images):
+    server = ImageServer(images)
+    app = web.Application()
+    app.router.add_get("/images/{index}.jpg", server.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    host, port = runner.addresses[0][:2]
+    server.base_url = f"http://{host}:{port}"
+    try:
+        yield server
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture(scope="session")
+def images():
+    return make_images(4)
+
+
+@pytest.fixture
+def image_server(images):
+    """`async with image_server() as server:` runs the server for the block."""
+    return lambda: serve_images(images)
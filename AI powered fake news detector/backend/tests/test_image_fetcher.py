@@ -0,0 +1,166 @@
+"""
+ImageFetcher against a local image server (see conftest.py).
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+
+import asyncio
+import os
+
+from app.image_fetcher import IMAGE_CACHE_LOOKUPS, IMAGE_FETCH_ERRORS, DiskTensorStore, ImageFetcher
+
+
+def lookups(result):
+    return IMAGE_CACHE_LOOKUPS.labels(result=result).value
+
+
+def tensor_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".pt"))
+
+
+def test_repeated_image_skips_download_and_decode(image_server):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher(ttl=300.0)
+            try:
+                misses, hits = lookups("miss"), lookups("memory")
+                first = await fetcher.fetch(server.url())
+                second = await fetcher.fetch(server.url())
+            finally:
+                await fetcher.close()
+        assert first.shape == (1, 3, 224, 224)
+        assert second is first
+        assert server.requests == 1
+        assert lookups("miss") == misses + 1
+        assert lookups("memory") == hits + 1
+
+    asyncio.run(main())
+
+
+def test_expired_entry_is_revalidated_with_etag(image_server):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher(ttl=0.0)
+            try:
+                misses, revalidated = lookups("miss"), lookups("revalidated")
+                first = await fetcher.fetch(server.url())
+                second = await fetcher.fetch(server.url())
+            finally:
+                await fetcher.close()
+        assert second is first
+        assert lookups("miss") == misses + 1
+        assert lookups("revalidated") == revalidated + 1
+
+    asyncio.run(main())
+
+
+def test_disk_cache_is_shared_between_fetchers(image_server, tmp_path):
+    async def main():
+        async with image_server() as server:
+            writer = ImageFetcher(cache_dir=str(tmp_path))
+            try:
+                tensor = await writer.fetch(server.url())
+            finally:
+                await writer.close()
+        # The server is gone: only the disk cache can answer
+        reader = ImageFetcher(cache_dir=str(tmp_path))
+        try:
+            disk = lookups("disk")
+            cached = await reader.fetch(server.url())
+        finally:
+            await reader.close()
+        assert lookups("disk") == disk + 1
+        assert cached.equal(tensor)
+
+    asyncio.run(main())
+
+
+def test_changed_image_replaces_its_old_tensor_on_disk(image_server, images, tmp_path):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher(cache_dir=str(tmp_path), ttl=0.0)
+            try:
+                await fetcher.fetch(server.url())
+                before = tensor_files(tmp_path)
+                server.images[0], server.etags[0] = images[1], '"v2-0"'
+                changed = await fetcher.fetch(server.url())
+            finally:
+                await fetcher.close()
+        after = tensor_files(tmp_path)
+        assert len(before) == len(after) == 1 and before != after
+        assert DiskTensorStore(str(tmp_path)).get(server.url()).tensor.equal(changed)
+
+    asyncio.run(main())
+
+
+def test_disk_cache_evicts_least_recently_used(image_server, tmp_path):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher(cache_dir=str(tmp_path), memory_cache_size=0)
+            try:
+                await fetcher.fetch(server.url(0))
+                tensor_bytes = os.path.getsize(os.path.join(tmp_path, tensor_files(tmp_path)[0]))
+                # Room for two and a half tensors
+                fetcher.disk.max_bytes = int(tensor_bytes * 2.5)
+                await fetcher.fetch(server.url(1))
+                # Reading image 0 makes image 1 the least recently used
+                await asyncio.sleep(0.01)
+                assert fetcher.disk.get(server.url(0)) is not None
+                await fetcher.fetch(server.url(2))
+            finally:
+                await fetcher.close()
+            disk = fetcher.disk
+        assert len(tensor_files(tmp_path)) == 2
+        assert disk.get(server.url(1)) is None
+        assert disk.get(server.url(0)) is not None and disk.get(server.url(2)) is not None
+        assert disk._nbytes <= disk.max_bytes
+
+    asyncio.run(main())
+
+
+def test_concurrent_fetches_share_one_download(image_server):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher()
+            try:
+                tensors = await asyncio.gather(*(fetcher.fetch(server.url()) for _ in range(8)))
+            finally:
+                await fetcher.close()
+        assert server.requests == 1
+        assert all(tensor is tensors[0] for tensor in tensors)
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_others(image_server):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher()
+            try:
+                callers = [asyncio.ensure_future(fetcher.fetch(server.url())) for _ in range(3)]
+                await asyncio.sleep(0)
+                # The caller that started the download goes away mid-download
+                callers[0].cancel()
+                results = await asyncio.gather(*callers, return_exceptions=True)
+            finally:
+                await fetcher.close()
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1] is not None and results[2] is results[1]
+
+    asyncio.run(main())
+
+
+def test_oversized_image_is_rejected(image_server, images):
+    async def main():
+        async with image_server() as server:
+            fetcher = ImageFetcher(max_bytes=len(images[0]) - 1)
+            try:
+                rejected = IMAGE_FETCH_ERRORS.labels(reason="too_large").value
+                tensor = await fetcher.fetch(server.url())
+            finally:
+                await fetcher.close()
+        assert tensor is None
+        assert IMAGE_FETCH_ERRORS.labels(reason="too_large").value == rejected + 1
+
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Per-query overhead of connect-per-query vs. long-lived database clients.
+
+SQLite (a copy of Student.db, so the original file is left as it is): the
+same small queries through the old read_sql_query (connect, execute,
+fetchall, close) and through SQLitePool. The questions repeat, so the pool's
+statement cache is exercised as the app would.
+
+MongoDB: the same finds through a new client per query (get_mongo_client,
+then close) and through MongoPool's single client. By default the stand-in is
+mongomock, loaded with the rows of Student.db; pass --mongo-uri to measure a
+real server (the collection is then read as is). A new real MongoClient also
+starts server discovery, which mongomock doesn't model, so the construction
+cost of a pymongo client is reported separately.
+
+    python bench_db_clients.py [--repeat 500] [--mongo-uri mongodb://localhost:27017/]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from pymongo import MongoClient
+
+from db_clients import MongoPool, SQLitePool
+
+SQL_QUERIES = [
+    "SELECT * FROM STUDENT WHERE CLASS = '8th';",
+    "SELECT COUNT(*) FROM STUDENT WHERE SECTION = 'A';",
+    "SELECT NAME FROM STUDENT WHERE MARKS > 90;",
+    "SELECT AVG(ATTENDANCE) FROM STUDENT WHERE CLASS = '9th';",
+]
+
+MONGO_QUERIES = [{"class": "8th"}, {"section": "A"}, {"marks": {"$gt": 90}}, {"city": "New York"}]
+DEFAULT_MONGO_URI = "mongodb://localhost:27017/"
+FIELDS = ["name", "age", "class", "section", "marks", "subject", "attendance", "city"]
+
+
+def per_query_us(fn, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            fn(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def connect_per_query(db):
+    def run(sql):
+        conn = sqlite3.connect(db)
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    return run
+
+
+def bench_sqlite(args, directory):
+    db = os.path.join(directory, "Student.db")
+    shutil.copy(args.db, db)
+    before = per_query_us(connect_per_query(db), SQL_QUERIES, args.repeat)
+    pool = SQLitePool(db)
+    pool.query(SQL_QUERIES[0])
+    after = per_query_us(pool.query, SQL_QUERIES, args.repeat)
+    pool.close()
+    return before, after
+
+
+def bench_mongo(args):
+    uri = args.mongo_uri or DEFAULT_MONGO_URI
+    if args.mongo_uri:
+        factory = MongoClient
+    else:
+        import mongomock
+        factory = mongomock.MongoClient
+        with sqlite3.connect(args.db) as conn:
+            rows = conn.execute("SELECT * FROM STUDENT").fetchall()
+        # mongomock clients on the same URI share their data
+        factory(uri)["text_to_sql"]["students"].insert_many(
+            [dict(zip(FIELDS, row)) for row in rows]
+        )
+    repeat = max(1, args.repeat // 10) if args.mongo_uri else args.repeat
+
+    def new_client(query):
+        client = factory(uri, serverSelectionTimeoutMS=5000)
+        results = list(client["text_to_sql"]["students"].find(query))
+        client.close()
+        return results
+
+    pool = MongoPool(uri, client_factory=factory)
+
+    def pooled(query):
+        return list(pool.collection("text_to_sql", "students").find(query))
+
+    before = per_query_us(new_client, MONGO_QUERIES, repeat)
+    pooled(MONGO_QUERIES[0])
+    after = per_query_us(pooled, MONGO_QUERIES, repeat)
+    pool.close()
+    return before, after
+
+
+def pymongo_construction_us(repeat=50):
+    """Cost of MongoClient() + close() alone; no server is needed since discovery runs in the background."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        MongoClient("mongodb://127.0.0.1:1/", serverSelectionTimeoutMS=100, connect=True).close()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="Student.db")
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--mongo-uri", help="Real MongoDB server (default: mongomock)")
+    args = parser.parse_args()
+
+    print(f"{'backend':<10} {'per query µs':>13} {'pooled µs':>10} {'saved µs':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [("sqlite", *bench_sqlite(args, directory))]
+    rows.append(("mongodb" if args.mongo_uri else "mongomock", *bench_mongo(args)))
+    for name, before, after in rows:
+        print(f"{name:<10} {before:>13.1f} {after:>10.1f} {before - after:>9.1f} {before / after:>7.1f}x")
+    print(f"pymongo MongoClient() + close(): {pymongo_construction_us():.0f} µs per client, "
+          "before any server discovery round trips")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Query cache hit rate and latency against the mock Ollama server.
+
+Asks a workload of questions, their rewordings, variants about other
+values (another class, section or city) and adversarial variants that keep
+almost every word but ask for something else (a negation, the opposite or
+an inclusive comparison, an aggregate, another sort column, "or" for "and")
+through the same path as sql.py:
+cache lookup, then on a miss the LLM (mock_ollama.py, `--delay` seconds per
+query) and a run against Student.db before the query is stored. Reports hits
+per tier, LLM calls, mean latency of hits and misses, and how many cache
+hits returned a different query than the LLM would have generated.
+
+    python bench_query_cache.py [--delay 0.5] [--threshold 0.9] [--embedder hashing|ollama]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import ollama_client
+from mock_ollama import start_server
+from query_cache import DEFAULT_THRESHOLD, HashingEmbedder, OllamaEmbedder, QueryCache, prompt_version
+
+PROMPT = ["Generate the SQL query for the following question:\n"]
+
+LONG_QUESTION = "Show the name, age and city of students in class 8th section A with marks above 90"
+
+# Rounds of questions: the first asks each once, later rounds reword them, change a value
+# or change what is asked
+WORKLOAD = [
+    [
+        "List all students in class 8th",
+        "How many students are in section A?",
+        "Show names of students who scored more than 90 marks",
+        "Find students from New York",
+        "What is the average attendance of 9th class students?",
+        LONG_QUESTION,
+        "List the students in class 8th section A sorted by name",
+        "Show students in class 8th and section B",
+        "Show names of students with marks greater than 80",
+    ],
+    [
+        "list all students in class 8th.",
+        "How many students are in section A",
+        "Show the names of students who scored more than 90 marks",
+        "Find all students from New York",
+        "What is the average attendance of the 9th class students?",
+        LONG_QUESTION.replace("Show", "List"),
+    ],
+    [
+        "Display all students in class 8th",
+        "How many students are there in section A?",
+        "Names of students who scored more than 90 marks",
+        "Show students from New York",
+        "What's the average attendance of 9th class students?",
+        LONG_QUESTION.replace("Show", "Display"),
+    ],
+    [
+        "List all students in class 7th",
+        "How many students are in section B?",
+        "Show names of students who scored more than 80 marks",
+        "Find students from Chicago",
+        "What is the average attendance of 8th class students?",
+    ],
+    [
+        LONG_QUESTION.replace("above", "below"),
+        LONG_QUESTION.replace("in class", "not in class"),
+        LONG_QUESTION.replace("Show", "Count"),
+        "Show names of students who scored less than 90 marks",
+        "How many students are not in section A?",
+        "List the students in class 8th section A sorted by marks",
+        "Show students in class 8th or section B",
+        "Show names of students with marks greater than or equal to 80",
+    ],
+]
+
+
+def run(args, url):
+    directory = tempfile.mkdtemp()
+    embedder = OllamaEmbedder("mock", url) if args.embedder == "ollama" else HashingEmbedder()
+    conn = sqlite3.connect(args.db)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(STUDENT)")]
+    cache = QueryCache(os.path.join(directory, "query_cache.db"), embedder, args.threshold, columns)
+    version = prompt_version(PROMPT, ollama_client.OLLAMA_MODEL)
+    latencies = {"hit": [], "miss": []}
+    wrong = []
+
+    for round_questions in WORKLOAD:
+        for question in round_questions:
+            start = time.perf_counter()
+            sql, tier, similarity = cache.get(question, "SQLite", version)
+            if sql is None:
+                sql = ollama_client.generate(PROMPT[0] + question, url=url)
+                conn.execute(sql).fetchall()
+                cache.put(question, "SQLite", version, sql)
+                latencies["miss"].append(time.perf_counter() - start)
+            else:
+                conn.execute(sql).fetchall()
+                latencies["hit"].append(time.perf_counter() - start)
+                expected = ollama_client.generate(PROMPT[0] + question, url=url, timeout=args.delay + 30)
+                if expected != sql:
+                    wrong.append((question, sql, expected))
+            print(f"  {tier or 'miss':<9} {similarity:5.2f}  {question}")
+    conn.close()
+    cache.close()
+    return cache, latencies, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.5, help="Mock LLM seconds per query")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--embedder", choices=["hashing", "ollama"], default="hashing")
+    parser.add_argument("--db", default="Student.db")
+    args = parser.parse_args()
+
+    server = start_server(delay=args.delay)
+    url = f"http://127.0.0.1:{server.server_port}"
+    cache, latencies, wrong = run(args, url)
+    server.shutdown()
+
+    questions = sum(len(round_questions) for round_questions in WORKLOAD)
+    mean = lambda values: sum(values) / len(values) * 1000 if values else 0.0
+    print(f"\n{questions} questions: {cache.stats['exact']} exact hits, {cache.stats['semantic']} semantic hits, "
+          f"{cache.stats['misses']} misses ({cache.hit_rate():.0%} hit rate)")
+    print(f"LLM queries generated: {cache.stats['misses']} instead of {questions}")
+    print(f"mean latency: hit {mean(latencies['hit']):.1f} ms, miss {mean(latencies['miss']):.1f} ms")
+    print(f"hits with a different query than the LLM's: {len(wrong)}")
+    for question, cached, expected in wrong:
+        print(f"  {question!r}: cached {cached!r}, LLM {expected!r}")
+
+
+if __name__ == "__main__":
+    main()
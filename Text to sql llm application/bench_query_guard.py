@@ -0,0 +1,137 @@
+"""
+Query guard and index advisor on a scaled-up STUDENT table.
+
+Builds a STUDENT table of `--rows` rows from the sqlite.py seed rows (via
+Student.db, as bench_results.py does), then:
+
+1. Runs generated-looking queries, from plain filters to cartesian joins and
+   correlated subqueries, without the guard (the previous behaviour, cut
+   off after `--unguarded-limit` seconds so the run finishes) and with it:
+   the plan check, an added LIMIT or a rejection, and the statement time
+   limit. Each query's rows are read up to the row cap.
+2. Repeats a workload of filters on CLASS, SECTION, MARKS and CITY, creates
+   the indexes the advisor recommends, and times the workload again.
+
+    python bench_query_guard.py [--rows 200000] [--timeout 5] [--unguarded-limit 20]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from bench_results import build_table
+from db_clients import SQLitePool, StatementTimeout
+from query_guard import QueryGuard, QueryRejected
+from results import sqlite_result
+
+QUERIES = [
+    "SELECT * FROM STUDENT WHERE CLASS = '8th';",
+    "SELECT COUNT(*) FROM STUDENT WHERE SECTION = 'A';",
+    "SELECT CLASS, AVG(MARKS) FROM STUDENT GROUP BY CLASS;",
+    "SELECT a.NAME, b.NAME FROM STUDENT a JOIN STUDENT b ON a.CITY = b.CITY;",
+    "SELECT a.NAME, b.NAME FROM STUDENT a, STUDENT b WHERE a.MARKS + b.MARKS > 200;",
+    "SELECT COUNT(*) FROM STUDENT a, STUDENT b;",
+    "SELECT a.NAME FROM STUDENT a JOIN STUDENT b ON a.CITY = b.CITY ORDER BY a.MARKS;",
+    "SELECT * FROM STUDENT s WHERE MARKS = (SELECT MAX(MARKS) FROM STUDENT t WHERE t.CLASS = s.CLASS);",
+]
+
+WORKLOAD = [
+    "SELECT COUNT(*) FROM STUDENT WHERE SECTION = 'A';",
+    "SELECT AVG(ATTENDANCE) FROM STUDENT WHERE CLASS = '9th';",
+    "SELECT NAME FROM STUDENT WHERE CITY = 'Boston' AND MARKS > 95;",
+    "SELECT COUNT(*) FROM STUDENT WHERE MARKS > 98;",
+    "SELECT NAME, MARKS FROM STUDENT WHERE CITY = 'Denver' AND SECTION = 'B';",
+]
+
+
+def read_all(pool, sql, timeout):
+    """Seconds to run a query and read its rows up to the row cap, and how it ended."""
+    start = time.perf_counter()
+    try:
+        result = sqlite_result(pool, sql, timeout=timeout)
+        index = 1
+        while result.page(index) is not None:
+            index += 1
+        outcome = f"{result.rows} rows"
+        result.close()
+    except StatementTimeout:
+        outcome = "timed out"
+    return time.perf_counter() - start, outcome
+
+
+def guarded(guard, pool, sql, timeout):
+    start = time.perf_counter()
+    try:
+        checked = guard.check(sql)
+    except QueryRejected:
+        return time.perf_counter() - start, "rejected", None
+    seconds, outcome = read_all(pool, checked.sql, timeout)
+    return time.perf_counter() - start, f"{checked.action}, {outcome}", checked.cost
+
+
+def run_workload(pool, guard, rounds):
+    """Mean milliseconds of each workload query (plan check included)."""
+    totals = [0.0] * len(WORKLOAD)
+    for _ in range(rounds):
+        for i, sql in enumerate(WORKLOAD):
+            start = time.perf_counter()
+            checked = guard.check(sql)
+            read_all(pool, checked.sql, None)
+            totals[i] += time.perf_counter() - start
+    return [total / rounds * 1e3 for total in totals]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Statement time limit with the guard")
+    parser.add_argument("--unguarded-limit", type=float, default=20.0,
+                        help="Seconds after which an unguarded query is cut off")
+    parser.add_argument("--rounds", type=int, default=5, help="Workload repetitions")
+    parser.add_argument("--seed-db", default="Student.db")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, "students.db")
+        build_table(db, args.seed_db, args.rows)
+        pool = SQLitePool(db)
+        guard = QueryGuard(pool, index_after=args.rounds)
+        print(f"{args.rows} rows, cost budget {guard.budget:,} rows, statement time limit {args.timeout:g}s")
+
+        print(f"\n{'query':<60} {'unguarded s':>12} {'guarded s':>10} {'est. rows':>15}  outcome")
+        for sql in QUERIES:
+            before, before_outcome = read_all(pool, sql, args.unguarded_limit)
+            if before_outcome == "timed out":
+                before_outcome = "cut off"
+            after, outcome, cost = guarded(guard, pool, sql, args.timeout)
+            cost = "-" if cost is None else f"{cost:,.0f}"
+            label = sql if len(sql) <= 60 else sql[:57] + "..."
+            print(f"{label:<60} {before:>12.3f} {after:>10.3f} {cost:>15}  {before_outcome} -> {outcome}")
+
+        start = time.perf_counter()
+        for _ in range(200):
+            guard.check(WORKLOAD[0])
+        print(f"\nplan check: {(time.perf_counter() - start) / 200 * 1e6:.0f} µs per query")
+
+        guard.filter_scans.clear()
+        before = run_workload(pool, guard, args.rounds)
+        recommendations = guard.recommendations()
+        for table, column, scans, statement in recommendations:
+            print(f"{scans} full scans filtering on {column.upper()}: {statement}")
+        start = time.perf_counter()
+        for table, column, _, _ in recommendations:
+            guard.create_index(table, column)
+        built = time.perf_counter() - start
+        after = run_workload(pool, guard, args.rounds)
+        print(f"{len(recommendations)} indexes built in {built:.2f}s")
+        print(f"\n{'workload query':<72} {'no index ms':>12} {'indexed ms':>11} {'speedup':>8}")
+        for sql, no_index, indexed in zip(WORKLOAD, before, after):
+            print(f"{sql:<72} {no_index:>12.1f} {indexed:>11.1f} {no_index / indexed:>7.1f}x")
+        print(f"{'mean':<72} {sum(before) / len(before):>12.1f} {sum(after) / len(after):>11.1f} "
+              f"{sum(before) / sum(after):>7.1f}x")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Peak memory and time-to-first-row of fetchall() vs. paged results on a large table.
+
+Builds a STUDENT table of `--rows` rows (default one million) from the seed
+rows in Student.db (the sqlite.py data, with numbered names and varied marks
+and attendance), then runs `SELECT * FROM STUDENT` in a fresh process per
+mode and reports time until the first rows can be shown and peak memory
+above the process's baseline:
+
+* `fetchall`: the old path, cursor.fetchall() then a DataFrame of every row
+* `paged`: results.sqlite_result, first page as a DataFrame
+* `paged to cap`: the same, then every page up to the row cap
+
+    python bench_results.py [--rows 1000000] [--page-size 100] [--row-cap 10000]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ["fetchall", "paged", "paged to cap"]
+COLUMNS = "NAME, AGE, CLASS, SECTION, MARKS, SUBJECT, ATTENDANCE, CITY"
+
+
+def build_table(path, seed_db, rows):
+    with sqlite3.connect(seed_db) as seed:
+        seed_rows = seed.execute(f"SELECT {COLUMNS} FROM STUDENT").fetchall()
+    rng = random.Random(0)
+
+    def generated():
+        for i in range(rows):
+            name, age, klass, section, marks, subject, attendance, city = seed_rows[i % len(seed_rows)]
+            yield (f"{name} {i}", age, klass, section, max(0, min(100, marks + rng.randint(-10, 10))),
+                   subject, round(max(0.0, min(100.0, attendance + rng.uniform(-5, 5))), 1), city)
+
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE STUDENT(NAME VARCHAR(50), AGE INT, CLASS VARCHAR(10), SECTION VARCHAR(5), "
+        "MARKS INT, SUBJECT VARCHAR(30), ATTENDANCE FLOAT, CITY VARCHAR(30))"
+    )
+    conn.executemany(f"INSERT INTO STUDENT ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", generated())
+    conn.commit()
+    conn.close()
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(mode, db, page_size, row_cap):
+    """Run one mode in this (fresh) process and print its measurements as JSON."""
+    import pandas as pd
+    import pyarrow  # noqa: F401  (imported up front, so its import isn't counted as result memory)
+
+    from db_clients import SQLitePool
+    from results import sqlite_result
+
+    sql = "SELECT * FROM STUDENT"
+    pool = SQLitePool(db)
+    pool.query("SELECT 1")
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == "fetchall":
+        conn = sqlite3.connect(db)
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        conn.close()
+        frame = pd.DataFrame(rows)
+        first_row = time.perf_counter() - start
+        shown = len(frame)
+    else:
+        result = sqlite_result(pool, sql, page_size, row_cap)
+        frame = result.page(0).to_pandas()
+        first_row = time.perf_counter() - start
+        shown = len(frame)
+        if mode == "paged to cap":
+            index = 1
+            while result.page(index) is not None:
+                shown += result.page(index).num_rows
+                index += 1
+        result.close()
+    total = time.perf_counter() - start
+    print(json.dumps({"first_row_s": first_row, "total_s": total, "rows": shown,
+                      "peak_mb": peak_rss_mb() - baseline}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--row-cap", type=int, default=10_000)
+    parser.add_argument("--seed-db", default="Student.db")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], args.child[1], args.page_size, args.row_cap)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = os.path.join(directory, "students.db")
+        start = time.perf_counter()
+        build_table(db, args.seed_db, args.rows)
+        size_mb = os.path.getsize(db) / 1e6
+        print(f"{args.rows} rows ({size_mb:.0f} MB) built in {time.perf_counter() - start:.1f}s; "
+              f"page size {args.page_size}, row cap {args.row_cap}")
+        print(f"{'mode':<13} {'first row s':>12} {'total s':>8} {'rows':>8} {'peak MB':>8}")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, db,
+                 "--page-size", str(args.page_size), "--row-cap", str(args.row_cap)],
+                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<13} {result['first_row_s']:>12.3f} {result['total_s']:>8.3f} {result['rows']:>8} "
+                  f"{result['peak_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
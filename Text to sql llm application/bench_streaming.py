@@ -0,0 +1,117 @@
+"""
+Time-to-query of blocking vs. streaming generation against the mock Ollama server.
+
+The mock (mock_ollama.py) waits `--delay` seconds, then generates
+`--token-rate` tokens per second; unless `--no-chatty`, it wraps each query
+in a preamble and an explanation. For the same questions the script
+times until the query is available:
+
+* `blocking`: a new connection per request with "stream": false, the old
+  get_llama_response (the whole completion is generated before it returns)
+* `stream`: the pooled streaming client, reading the whole completion
+* `early stop`: the pooled streaming client with `extract_sql` /
+  `extract_mongo`, which hangs up once the query is complete
+
+and reports mean and p95 time-to-query, tokens the server generated per
+question, cancelled generations, and whether every mode got the same query.
+
+    python bench_streaming.py [--token-rate 30] [--delay 0.2] [--no-chatty]
+"""
+
+import argparse
+import time
+
+import requests
+
+import ollama_client
+from mock_ollama import start_server
+
+SQL_PROMPT = "Generate the SQL query for the following question:\n"
+MONGO_PROMPT = "Generate the MongoDB query for the following question:\n"
+
+QUESTIONS = [
+    (SQL_PROMPT, "List all students in class 8th"),
+    (SQL_PROMPT, "How many students are in section A?"),
+    (SQL_PROMPT, "Show names of students who scored more than 90 marks"),
+    (SQL_PROMPT, "Find students from New York in section B"),
+    (MONGO_PROMPT, "List all students in class 8th"),
+    (MONGO_PROMPT, "Show students from Chicago who scored more than 85 marks"),
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def blocking(prompt, extract, url):
+    response = requests.post(
+        f"{url}/api/generate",
+        json={'model': ollama_client.OLLAMA_MODEL, 'prompt': prompt, 'stream': False,
+              'options': {'temperature': 0.1}},
+        timeout=120
+    )
+    text = response.json()['response']
+    # Same extraction as the streaming modes, so only the timing differs
+    return extract(text) or text
+
+
+def extract_for(prompt):
+    return ollama_client.extract_mongo if prompt is MONGO_PROMPT else ollama_client.extract_sql
+
+
+def run(mode, url, server):
+    before = dict(server.counts)
+    latencies, queries = [], []
+    for prompt, question in QUESTIONS:
+        extract = extract_for(prompt)
+        start = time.perf_counter()
+        if mode == "blocking":
+            query = blocking(prompt + question, extract, url)
+        elif mode == "stream":
+            text = ollama_client.generate(prompt + question, url=url)
+            query = extract(text) or text
+        else:
+            query = ollama_client.generate(prompt + question, url=url, extract=extract)
+        latencies.append(time.perf_counter() - start)
+        queries.append(query)
+    # Let the server notice cancelled streams before reading its counters
+    time.sleep(0.2)
+    return {
+        "mean_s": sum(latencies) / len(latencies),
+        "p95_s": percentile(latencies, 0.95),
+        "tokens": (server.counts["tokens"] - before["tokens"]) / len(QUESTIONS),
+        "cancelled": server.counts["cancelled"] - before["cancelled"],
+        "queries": queries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--token-rate", type=float, default=30.0, help="Mock tokens per second")
+    parser.add_argument("--delay", type=float, default=0.2, help="Mock seconds before the first token")
+    parser.add_argument("--no-chatty", action="store_true", help="Mock answers with the bare query")
+    args = parser.parse_args()
+
+    server = start_server(delay=args.delay, token_rate=args.token_rate, chatty=not args.no_chatty)
+    url = f"http://127.0.0.1:{server.server_port}"
+    print(f"{len(QUESTIONS)} questions, {args.delay}s to first token, {args.token_rate:g} tokens/s, "
+          f"{'bare' if args.no_chatty else 'chatty'} answers")
+    print(f"{'mode':<11} {'mean s':>7} {'p95 s':>7} {'tokens':>7} {'cancelled':>10} {'speedup':>8}")
+
+    results = {}
+    for mode in ("blocking", "stream", "early stop"):
+        results[mode] = result = run(mode, url, server)
+        speedup = results["blocking"]["mean_s"] / result["mean_s"]
+        print(f"{mode:<11} {result['mean_s']:>7.2f} {result['p95_s']:>7.2f} {result['tokens']:>7.0f} "
+              f"{result['cancelled']:>10} {speedup:>7.2f}x")
+    server.shutdown()
+
+    same = all(result["queries"] == results["blocking"]["queries"] for result in results.values())
+    print(f"same queries in every mode: {same}")
+    for (prompt, question), query in zip(QUESTIONS, results["early stop"]["queries"]):
+        print(f"  {question!r} -> {query}")
+
+
+if __name__ == "__main__":
+    main()
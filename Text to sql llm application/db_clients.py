@@ -0,0 +1,196 @@
+"""
+Long-lived database clients shared by every question in the process.
+
+SQLite: a small pool of read-only connections to the database file. They are
+opened once, so each query skips connecting, and the sqlite3 module's
+per-connection statement cache reuses prepared statements for repeated
+queries. Read-only (`mode=ro` plus `PRAGMA query_only`) also means a
+generated statement can't modify the data. With `wal=True` the database is
+switched to WAL once, so readers never wait on a writer such as `sqlite.py`;
+that changes the file itself and adds -wal/-shm files next to it, so it is
+off by default.
+
+MongoDB: one MongoClient, whose own connection pool and server monitoring
+are kept instead of rebuilt (and server discovery repeated) for every query.
+
+Both check a client's health before handing it out if it has been idle for
+a while, and replace it if the check fails.
+
+time_limit() interrupts a SQLite statement that runs too long, using the
+connection's progress handler.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import MongoClient
+
+# Seconds a client may sit idle before it is checked again
+HEALTH_CHECK_IDLE = 30.0
+
+
+class StatementTimeout(sqlite3.OperationalError):
+    pass
+
+
+@contextmanager
+def time_limit(conn, seconds, every=10000):
+    """Interrupt SQLite statements run on `conn` inside the block once they've taken `seconds`."""
+    if not seconds:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    fired = []
+
+    def handler():
+        # Called every `every` virtual machine instructions; a true result interrupts the statement
+        if time.monotonic() > deadline:
+            fired.append(True)
+            return 1
+        return 0
+
+    conn.set_progress_handler(handler, every)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if fired:
+            raise StatementTimeout(f"query stopped after {seconds:g}s (statement time limit)") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, every)
+
+
+class SQLitePool:
+    def __init__(self, path, size=4, cached_statements=256, wal=False):
+        self.path = os.path.abspath(path)
+        self.size = size
+        self.cached_statements = cached_statements
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"SQLite database not found: {path}")
+        if wal:
+            # Persistent in the file; needs a writable connection, so set it once here
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "replaced": 0, "queries": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.execute("PRAGMA query_only = ON")
+        self.stats["opened"] += 1
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Take a connection for one thread's use; give it back with release() or detach() it."""
+        conn = None
+        while conn is None:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                # None idle: open one if the pool has room (detached connections free up room),
+                # otherwise wait for one to come back
+                with self._lock:
+                    can_open = self._opened < self.size
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    conn, last_used = self._connect(), time.monotonic()
+                else:
+                    try:
+                        conn, last_used = self._idle.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+        if time.monotonic() - last_used > HEALTH_CHECK_IDLE and not self._healthy(conn):
+            conn.close()
+            conn = self._connect()
+            self.stats["replaced"] += 1
+        self.stats["queries"] += 1
+        return conn
+
+    def release(self, conn):
+        self._idle.put((conn, time.monotonic()))
+
+    def detach(self, conn):
+        """Hand an acquired connection over to the caller (who closes it); the pool may open another."""
+        with self._lock:
+            self._opened -= 1
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection (one thread at a time); it returns to the pool afterwards."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def query(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        self._opened = 0
+
+
+class MongoPool:
+    """One MongoClient per URI, pinged before use after being idle and rebuilt if the ping fails."""
+
+    def __init__(self, uri, client_factory=MongoClient, **client_options):
+        self.uri = uri
+        self.client_factory = client_factory
+        self.client_options = {"maxPoolSize": 16, "serverSelectionTimeoutMS": 5000, **client_options}
+        self._client = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "replaced": 0}
+
+    def _create(self):
+        self.stats["created"] += 1
+        return self.client_factory(self.uri, **self.client_options)
+
+    def client(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._client is None:
+                self._client = self._create()
+            elif now - self._last_used > HEALTH_CHECK_IDLE:
+                try:
+                    self._client.admin.command("ping")
+                except Exception:
+                    self._client.close()
+                    self._client = self._create()
+                    self.stats["replaced"] += 1
+            self._last_used = now
+            return self._client
+
+    def collection(self, database, name):
+        return self.client()[database][name]
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
@@ -0,0 +1,200 @@
+"""
+Stand-in for the Ollama API, for running the app and benchmarks without a model.
+
+Answers /api/generate with a rule-based SQL or MongoDB query for the question
+at the end of the prompt, and /api/embed with hashed bag-of-words embeddings.
+Like a model, it takes `--delay` seconds before the first token and then
+generates `--token-rate` tokens per second (0: all at once), streamed as
+newline-delimited JSON unless the request sets "stream": false. With
+`--chatty` the query is wrapped in a preamble, a code fence and an
+explanation, as chat-tuned models tend to do. A client that disconnects
+mid-stream cancels the generation. GET /api/stats returns the requests
+served, streams cancelled and tokens generated.
+
+    python mock_ollama.py --port 11435 --delay 0.5 --token-rate 30 --chatty
+    OLLAMA_URL=http://localhost:11435 streamlit run sql.py
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from query_cache import HashingEmbedder
+
+# Roughly the size of an LLM token
+_TOKEN = re.compile(r"\s*\S{1,4}|\s+")
+
+CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Boston", "Seattle", "Denver"]
+
+
+def answer(question, mongo=False):
+    """A plausible query for the question, built from the values it mentions."""
+    text = question.lower()
+    sql_filters, mongo_filters = [], {}
+    match = re.search(r"\b(\d+)(?:st|nd|rd|th)\b", text)
+    if match and "class" in text:
+        negated = re.search(r"\bnot in class\b", text)
+        sql_filters.append(f"CLASS {'!=' if negated else '='} '{match.group(1)}th'")
+        mongo_filters["class"] = {"$ne": f"{match.group(1)}th"} if negated else f"{match.group(1)}th"
+    match = re.search(r"\bsection ([a-z])\b", text)
+    if match:
+        sql_filters.append(f"SECTION = '{match.group(1).upper()}'")
+        mongo_filters["section"] = match.group(1).upper()
+    match = re.search(r"(?:(?:more|greater) than or equal to|at least) (\d+)|(\d+) (?:marks )?or more", text)
+    if match and "attendance" not in text:
+        marks = match.group(1) or match.group(2)
+        sql_filters.append(f"MARKS >= {marks}")
+        mongo_filters["marks"] = {"$gte": int(marks)}
+    match = re.search(r"(?:more than|greater than|above|over) (\d+)(?: marks)?", text)
+    if match and "attendance" not in text:
+        sql_filters.append(f"MARKS > {match.group(1)}")
+        mongo_filters["marks"] = {"$gt": int(match.group(1))}
+    match = re.search(r"(?:less than|below|under) (\d+)(?: marks)?", text)
+    if match and "attendance" not in text:
+        sql_filters.append(f"MARKS < {match.group(1)}")
+        mongo_filters["marks"] = {"$lt": int(match.group(1))}
+    for city in CITIES:
+        if city.lower() in text:
+            sql_filters.append(f"CITY = '{city}'")
+            mongo_filters["city"] = city
+
+    if mongo:
+        if re.search(r"\bor (?:in )?(?:class|section)\b", text) and len(mongo_filters) > 1:
+            return json.dumps({"$or": [{field: value} for field, value in mongo_filters.items()]})
+        return json.dumps(mongo_filters)
+    joiner = " OR " if re.search(r"\bor (?:in )?(?:class|section)\b", text) else " AND "
+    where = f" WHERE {joiner.join(sql_filters)}" if sql_filters else ""
+    match = re.search(r"\b(?:sorted|ordered|order) by (name|age|marks|attendance|city)\b", text)
+    order = f" ORDER BY {match.group(1).upper()}" if match else ""
+    if "how many" in text or "count" in text or "number of" in text:
+        return f"SELECT COUNT(*) FROM STUDENT{where};"
+    if "average" in text:
+        return f"SELECT AVG(ATTENDANCE) FROM STUDENT{where};"
+    if "name" in text:
+        return f"SELECT NAME FROM STUDENT{where}{order};"
+    return f"SELECT * FROM STUDENT{where}{order};"
+
+
+def chatty(query, mongo=False):
+    language = "python" if mongo else "sql"
+    return (
+        f"Sure! Here's the {'MongoDB' if mongo else 'SQL'} query that answers your question:\n\n"
+        f"```{language}\n{query}\n```\n\n"
+        "This query looks up the matching students and filters on the columns mentioned in the "
+        "question, so every record it returns satisfies all of the conditions you asked about. If you "
+        "would like the results sorted, grouped or limited to a few columns, let me know and I can "
+        "adjust the query accordingly!"
+    )
+
+
+class MockOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, token_rate=0.0, chatty=False):
+        super().__init__(address, Handler)
+        self.delay = delay
+        self.token_rate = token_rate
+        self.chatty = chatty
+        self.embedder = HashingEmbedder()
+        self.counts = {"generate": 0, "embed": 0, "cancelled": 0, "tokens": 0}
+        self.lock = threading.Lock()
+
+    def count(self, kind, n=1):
+        with self.lock:
+            self.counts[kind] += n
+
+    def completion(self, prompt):
+        question = prompt.rsplit("following question:", 1)[-1].strip()
+        mongo = "MongoDB" in prompt[:200]
+        query = answer(question, mongo)
+        return chatty(query, mongo) if self.chatty else query
+
+
+class Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so pooled client connections are reused
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream(self, model, tokens):
+        """Send one JSON line per token, then a final `done` line, as chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.server.delay)
+        lines = [{"model": model, "response": token, "done": False} for token in tokens]
+        lines.append({"model": model, "response": "", "done": True})
+        try:
+            for line in lines:
+                data = (json.dumps(line) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+                if not line["done"]:
+                    self.server.count("tokens")
+                    if self.server.token_rate:
+                        time.sleep(1 / self.server.token_rate)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client got what it needed and hung up: stop generating
+            self.server.count("cancelled")
+            self.close_connection = True
+
+    def do_GET(self):
+        if self.path == "/api/stats":
+            self.send_json(self.server.counts)
+        elif self.path == "/api/tags":
+            self.send_json({"models": [{"name": "llama3.2"}]})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/api/generate":
+            self.server.count("generate")
+            tokens = _TOKEN.findall(self.server.completion(request.get("prompt", "")))
+            if request.get("stream", True):
+                self.stream(request.get("model"), tokens)
+            else:
+                time.sleep(self.server.delay + (len(tokens) / self.server.token_rate if self.server.token_rate else 0))
+                self.server.count("tokens", len(tokens))
+                self.send_json({"model": request.get("model"), "response": "".join(tokens), "done": True})
+        elif self.path == "/api/embed":
+            self.server.count("embed")
+            texts = request.get("input", [])
+            texts = [texts] if isinstance(texts, str) else texts
+            self.send_json({"model": request.get("model"), "embeddings": self.server.embedder(texts).tolist()})
+        else:
+            self.send_json({"error": "not found"}, 404)
+
+
+def start_server(port=0, delay=0.0, token_rate=0.0, chatty=False):
+    """Serve in a background thread; returns the server (its URL is http://127.0.0.1:<server.server_port>)."""
+    server = MockOllama(("127.0.0.1", port), delay, token_rate, chatty)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=30.0, help="Tokens per second (0: all at once)")
+    parser.add_argument("--chatty", action="store_true", help="Wrap queries in explanations")
+    args = parser.parse_args()
+    server = MockOllama(("127.0.0.1", args.port), args.delay, args.token_rate, args.chatty)
+    print(f"Mock Ollama on http://127.0.0.1:{args.port} ({args.delay}s to first token, {args.token_rate} tokens/s)")
+    server.serve_forever()
@@ -0,0 +1,155 @@
+"""
+Ollama API calls.
+
+Completions are streamed over one pooled HTTP session. With an `extract`
+function (`extract_sql` or `extract_mongo`) the stream is read only until a
+complete query has been generated: the connection is then closed, which makes
+Ollama stop generating, so explanations a chatty model adds after the query
+cost no time.
+"""
+
+import json
+import os
+import re
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Local Ollama server and model (point OLLAMA_URL at mock_ollama.py to run without a model)
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2")
+# Optional embedding model for the semantic query cache, e.g. nomic-embed-text
+OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL")
+
+# A statement starts a line (optionally after "SQL:", as in the prompt's examples)
+_SQL_START = re.compile(r"^[ \t]*(SQL:[ \t]*)?((?:SELECT|WITH)\b)", re.IGNORECASE | re.MULTILINE)
+# Without "SQL:", what follows SELECT / WITH has to read as SQL, not prose ("Select these rows:"):
+# `*`, CASE, a string, or a first item followed by `(`, `,`, an operator, FROM, AS or the end of
+# the statement; or a CTE name followed by AS (
+_SQL_HEAD = re.compile(
+    r"SELECT\s+(?:(?:DISTINCT|ALL)\s+)?(?:\*|CASE\b|'|[\w.\"`\[\]]+\s*(?:[(,;|<>=+*/-]|$|(?:FROM|AS)\b))"
+    r"|WITH\s+(?:RECURSIVE\s+)?[\w\"`\[\]]+\s*(?:\([^)]*\)\s*)?AS\s*\(",
+    re.IGNORECASE,
+)
+
+_session = None
+
+
+def get_session():
+    """Process-wide session: connections to Ollama are kept alive and reused."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
+    return _session
+
+
+def _strip_fences(text):
+    return text.replace('```sql', '').replace('```python', '').replace('```json', '').replace('```', '')
+
+
+def extract_sql(text):
+    """The first complete SQL statement (ending in `;` outside quotes and comments) in a partial completion, or None."""
+    text = _strip_fences(text)
+    match = next((m for m in _SQL_START.finditer(text) if m.group(1) or _SQL_HEAD.match(text, m.start(2))), None)
+    if match is None:
+        return None
+    start = match.start(2)
+    quote, i = None, start
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif text.startswith("--", i):
+            end = text.find("\n", i)
+            if end == -1:
+                return None
+            i = end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            if end == -1:
+                return None
+            i = end + 1
+        elif char == ";":
+            return text[start:i + 1].strip()
+        i += 1
+    return None
+
+
+def extract_mongo(text):
+    """The first balanced `{...}` query dictionary in a partial completion, or None."""
+    text = _strip_fences(text)
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth, quote, escaped = 0, None, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def generate(prompt, model=OLLAMA_MODEL, url=OLLAMA_URL, timeout=120, extract=None):
+    """
+    Return Ollama's completion of a prompt.
+
+    With `extract`, return `extract(completion)` as soon as it finds a query in
+    the tokens streamed so far and cancel the rest of the generation; if it
+    never does, the whole completion is returned.
+    """
+    response = get_session().post(
+        f"{url}/api/generate",
+        json={
+            'model': model,
+            'prompt': prompt,
+            'stream': True,
+            'options': {
+                'temperature': 0.1,
+            }
+        },
+        stream=True,
+        # The read timeout applies between streamed tokens
+        timeout=(10, timeout)
+    )
+    try:
+        response.raise_for_status()
+        completion = []
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if 'error' in chunk:
+                raise RuntimeError(chunk['error'])
+            completion.append(chunk.get('response', ''))
+            if extract is not None:
+                query = extract(''.join(completion))
+                if query is not None:
+                    return query
+        return ''.join(completion)
+    finally:
+        # Closing an unfinished stream drops the connection, which cancels the generation
+        response.close()
+
+
+def embed(texts, model=OLLAMA_EMBED_MODEL, url=OLLAMA_URL, timeout=30):
+    """Return one embedding per text from Ollama's /api/embed."""
+    response = get_session().post(f"{url}/api/embed", json={'model': model, 'input': texts}, timeout=timeout)
+    response.raise_for_status()
+    return response.json()['embeddings']
@@ -0,0 +1,289 @@
+"""
+Two-tier cache of generated queries, persisted in SQLite.
+
+1. Exact: the normalized question (case, whitespace and trailing punctuation
+   ignored) with the prompt version and database type.
+2. Semantic: questions are embedded and the stored query of the most similar
+   earlier question is reused when their cosine similarity is at least the
+   threshold and both have the same signature: the literal values they
+   mention (numbers, names, section letters), the schema columns they name,
+   and their intent words (negation, comparison direction, and/or,
+   aggregates, ordering). So "class 8th" never reuses the query for
+   "class 9th", "marks above 90" the one for "marks below 90" or "at least
+   90", "sorted by name" the one for "sorted by marks", or "count the
+   students" the one for "list the students".
+
+Embeddings come from an Ollama embedding model when OLLAMA_EMBED_MODEL is
+set, and otherwise from a hashed bag of words and character trigrams, which
+needs no model and catches reworded questions that share most of their words.
+Embeddings are only compared with ones made by the same embedder, so setting
+or changing OLLAMA_EMBED_MODEL leaves the earlier entries to the exact tier.
+Only queries that ran successfully should be stored.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+CACHE_DB = "query_cache.db"
+DEFAULT_THRESHOLD = 0.9
+
+_WORD = re.compile(r"[a-z0-9]+")
+_LITERAL = re.compile(r"\d+(?:\.\d+)?[a-z]*|'[^']*'|\"[^\"]*\"|\b[A-Z]\b|\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*")
+
+# Words that change which query a question needs without naming a value, as
+# (pattern, intent); phrases come before the words they contain ("at least" before "least")
+_INTENT = [
+    (re.compile(r"\bat least\b|\bno (?:less|fewer) than\b|\b(?:greater|more|higher) than or equal to\b"
+                r"|\b(?:or|and) (?:more|above|over|higher|greater)\b"), "gte"),
+    (re.compile(r"\bat most\b|\bup to\b|\bno more than\b|\b(?:less|fewer|lower) than or equal to\b"
+                r"|\b(?:or|and) (?:less|fewer|below|under|lower)\b"), "lte"),
+    (re.compile(r"\bor\b|\beither\b"), "or"),
+    (re.compile(r"\band\b|\bboth\b"), "and"),
+    (re.compile(r"\b(?:not|no|never|without|except|excluding|other than)\b|n['’]t\b"), "not"),
+    (re.compile(r"\b(?:above|over|more|greater|higher|exceed\w*|after)\b"), "gt"),
+    (re.compile(r"\b(?:below|under|less|fewer|lower|before)\b"), "lt"),
+    (re.compile(r"\b(?:count|how many|number of)\b"), "count"),
+    (re.compile(r"\b(?:average|avg|mean)\b"), "avg"),
+    (re.compile(r"\b(?:sum|total)\b"), "sum"),
+    (re.compile(r"\b(?:max|maximum|highest|most|best)\b"), "max"),
+    (re.compile(r"\b(?:min|minimum|lowest|least|worst)\b"), "min"),
+    (re.compile(r"\b(?:asc|ascending|increasing)\b"), "asc"),
+    (re.compile(r"\b(?:desc|descending|decreasing)\b"), "desc"),
+    (re.compile(r"\b(?:top|bottom|first|last)\b"), "top"),
+]
+
+# Words that don't change which query a question needs
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "from", "with", "by", "and", "is", "are", "was", "were",
+    "me", "please", "can", "you", "what", "which", "who", "all", "show", "list", "display", "give", "find",
+    "get", "tell", "there", "that", "those", "their", "do", "does",
+}
+
+
+def normalize_question(question):
+    text = unicodedata.normalize("NFKC", question).lower()
+    return " ".join(text.split()).rstrip(" ?.!")
+
+
+def prompt_version(prompt, model):
+    """Identify a prompt and model: cached queries are only reused for the same pair."""
+    return hashlib.sha256(f"{model}\n{''.join(prompt)}".encode("utf-8")).hexdigest()[:12]
+
+
+def question_literals(question):
+    """Values a question filters on; the first word is skipped since it is capitalized anyway."""
+    words = question.strip().split(maxsplit=1)
+    rest = words[1] if len(words) > 1 else ""
+    literals = {match.group().strip("'\"").lower() for match in _LITERAL.finditer(rest)}
+    literals.update(token for token in _WORD.findall(question.lower()) if token[0].isdigit())
+    return " ".join(sorted(literals))
+
+
+def question_intent(question):
+    """Intent words of a question (see _INTENT), e.g. "count gt" for "how many scored above 90"."""
+    text = normalize_question(question)
+    intents = set()
+    for pattern, intent in _INTENT:
+        text, found = pattern.subn(" ", text)
+        if found:
+            intents.add(intent)
+    return " ".join(sorted(intents))
+
+
+def _singular(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+
+def question_columns(question, columns):
+    """The schema columns a question names ("marks" or "mark" for MARKS)."""
+    words = {_singular(word) for word in _WORD.findall(question.lower())}
+    return " ".join(sorted({column.lower() for column in columns if _singular(column.lower()) in words}))
+
+
+def question_signature(question, columns=()):
+    """What two questions must share to reuse each other's query: their values, columns and intent words."""
+    return f"{question_literals(question)} | {question_columns(question, columns)} | {question_intent(question)}"
+
+
+class HashingEmbedder:
+    """Hashed bag of words (plural 's' stripped, stopwords dropped) and character trigrams."""
+
+    def __init__(self, dim=2048):
+        self.dim = dim
+
+    @property
+    def name(self):
+        return f"hashing-{self.dim}"
+
+    def _features(self, question):
+        words = [_singular(word) for word in _WORD.findall(normalize_question(question)) if word not in STOPWORDS]
+        features = [("w", word) for word in words]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(("c", padded[i:i + 3]) for i in range(len(padded) - 2))
+        return features
+
+    def __call__(self, questions):
+        vectors = np.zeros((len(questions), self.dim), dtype=np.float32)
+        for row, question in enumerate(questions):
+            for kind, feature in self._features(question):
+                digest = hashlib.blake2b(f"{kind}:{feature}".encode("utf-8"), digest_size=8).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dim
+                # Whole words weigh more than the trigrams that spell them
+                vectors[row, index] += 2.0 if kind == "w" else 0.5
+        return vectors
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama embedding model."""
+
+    def __init__(self, model, url=None):
+        self.model = model
+        self.url = url
+
+    @property
+    def name(self):
+        return f"ollama:{self.model}"
+
+    def __call__(self, questions):
+        import ollama_client
+        url = self.url or ollama_client.OLLAMA_URL
+        return np.asarray(ollama_client.embed(list(questions), model=self.model, url=url), dtype=np.float32)
+
+
+def default_embedder():
+    import ollama_client
+    if ollama_client.OLLAMA_EMBED_MODEL:
+        return OllamaEmbedder(ollama_client.OLLAMA_EMBED_MODEL)
+    return HashingEmbedder()
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class QueryCache:
+    def __init__(self, path=CACHE_DB, embedder=None, threshold=DEFAULT_THRESHOLD, columns=()):
+        # columns: the schema's column names, which questions must name alike to share a query
+        self.path = path
+        self.embedder = embedder or default_embedder()
+        self.embedder_name = getattr(self.embedder, "name", type(self.embedder).__name__)
+        self.threshold = threshold
+        self.columns = list(columns)
+        self.stats = {"exact": 0, "semantic": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS queries (
+                key TEXT PRIMARY KEY,
+                db_type TEXT NOT NULL,
+                version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                literals TEXT NOT NULL, -- question_signature()
+                query TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                embedder TEXT NOT NULL DEFAULT '',
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+        ''')
+        if "embedder" not in {row[1] for row in self._conn.execute("PRAGMA table_info(queries)")}:
+            # A cache from before embeddings recorded their embedder: its rows stay exact-only
+            self._conn.execute("ALTER TABLE queries ADD COLUMN embedder TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS queries_scope ON queries (db_type, version)")
+        self._conn.commit()
+        # (db_type, version) -> (keys, literals, unit embedding matrix), loaded on first use
+        self._matrices = {}
+
+    @staticmethod
+    def key(question, db_type, version):
+        return hashlib.sha256(f"{db_type}\n{version}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def _scope(self, db_type, version):
+        if (db_type, version) not in self._matrices:
+            rows = self._conn.execute(
+                "SELECT key, literals, embedding FROM queries WHERE db_type = ? AND version = ? AND embedder = ? "
+                "ORDER BY created_at",
+                (db_type, version, self.embedder_name),
+            ).fetchall()
+            # np.vstack needs one width: keep the rows as wide as the newest
+            width = len(rows[-1][2]) if rows else 0
+            rows = [row for row in rows if len(row[2]) == width]
+            keys = [row[0] for row in rows]
+            literals = [row[1] for row in rows]
+            embeddings = [np.frombuffer(row[2], dtype=np.float32) for row in rows]
+            matrix = np.vstack(embeddings) if embeddings else None
+            self._matrices[(db_type, version)] = (keys, literals, matrix)
+        return self._matrices[(db_type, version)]
+
+    def get(self, question, db_type, version):
+        """Return (query, tier, similarity) for a question, or (None, None, best similarity) on a miss."""
+        with self._lock:
+            key = self.key(question, db_type, version)
+            row = self._conn.execute("SELECT query FROM queries WHERE key = ?", (key,)).fetchone()
+            if row:
+                return self._hit(key, row[0], "exact", 1.0)
+
+            keys, literals, matrix = self._scope(db_type, version)
+            if matrix is None:
+                self.stats["misses"] += 1
+                return None, None, 0.0
+            embedding = _unit(self.embedder([question]))[0]
+            if embedding.shape[0] != matrix.shape[1]:
+                # Same embedder name, other width (e.g. the model behind it was swapped)
+                self.stats["misses"] += 1
+                return None, None, 0.0
+            similarities = matrix @ embedding
+            # Only questions about the same values and columns, asked the same way, can share a query
+            wanted = question_signature(question, self.columns)
+            similarities[np.array([lits != wanted for lits in literals])] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                row = self._conn.execute("SELECT query FROM queries WHERE key = ?", (keys[best],)).fetchone()
+                return self._hit(keys[best], row[0], "semantic", float(similarities[best]))
+            self.stats["misses"] += 1
+            return None, None, max(0.0, float(similarities[best]))
+
+    def _hit(self, key, query, tier, similarity):
+        self.stats[tier] += 1
+        self._conn.execute("UPDATE queries SET hits = hits + 1 WHERE key = ?", (key,))
+        self._conn.commit()
+        return query, tier, similarity
+
+    def put(self, question, db_type, version, query):
+        with self._lock:
+            key = self.key(question, db_type, version)
+            embedding = _unit(self.embedder([question]))[0].astype(np.float32)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO queries "
+                "(key, db_type, version, question, literals, query, embedding, embedder, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, db_type, version, normalize_question(question), question_signature(question, self.columns),
+                 query, embedding.tobytes(), self.embedder_name, time.time()),
+            )
+            self._conn.commit()
+            self._matrices.pop((db_type, version), None)
+
+    def hit_rate(self):
+        lookups = sum(self.stats.values())
+        return (self.stats["exact"] + self.stats["semantic"]) / lookups if lookups else 0.0
+
+    def size(self):
+        return self._conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM queries")
+            self._conn.commit()
+            self._matrices.clear()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,303 @@
+"""
+Checks generated SQL against its query plan before it runs.
+
+check() runs EXPLAIN QUERY PLAN and estimates how many rows the plan visits:
+a SCAN reads the whole table, an index SEARCH reads the table's rows divided
+by the column's distinct values (counted in a sample), and nested loops
+multiply. A query over the cost budget whose rows stream straight out of the
+plan (no sort, grouping, DISTINCT or aggregate) gets a LIMIT of the row cap,
+so SQLite stops as soon as the display has all it can show. Any other query
+over the budget is rejected. A statement that still runs too long is stopped
+by the statement time limit (db_clients.time_limit).
+
+Columns compared in a WHERE / ON clause on a table the plan has to scan are
+counted. Once a column recurs on a table large enough for an index to pay
+off, an index on it is recommended, and created if auto-indexing is on. The
+pool's connections are read-only, so indexes are created over a separate,
+writable connection.
+"""
+
+import os
+import random
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from results import ROW_CAP
+
+# Estimated rows visited above which a query is limited or rejected
+COST_BUDGET = int(os.getenv("SQL_COST_BUDGET", "10000000"))
+# Seconds a statement (or the reading of one page of its rows) may run
+STATEMENT_TIMEOUT = float(os.getenv("SQL_STATEMENT_TIMEOUT", "5"))
+# Full scans filtering on a column before an index on it is recommended
+INDEX_AFTER = int(os.getenv("SQL_INDEX_AFTER", "3"))
+AUTO_INDEX = os.getenv("SQL_AUTO_INDEX", "0") == "1"
+# Tables smaller than this are scanned about as fast as an index would be searched
+INDEX_MIN_ROWS = 1000
+# An index only beats a scan when each value picks out at most this share of the rows
+INDEX_MAX_SHARE = 0.1
+# Rows sampled to count a column's distinct values
+SAMPLE_ROWS = 1000
+
+_LOOP = re.compile(r"^(SCAN|SEARCH) (\S+)(?: USING (.*))?$")
+_EQUALITY = re.compile(r"(\w+)=\?")
+_RANGE = re.compile(r"(\w+)[<>]\?")
+_BLOCKING = re.compile(
+    r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b|\bDISTINCT\b", re.IGNORECASE
+)
+_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+# Strings, quoted names, comments, brackets, statement ends, and runs of anything else
+_TOKEN = re.compile(
+    r"'(?:[^']|'')*'?|\"(?:[^\"]|\"\")*\"?|`[^`]*`?|\[[^\]]*\]?|--[^\n]*|/\*.*?(?:\*/|$)|[();]"
+    r"|[^'\"`\[\-/();]+|.",
+    re.DOTALL,
+)
+_TABLE_REF = re.compile(r"(?:\bFROM|\bJOIN|,)\s+\"?(\w+)\"?(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_NOT_ALIASES = {"where", "on", "using", "join", "inner", "left", "right", "full", "cross", "natural",
+                "group", "order", "limit", "union", "except", "intersect", "having", "window"}
+# Comparisons an index can serve (not <>, != or LIKE), with the column on either side
+_OPERATOR = r"(?:==?|<(?!>)=?|(?<!<)>=?|\bIN\b|\bBETWEEN\b)"
+
+
+class QueryRejected(Exception):
+    pass
+
+
+def outer_statement(sql):
+    """The first statement of `sql` up to its `;`, and its code outside brackets, strings and comments."""
+    depth, outer = 0, []
+    for token in _TOKEN.finditer(sql):
+        text = token.group()
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth = max(depth - 1, 0)
+        elif text == ";" and depth == 0:
+            return sql[:token.start()], " ".join(outer)
+        elif depth == 0 and not text.startswith(("'", '"', "`", "[", "--", "/*")):
+            outer.append(text)
+    return sql, " ".join(outer)
+
+
+@dataclass
+class Checked:
+    sql: str  # the statement to run: as generated, or with a LIMIT added
+    action: str  # "ok", "limited" or "rejected"
+    cost: float  # estimated rows visited
+    plan: list  # EXPLAIN QUERY PLAN details
+
+
+class QueryGuard:
+    def __init__(self, pool, budget=COST_BUDGET, row_limit=ROW_CAP + 1, index_after=INDEX_AFTER,
+                 auto_index=AUTO_INDEX, index_min_rows=INDEX_MIN_ROWS):
+        # row_limit: the LIMIT added to streaming queries over the budget. One row past the
+        # row cap, so a truncated result is still reported as such
+        self.pool = pool
+        self.budget = budget
+        self.row_limit = row_limit
+        self.index_after = index_after
+        self.auto_index = auto_index
+        self.index_min_rows = index_min_rows
+        self.filter_scans = Counter()
+        self.stats = {"checked": 0, "limited": 0, "rejected": 0, "indexes": 0}
+        self._schema_version = None
+        self._tables = {}
+        self._distinct = {}
+        self._lock = threading.Lock()
+
+    def _refresh_schema(self):
+        version = self.pool.query("PRAGMA schema_version")[0][0]
+        if version == self._schema_version:
+            return
+        tables = {}
+        for (name,) in self.pool.query("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+            columns = {row[1].lower(): row[1] for row in self.pool.query(f'PRAGMA table_info("{name}")')}
+            indexed = set()
+            for index in self.pool.query(f'PRAGMA index_list("{name}")'):
+                first = self.pool.query(f'PRAGMA index_info("{index[1]}")')
+                if first and first[0][2]:
+                    indexed.add(first[0][2].lower())
+            tables[name.lower()] = {"name": name, "columns": columns, "indexed": indexed}
+        self._tables = tables
+        self._distinct = {}
+        self._schema_version = version
+
+    def _rows(self, table):
+        if table not in self._tables:
+            # A subquery, view or CTE: assume it's as big as the biggest table
+            return max((self._rows(name) for name in self._tables), default=1)
+        name = self._tables[table]["name"]
+        try:
+            rows = self.pool.query(f'SELECT MAX(rowid) FROM "{name}"')[0][0]
+        except sqlite3.Error:
+            rows = self.pool.query(f'SELECT COUNT(*) FROM "{name}"')[0][0]
+        return rows or 0
+
+    def _distinct_values(self, table, column):
+        """Distinct values of a column in a sample of its rows."""
+        key = (table, column.lower())
+        if key not in self._distinct:
+            name = self._tables[table]["name"]
+            rows = self._rows(table)
+            # Random rows, not the first ones (which may come in index order) or evenly spaced ones
+            # (which may line up with a pattern in the data)
+            rowids = random.Random(0).sample(range(1, rows + 1), min(rows, SAMPLE_ROWS))
+            sample = ", ".join(map(str, rowids))
+            try:
+                distinct = self.pool.query(
+                    f'SELECT COUNT(DISTINCT "{column}") FROM "{name}" WHERE rowid IN ({sample or 0})'
+                )[0][0]
+            except sqlite3.Error:
+                distinct = self.pool.query(
+                    f'SELECT COUNT(DISTINCT "{column}") FROM (SELECT "{column}" FROM "{name}" LIMIT {SAMPLE_ROWS})'
+                )[0][0]
+            self._distinct[key] = max(distinct, 1)
+        return self._distinct[key]
+
+    def _search_rows(self, table, rows, using):
+        """Rows an index SEARCH visits per lookup."""
+        if "rowid" in using or "PRIMARY KEY" in using:
+            return 1
+        if table in self._tables:
+            for column in _EQUALITY.findall(using):
+                rows /= self._distinct_values(table, column)
+        else:
+            rows /= 10 ** len(_EQUALITY.findall(using))
+        # SQLite's own guess for a range constraint without statistics
+        return rows / 4 ** len(_RANGE.findall(using))
+
+    def _aliases(self, sql):
+        aliases = {}
+        for table, alias in _TABLE_REF.findall(sql):
+            if table.lower() not in self._tables:
+                continue
+            aliases[table.lower()] = table.lower()
+            if alias and alias.lower() not in _NOT_ALIASES:
+                aliases[alias.lower()] = table.lower()
+        return aliases
+
+    def estimate(self, plan, aliases):
+        """Estimated rows visited by a plan, and the tables it scans in full."""
+        children = defaultdict(list)
+        for node, parent, _, detail in plan:
+            children[parent].append((node, detail))
+        scanned = set()
+
+        def block(parent):
+            cost, loops = 0.0, 1.0
+            for node, detail in children[parent]:
+                loop = _LOOP.match(detail)
+                if loop:
+                    kind, name, using = loop.groups()
+                    table = aliases.get(name.lower(), name.lower())
+                    rows = self._rows(table)
+                    if kind == "SCAN":
+                        if table in self._tables:
+                            scanned.add(table)
+                    else:
+                        if using is None or "AUTOMATIC" in using:
+                            # SQLite builds the index from the whole table first
+                            cost += rows
+                        rows = self._search_rows(table, rows, using or "")
+                    # Nested loops: each row of the outer loops runs this one
+                    loops *= max(rows, 1)
+                    cost += loops
+                elif detail.startswith("USE TEMP B-TREE"):
+                    cost += loops
+                elif children[node]:
+                    inner = block(node)
+                    cost += inner * loops if detail.startswith("CORRELATED") else inner
+            return cost
+
+        return block(0), scanned
+
+    def _note_filters(self, sql, scanned, aliases):
+        for table in scanned:
+            info = self._tables[table]
+            columns = "|".join(re.escape(column) for column in info["columns"].values())
+            found = set()
+            for pattern in (rf"(?:(\w+)\.)?\"?\b({columns})\b\"?\s*{_OPERATOR}",
+                            rf"{_OPERATOR}\s*(?:(\w+)\.)?\"?\b({columns})\b"):
+                for qualifier, column in re.findall(pattern, sql, re.IGNORECASE):
+                    if qualifier and aliases.get(qualifier.lower()) != table:
+                        continue
+                    if column.lower() not in info["indexed"]:
+                        found.add(column.lower())
+            for column in found:
+                self.filter_scans[(table, column)] += 1
+
+    def check(self, sql):
+        """Plan `sql` and return what to run; raises QueryRejected if it's over the budget and can't be limited."""
+        with self._lock:
+            self._refresh_schema()
+            plan = self.pool.query(f"EXPLAIN QUERY PLAN {sql}")
+            aliases = self._aliases(sql)
+            cost, scanned = self.estimate(plan, aliases)
+            self._note_filters(sql, scanned, aliases)
+            self.stats["checked"] += 1
+            details = [row[3] for row in plan]
+            checked = Checked(sql, "ok", cost, details)
+            if cost > self.budget:
+                streaming = not any(d.startswith("USE TEMP B-TREE") for d in details) and not _BLOCKING.search(sql)
+                if not streaming:
+                    self.stats["rejected"] += 1
+                    raise QueryRejected(
+                        f"Query rejected: it would read about {cost:,.0f} rows, over the budget of "
+                        f"{self.budget:,} ({'; '.join(details)}). Try a narrower question."
+                    )
+                statement, outer = outer_statement(sql)
+                # A LIMIT inside a subquery or CTE doesn't bound what the statement returns
+                if not _LIMIT.search(outer):
+                    # Cut at the `;`, so nothing after it (a comment) comes before the LIMIT, and put
+                    # the LIMIT on its own line, so a trailing comment without a `;` can't swallow it
+                    checked.sql = f"{statement.rstrip()}\nLIMIT {self.row_limit}"
+                    checked.action = "limited"
+                    self.stats["limited"] += 1
+            if self.auto_index:
+                for table, column, _, _ in self._recommendations():
+                    self._create_index(table, column)
+            return checked
+
+    def _index_name(self, table, column):
+        return f"idx_{table}_{column}"
+
+    def _recommendations(self):
+        recommended = []
+        for (table, column), count in self.filter_scans.most_common():
+            info = self._tables.get(table)
+            if count < self.index_after or info is None or column in info["indexed"]:
+                continue
+            if self._rows(table) < self.index_min_rows or 1 / self._distinct_values(table, column) > INDEX_MAX_SHARE:
+                continue
+            statement = (f'CREATE INDEX IF NOT EXISTS "{self._index_name(table, column)}" '
+                         f'ON "{info["name"]}"("{info["columns"][column]}")')
+            recommended.append((table, column, count, statement))
+        return recommended
+
+    def recommendations(self):
+        """(table, column, full scans filtering on it, CREATE INDEX statement), most scanned first."""
+        with self._lock:
+            self._refresh_schema()
+            return self._recommendations()
+
+    def _create_index(self, table, column):
+        statement = next(s for t, c, _, s in self._recommendations() if (t, c) == (table, column))
+        conn = sqlite3.connect(self.pool.path)
+        try:
+            with conn:
+                conn.execute(statement)
+                # Statistics for the new index, so the planner knows how selective it is
+                conn.execute(f'ANALYZE "{self._index_name(table, column)}"')
+        finally:
+            conn.close()
+        self.stats["indexes"] += 1
+        del self.filter_scans[(table, column)]
+        self._refresh_schema()
+
+    def create_index(self, table, column):
+        """Create a recommended index (over a writable connection; the pool's are read-only)."""
+        with self._lock:
+            self._refresh_schema()
+            self._create_index(table, column)
@@ -0,0 +1,146 @@
+"""
+Query results delivered one page at a time.
+
+Instead of fetchall() / list(find()), rows are read from the open cursor in
+pages (fetchmany for SQLite, the cursor's batches for MongoDB) and each page
+becomes an Arrow record batch. The first page is shown as soon as it has been
+read; later pages are read when asked for. At most `row_cap` rows are read,
+so a `SELECT *` against a large table holds at most that many rows in memory.
+
+A SQLite result that fits in the first page gives its pooled connection back
+right away. A longer one keeps the connection, which leaves the pool (the
+pool opens a replacement), until the rows run out or the result is closed.
+"""
+
+import itertools
+import os
+
+import pyarrow as pa
+
+from db_clients import time_limit
+
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "100"))
+ROW_CAP = int(os.getenv("RESULT_ROW_CAP", "10000"))
+
+
+def _column(values):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, OverflowError):
+        # SQLite columns can mix types and documents can mix shapes: show those as text
+        return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+
+def rows_to_batch(columns, rows):
+    """Record batch of tuples (one value per column)."""
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return pa.RecordBatch.from_arrays([_column(list(column)) for column in values], names=columns)
+
+
+def documents_to_batch(documents):
+    """Record batch of dicts; columns are every key seen, in order of first appearance."""
+    columns = list(dict.fromkeys(key for document in documents for key in document))
+    return pa.RecordBatch.from_arrays(
+        [_column([document.get(key) for document in documents]) for key in columns], names=columns
+    )
+
+
+class PagedResult:
+    """Rows of an open cursor, read into Arrow record batches one page at a time."""
+
+    def __init__(self, fetch, to_batch, close, page_size=PAGE_SIZE, row_cap=ROW_CAP):
+        # fetch(n) -> up to n rows (fewer only at the end), to_batch(rows) -> record batch,
+        # close() releases the cursor
+        self._fetch = fetch
+        self._to_batch = to_batch
+        self._close = close
+        self._lookahead = []
+        self.page_size = page_size
+        self.row_cap = row_cap
+        self.pages = []
+        self.rows = 0
+        self.exhausted = False
+        self.truncated = False
+        # Why reading stopped early (e.g. the statement time limit), if it did
+        self.error = None
+        # The first page is read up front, so it can be shown right away
+        self._read_page()
+
+    def _read_page(self):
+        wanted = min(self.page_size, self.row_cap - self.rows)
+        # One row more than the page says whether another page follows
+        try:
+            rows = self._lookahead + self._fetch(wanted + 1 - len(self._lookahead))
+            rows, self._lookahead = rows[:wanted], rows[wanted:]
+            if rows or not self.pages:
+                self.pages.append(self._to_batch(rows))
+        except Exception as e:
+            # The cursor can't be read any further (e.g. the statement time limit stopped it)
+            self.error = str(e)
+            self.close()
+            raise
+        self.rows += len(rows)
+        if not self._lookahead:
+            self.exhausted = True
+            self.close()
+        elif self.rows >= self.row_cap:
+            self.truncated = True
+            self.close()
+
+    @property
+    def done(self):
+        return self.exhausted or self.truncated or self.error is not None
+
+    def page(self, index):
+        """Record batch of page `index` (reading the pages up to it if needed), or None past the last page."""
+        while index >= len(self.pages) and not self.done:
+            self._read_page()
+        return self.pages[index] if index < len(self.pages) else None
+
+    def close(self):
+        self._lookahead = []
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+def sqlite_result(pool, sql, page_size=PAGE_SIZE, row_cap=ROW_CAP, timeout=None):
+    """Run a query on a pooled SQLite connection and read its first page.
+
+    With `timeout`, running the statement and reading each page is stopped after that many seconds.
+    """
+    conn = pool.acquire()
+    try:
+        with time_limit(conn, timeout):
+            cursor = conn.execute(sql)
+    except Exception:
+        pool.release(conn)
+        raise
+    columns = [column[0] for column in cursor.description or []]
+    owned = []
+
+    def fetch(n):
+        with time_limit(conn, timeout):
+            return cursor.fetchmany(n)
+
+    def close():
+        cursor.close()
+        if owned:
+            conn.close()
+        else:
+            pool.release(conn)
+
+    # Closes the cursor itself if reading the first page fails
+    result = PagedResult(fetch, lambda rows: rows_to_batch(columns, rows), close, page_size, row_cap)
+    if not result.done:
+        # More pages may be read later: the result keeps the connection, the pool opens another
+        pool.detach(conn)
+        owned.append(conn)
+    return result
+
+
+def mongo_result(collection, query, page_size=PAGE_SIZE, row_cap=ROW_CAP):
+    """Run a find() (without `_id`) and read its first page."""
+    cursor = collection.find(query, {"_id": 0}).batch_size(page_size + 1)
+    return PagedResult(lambda n: list(itertools.islice(cursor, n)), documents_to_batch, cursor.close,
+                       page_size, row_cap)
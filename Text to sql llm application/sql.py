@@ -2,69 +2,92 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
-import sqlite3
 import streamlit as st
-import requests
 import json
-from pymongo import MongoClient
-import pandas as pd
+
+import ollama_client
+from db_clients import MongoPool, SQLitePool
+from query_cache import DEFAULT_THRESHOLD, QueryCache, prompt_version
+from query_guard import STATEMENT_TIMEOUT, QueryGuard
+from results import mongo_result, sqlite_result
+
+# Generated queries are cached here and reused for repeated or reworded questions
+QUERY_CACHE_DB = os.getenv("QUERY_CACHE_DB", "query_cache.db")
+QUERY_CACHE_THRESHOLD = float(os.getenv("QUERY_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+# The STUDENT table's columns (the students collection's fields): questions naming other columns never share a query
+SCHEMA_COLUMNS = ["NAME", "AGE", "CLASS", "SECTION", "MARKS", "SUBJECT", "ATTENDANCE", "CITY"]
+
+# Switch the SQLite file to WAL, so queries don't wait on a writer (changes the file, adds -wal/-shm files)
+SQLITE_WAL = os.getenv("SQLITE_WAL", "0") == "1"
+
+# Update with your MongoDB connection string
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+
+@st.cache_resource
+def get_mongo_pool():
+    """One MongoClient (and its connection pool) per server process."""
+    return MongoPool(MONGO_URI)
+
+@st.cache_resource
+def get_sqlite_pool(db):
+    """Read-only connections to a SQLite file, opened once per server process."""
+    return SQLitePool(db, wal=SQLITE_WAL)
+
+@st.cache_resource
+def get_query_guard(db):
+    """Plan checks and index advice for a SQLite file, kept across reruns."""
+    return QueryGuard(get_sqlite_pool(db))
 
 # MongoDB connection
 def get_mongo_client():
     try:
-        # Update with your MongoDB connection string
-        MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-        client = MongoClient(MONGO_URI)
-        return client
+        return get_mongo_pool().client()
     except Exception as e:
         st.error(f"MongoDB connection error: {str(e)}")
         return None
 
-def get_llama_response(question, prompt):
+@st.cache_resource
+def get_query_cache():
+    """One query cache per server process, kept across reruns."""
+    return QueryCache(QUERY_CACHE_DB, threshold=QUERY_CACHE_THRESHOLD, columns=SCHEMA_COLUMNS)
+
+def get_llama_response(question, prompt, extract=None):
+    """Generate a query; with `extract`, stop the model as soon as a complete query has been streamed."""
     try:
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': 'llama3.2',
-                'prompt': prompt[0] + question,
-                'stream': False,
-                'options': {
-                    'temperature': 0.1,
-                }
-            },
-            timeout=120
-        )
-        return response.json()['response']
+        return ollama_client.generate(prompt[0] + question, extract=extract)
     except Exception as e:
         st.error(f"API Error: {str(e)}")
         raise e
 
 def read_sql_query(sql, db):
-    conn = sqlite3.connect(db)
-    cursor = conn.cursor()
-    cursor.execute(sql)
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
-
-def query_mongodb(question, prompt):
-    """Generate MongoDB query and execute it"""
+    """Check a query's plan (see query_guard.py), run it and read the first page of its rows (see results.py)"""
+    checked = get_query_guard(db).check(sql)
+    return sqlite_result(get_sqlite_pool(db), checked.sql, timeout=STATEMENT_TIMEOUT), checked
+
+def query_mongodb(question, prompt, mongo_query=None):
+    """Generate MongoDB query (unless a cached one is given) and execute it.
+
+    Returns (results, query, parsed); `parsed` is False when the model's output couldn't be
+    read as a query and all students are shown instead.
+    """
     try:
         # Get MongoDB query from LLM
-        mongo_query = get_llama_response(question, prompt)
+        if mongo_query is None:
+            mongo_query = get_llama_response(question, prompt, ollama_client.extract_mongo)
         mongo_query = mongo_query.strip().replace('```python', '').replace('```json', '').replace('```', '').strip()
         
         # Connect to MongoDB
         client = get_mongo_client()
         if not client:
-            return None, None
+            return None, None, False
         
         db = client['text_to_sql']
         collection = db['students']
         
         # Parse the query string to dict
+        parsed = mongo_query.startswith('{')
         try:
-            query_dict = eval(mongo_query) if mongo_query.startswith('{') else {}
+            query_dict = eval(mongo_query) if parsed else {}
             
             # Fix common issues - if all values are empty strings, use empty dict
             if all(v == "" or v == {} for v in query_dict.values()):
@@ -74,15 +97,15 @@ def query_mongodb(question, prompt):
         except:
             query_dict = {}
             mongo_query = "{}"
+            parsed = False
         
-        # Execute query
-        results = list(collection.find(query_dict))
+        # Execute query, reading the first page of results
+        results = mongo_result(collection, query_dict)
         
-        client.close()
-        return results, mongo_query
+        return results, mongo_query, parsed
     except Exception as e:
         st.error(f"MongoDB Error: {str(e)}")
-        return None, None
+        return None, None, False
 
 sql_prompt = [
     '''
@@ -160,6 +183,10 @@ Now generate the MongoDB query for the following question:
 '''
 ]
 
+# Cached queries are only reused for the prompt and model that generated them
+sql_prompt_version = prompt_version(sql_prompt, ollama_client.OLLAMA_MODEL)
+mongo_prompt_version = prompt_version(mongo_prompt, ollama_client.OLLAMA_MODEL)
+
 st.set_page_config(page_title="SQL/MongoDB Query Generator", layout="wide")
 st.header("🤖 SQL/MongoDB Query Generator with Llama 3.2")
 
@@ -198,6 +225,30 @@ Collection: students
         """, language="json")
     
     st.info(f"💡 Using Llama 3.2 running locally via Ollama")
+    
+    st.header("⚡ Query Cache")
+    use_cache = st.checkbox("Reuse queries for repeated or reworded questions", value=True)
+    query_cache = get_query_cache()
+    st.caption(
+        f"{query_cache.size()} cached queries · hit rate {query_cache.hit_rate():.0%} "
+        f"({query_cache.stats['exact']} exact, {query_cache.stats['semantic']} similar, "
+        f"{query_cache.stats['misses']} misses)"
+    )
+    if st.button("Clear cache"):
+        query_cache.clear()
+    
+    if db_type == "SQLite":
+        st.header("🧭 Query Guard")
+        query_guard = get_query_guard("Student.db")
+        st.caption(
+            f"{query_guard.stats['checked']} queries checked · {query_guard.stats['limited']} limited · "
+            f"{query_guard.stats['rejected']} rejected · {query_guard.stats['indexes']} indexes created"
+        )
+        for table, column, scans, statement in query_guard.recommendations():
+            st.caption(f"{scans} full scans filtering on {column.upper()}:")
+            st.code(statement, language="sql")
+            st.button(f"Create index on {column.upper()}", key=f"index_{table}_{column}",
+                      on_click=query_guard.create_index, args=(table, column))
 
 # Example questions
 with st.expander("💡 Example Questions"):
@@ -217,46 +268,104 @@ question = st.text_input("Enter your question about the STUDENT database:",
 
 submit = st.button("Generate Query", type="primary")
 
+def show_results(state):
+    """Show the last question's query and the current page of its results."""
+    st.subheader(f"✅ Generated {state['db_type'] if state['db_type'] == 'MongoDB' else 'SQL'} Query:")
+    st.code(state["query"] or "", language=state["language"])
+    if state["tier"]:
+        st.caption(f"⚡ Reused from cache ({state['tier']} match, similarity {state['similarity']:.2f})")
+    if state["note"]:
+        st.warning(state["note"])
+    
+    st.subheader("📊 Query Results:")
+    result = state["result"]
+    if result is None or result.rows == 0:
+        st.info("No results found.")
+        return
+    
+    # Later pages are read from the open cursor when first shown
+    index = st.session_state.page
+    try:
+        page, error = result.page(index), result.error
+    except Exception as e:
+        page, error = None, str(e)
+    if page is None:
+        st.error(f"❌ Error: {error}")
+        st.button("◀ Previous page", disabled=index == 0,
+                  on_click=lambda: st.session_state.update(page=index - 1))
+        return
+    st.dataframe(page.to_pandas(), use_container_width=True)
+    first = index * result.page_size
+    if result.exhausted:
+        total = f"{result.rows}"
+    elif result.truncated:
+        total = f"the first {result.rows} (row limit reached)"
+    else:
+        total = f"more than {result.rows}"
+    st.success(f"Showing record(s) {first + 1}-{first + page.num_rows} of {total}")
+    
+    previous_page, next_page = st.columns(2)
+    previous_page.button("◀ Previous page", disabled=index == 0,
+                         on_click=lambda: st.session_state.update(page=index - 1))
+    next_page.button("Next page ▶", disabled=result.done and index == len(result.pages) - 1,
+                     on_click=lambda: st.session_state.update(page=index + 1))
+
+def clear_results():
+    """Forget the previous question's results, closing their cursor."""
+    previous = st.session_state.pop("results", None)
+    if previous and previous["result"] is not None:
+        previous["result"].close()
+
+def keep_results(db_type, query, language, tier, similarity, result, note=None):
+    """Keep a question's results in the session, so further pages can be shown on later reruns."""
+    st.session_state.results = {"db_type": db_type, "query": query, "language": language,
+                                "tier": tier, "similarity": similarity, "result": result, "note": note}
+    st.session_state.page = 0
+
 if submit:
     if question:
+        clear_results()
         with st.spinner(f"Generating {db_type} query with Llama..."):
             try:
                 if db_type == "SQLite":
-                    # SQL Query
-                    sql = get_llama_response(question, sql_prompt)
-                    sql = sql.strip().replace('```sql', '').replace('```', '').strip()
-                    
-                    st.subheader("✅ Generated SQL Query:")
-                    st.code(sql, language="sql")
+                    # SQL Query (from the cache when this question was asked before)
+                    sql, tier, similarity = None, None, 0.0
+                    if use_cache:
+                        sql, tier, similarity = query_cache.get(question, db_type, sql_prompt_version)
+                    if sql is None:
+                        sql = get_llama_response(question, sql_prompt, ollama_client.extract_sql)
+                        sql = sql.strip().replace('```sql', '').replace('```', '').strip()
                     
-                    st.subheader("📊 Query Results:")
-                    rows = read_sql_query(sql, "Student.db")
-                    
-                    if rows:
-                        st.dataframe(rows, use_container_width=True)
-                        st.success(f"Found {len(rows)} record(s)")
-                    else:
-                        st.info("No results found.")
+                    try:
+                        rows, checked = read_sql_query(sql, "Student.db")
+                    except Exception:
+                        st.subheader("✅ Generated SQL Query:")
+                        st.code(sql, language="sql")
+                        raise
+                    # Only queries that ran are cached
+                    if use_cache and tier is None:
+                        query_cache.put(question, db_type, sql_prompt_version, sql)
+                    note = None
+                    if checked.action == "limited":
+                        note = (f"⚠️ This query would read about {checked.cost:,.0f} rows, "
+                                f"so a LIMIT was added before running it.")
+                    keep_results(db_type, checked.sql, "sql", tier, similarity, rows, note)
                 
                 else:
                     # MongoDB Query
-                    results, mongo_query = query_mongodb(question, mongo_prompt)
-                    
-                    st.subheader("✅ Generated MongoDB Query:")
-                    st.code(mongo_query, language="python")
-                    
-                    st.subheader("📊 Query Results:")
-                    
-                    if results:
-                        df = pd.DataFrame(results)
-                        if '_id' in df.columns:
-                            df = df.drop('_id', axis=1)
-                        st.dataframe(df, use_container_width=True)
-                        st.success(f"Found {len(results)} record(s)")
-                    else:
-                        st.info("No results found.")
+                    cached_query, tier, similarity = None, None, 0.0
+                    if use_cache:
+                        cached_query, tier, similarity = query_cache.get(question, db_type, mongo_prompt_version)
+                    results, mongo_query, parsed = query_mongodb(question, mongo_prompt, cached_query)
+                    # A fallback to all students isn't the answer to the question: don't reuse it
+                    if use_cache and tier is None and results is not None and parsed:
+                        query_cache.put(question, db_type, mongo_prompt_version, mongo_query)
+                    keep_results(db_type, mongo_query, "python", tier, similarity, results)
                         
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     else:
-        st.warning("⚠️ Please enter a question.")
\ No newline at end of file
+        st.warning("⚠️ Please enter a question.")
+
+if st.session_state.get("results"):
+    show_results(st.session_state.results)
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""
+VERITAS generation helpers
+Batched beam search over many texts with length bucketing, decoding
+profiles scaled to the input length, and greedy token streaming for a
+single text.
+"""
+
+import asyncio
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+import torch
+from transformers import (
+    PreTrainedModel,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    T5ForConditionalGeneration,
+    T5Tokenizer,
+    T5TokenizerFast,
+    TextStreamer,
+)
+
+from weights import load_mmap_model, safetensors_path
+
+PROMPT_PREFIX = "neutralize: "
+
+# Deterministic decoding locked to prevent semantic drift
+# max_length=96 allows nuance without verbosity
+# length_penalty=1.0 prevents over-compression
+DECODING = {
+    "max_length": 96,
+    "min_length": 10,
+    "do_sample": False,
+    "num_beams": 4,
+    "length_penalty": 1.0,
+    "early_stopping": True,
+}
+
+# Streaming needs one hypothesis to emit tokens as they are decoded: greedy, same lengths
+STREAM_DECODING = {
+    "max_length": DECODING["max_length"],
+    "min_length": DECODING["min_length"],
+    "do_sample": False,
+    "num_beams": 1,
+}
+
+# Request-level decoding modes; output lengths are set per input by `decoding_for`
+DECODING_PROFILES = {
+    "fast": {"do_sample": False, "num_beams": 1},
+    "balanced": {"do_sample": False, "num_beams": 2, "length_penalty": 1.0, "early_stopping": True},
+    "quality": {"do_sample": False, "num_beams": 4, "length_penalty": 1.0, "early_stopping": True},
+}
+# "auto" picks the first profile whose token limit the input fits in
+MODES = ("auto",) + tuple(DECODING_PROFILES)
+AUTO_PROFILES = ((12, "fast"), (32, "balanced"), (None, "quality"))
+
+# Output budget: LENGTH_SCALE x the input tokens plus LENGTH_SLACK, rounded up to a
+# multiple of LENGTH_BUCKET so requests of similar length still batch together
+LENGTH_SCALE = 1.5
+LENGTH_SLACK = 8
+LENGTH_BUCKET = 16
+
+# Inference backends: the fp32 PyTorch checkpoint, or the ONNX Runtime graphs
+# written by scripts/export_onnx.py (fp32 or INT8 dynamic-quantized)
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Texts per generate() call; beam search memory grows with batch_size * num_beams
+GENERATION_BATCH_SIZE = 8
+
+
+# The fast tokenizer is only used if it encodes these exactly like the slow one
+# (inputs are stripped before encoding, so edge whitespace is not probed)
+_TOKENIZER_PROBES = [
+    "neutralize: We are seeking a rockstar ninja who thrives in a fast-paced environment and wears many hats.",
+    "Runs of   internal    whitespace",
+    "Line one\nLine two\tTabbed",
+    "Salary: $120,000-$150,000 (DOE); 401(k) & 25 days' PTO!!",
+    "Café naïve résumé – “quotes” — ellipsis…",
+    "",
+]
+
+Tokenizer = Union[T5Tokenizer, T5TokenizerFast]
+
+
+@dataclass
+class Generation:
+    text: str
+    input_tokens: int  # tokens of the input text (the prompt without the prefix and </s>)
+    output_tokens: int  # generated tokens, excluding padding and </s>
+
+
+def load_tokenizer(model_path: str) -> Tokenizer:
+    """Load the fast (Rust) tokenizer where it matches the slow sentencepiece one, else the slow one."""
+    # Legacy mode avoids tokenizer.json issues with this checkpoint
+    slow = T5Tokenizer.from_pretrained(model_path, legacy=True)
+    try:
+        # Converted from spiece.model rather than read from tokenizer.json
+        fast = T5TokenizerFast.from_pretrained(model_path, legacy=True, from_slow=True)
+    except Exception:
+        return slow
+    if all(fast.encode(probe) == slow.encode(probe) for probe in _TOKENIZER_PROBES):
+        return fast
+    return slow
+
+
+def load_model_and_tokenizer(
+    model_path: str,
+    backend: str = "torch",
+    onnx_dir: Optional[str] = None,
+) -> Tuple[PreTrainedModel, Tokenizer]:
+    """
+    Load the checkpoint and its tokenizer for CPU inference.
+
+    The PyTorch model is backed by a memory-mapped `model.safetensors` when the
+    checkpoint has one, so processes serving it share the weights.
+    With an onnx backend the model runs the exported graphs in `onnx_dir`
+    (default `<model_path>-onnx`); it supports the same generate() calls.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    tokenizer = load_tokenizer(model_path)
+    if backend == "torch" and safetensors_path(model_path):
+        model = load_mmap_model(model_path)
+    elif backend == "torch":
+        model = T5ForConditionalGeneration.from_pretrained(model_path)
+        model.eval()
+    else:
+        from ort_model import default_onnx_dir, load_onnx_model  # onnxruntime is only needed here
+
+        model = load_onnx_model(
+            onnx_dir or default_onnx_dir(model_path),
+            quantized=backend == "onnx-int8",
+            num_threads=torch.get_num_threads(),
+        )
+    return model, tokenizer
+
+
+@lru_cache(maxsize=None)
+def prompt_prefix_tokens(tokenizer: Tokenizer) -> int:
+    return len(tokenizer.encode(PROMPT_PREFIX.strip(), add_special_tokens=False))
+
+
+def input_text_tokens(tokenizer: Tokenizer, input_ids: List[int]) -> int:
+    """Tokens of the input text, taken from its prompt ids instead of re-encoding it."""
+    return max(0, len(input_ids) - prompt_prefix_tokens(tokenizer) - 1)
+
+
+def output_text_tokens(tokenizer: Tokenizer, output_ids: torch.Tensor) -> List[int]:
+    """Generated tokens per row, excluding padding, the decoder start token and </s>."""
+    special = torch.tensor(tokenizer.all_special_ids)
+    return (~torch.isin(output_ids, special)).sum(dim=-1).tolist()
+
+
+def length_limits(input_tokens: int) -> Dict[str, int]:
+    """max_length/min_length for an input of `input_tokens` text tokens, capped at DECODING's."""
+    budget = LENGTH_SCALE * input_tokens + LENGTH_SLACK
+    max_length = min(DECODING["max_length"], LENGTH_BUCKET * math.ceil(budget / LENGTH_BUCKET))
+    # Short inputs may give short outputs: 3 tokens at max_length 16, up to DECODING's 10
+    min_length = min(DECODING["min_length"], 1 + max_length // 8)
+    return {"max_length": max_length, "min_length": min_length}
+
+
+def decoding_for(
+    input_tokens: int,
+    mode: str = "auto",
+    auto_profiles: Tuple[Tuple[Optional[int], str], ...] = AUTO_PROFILES,
+) -> Dict:
+    """Decoding parameters of the `mode` profile, with output lengths scaled to the input."""
+    if mode == "auto":
+        mode = next(name for limit, name in auto_profiles if limit is None or input_tokens <= limit)
+    if mode not in DECODING_PROFILES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {', '.join(MODES)}")
+    return {**DECODING_PROFILES[mode], **length_limits(input_tokens)}
+
+
+def build_prompt(text: str) -> str:
+    return f"{PROMPT_PREFIX}{text}"
+
+
+def encode_prompts(tokenizer: Tokenizer, texts: List[str]) -> List[List[int]]:
+    """Tokenize the prompts for `texts` (unpadded)."""
+    return tokenizer([build_prompt(text) for text in texts])["input_ids"]
+
+
+def generate_from_ids(
+    model: PreTrainedModel,
+    tokenizer: Tokenizer,
+    encoded: List[List[int]],
+    batch_size: int = GENERATION_BATCH_SIZE,
+    decoding: Dict = DECODING,
+) -> List[Generation]:
+    """
+    Generate for already-tokenized prompts with as few generate() calls as possible.
+
+    Prompts are sorted by length and cut into mini-batches so each batch pads
+    only to its own longest prompt. Outputs are returned in the original order.
+    """
+    order = sorted(range(len(encoded)), key=lambda i: len(encoded[i]))
+
+    outputs: List[Optional[Generation]] = [None] * len(encoded)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        inputs = tokenizer.pad(
+            {"input_ids": [encoded[i] for i in indices]},
+            padding="longest",
+            return_tensors="pt",
+        )
+        with torch.no_grad():
+            output_ids = model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                **decoding,
+            )
+        # Same decoding as the text2text-generation pipeline
+        decoded = tokenizer.batch_decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        output_lengths = output_text_tokens(tokenizer, output_ids)
+        for i, text, output_tokens in zip(indices, decoded, output_lengths):
+            outputs[i] = Generation(
+                text=text,
+                input_tokens=input_text_tokens(tokenizer, encoded[i]),
+                output_tokens=output_tokens,
+            )
+    return outputs
+
+
+def generate_grouped(
+    model: PreTrainedModel,
+    tokenizer: Tokenizer,
+    encoded: List[List[int]],
+    decodings: List[Dict],
+    batch_size: int = GENERATION_BATCH_SIZE,
+) -> List[Generation]:
+    """Generate for prompts with per-prompt decoding: one length-sorted pass per distinct decoding."""
+    groups: Dict[tuple, List[int]] = {}
+    for i, decoding in enumerate(decodings):
+        groups.setdefault(tuple(sorted(decoding.items())), []).append(i)
+
+    outputs: List[Optional[Generation]] = [None] * len(encoded)
+    for indices in groups.values():
+        generations = generate_from_ids(
+            model, tokenizer, [encoded[i] for i in indices], batch_size, decodings[indices[0]]
+        )
+        for i, generation in zip(indices, generations):
+            outputs[i] = generation
+    return outputs
+
+
+def generate_batch(
+    model: PreTrainedModel,
+    tokenizer: Tokenizer,
+    texts: List[str],
+    batch_size: int = GENERATION_BATCH_SIZE,
+    decoding: Dict = DECODING,
+) -> List[Generation]:
+    """Sanitize many texts in length-sorted mini-batches, returning generations in order."""
+    if not texts:
+        return []
+    return generate_from_ids(model, tokenizer, encode_prompts(tokenizer, texts), batch_size, decoding)
+
+
+class AsyncTextStreamer(TextStreamer):
+    """
+    Forwards text decoded by generate() (running in a worker thread) to an asyncio queue.
+
+    Text arrives in whole words; None marks the end of the stream. Setting
+    `cancelled` stops generation at the next token.
+    """
+
+    def __init__(self, tokenizer: Tokenizer, loop: asyncio.AbstractEventLoop):
+        super().__init__(tokenizer, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.cancelled = False
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+        if stream_end:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+class _StopWhenCancelled(StoppingCriteria):
+    def __init__(self, streamer: AsyncTextStreamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.streamer.cancelled
+
+
+def stream_generation(
+    model: PreTrainedModel,
+    tokenizer: Tokenizer,
+    input_ids: List[int],
+    streamer: AsyncTextStreamer,
+    decoding: Dict = STREAM_DECODING,
+) -> Generation:
+    """Generate for one tokenized prompt, pushing text to `streamer` as it is decoded."""
+    try:
+        with torch.no_grad():
+            output_ids = model.generate(
+                input_ids=torch.tensor([input_ids]),
+                attention_mask=torch.ones(1, len(input_ids), dtype=torch.long),
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([_StopWhenCancelled(streamer)]),
+                **decoding,
+            )[0]
+    except BaseException:
+        # Always terminate the stream so the consumer isn't left waiting
+        streamer.end()
+        raise
+    text = tokenizer.decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)
+    return Generation(
+        text=text,
+        input_tokens=input_text_tokens(tokenizer, input_ids),
+        output_tokens=output_text_tokens(tokenizer, output_ids.unsqueeze(0))[0],
+    )
@@ -0,0 +1,241 @@
+"""
+VERITAS truth guardrail
+Find generic and dismissive phrases anywhere in model outputs in one pass.
+
+The phrase lists live in a JSON file (guardrail_phrases.json by default), one
+entry per category:
+
+    {"generic": {"action": "annotate", "note": "stated expectation", "phrases": [...]},
+     "dismissive": {"action": "remove", "phrases": [...]}}
+
+* `annotate` appends ` (<note>)` to an output that contains any of the phrases
+* `remove` deletes the phrases from the output, with the commas, brackets or
+  full stop they would leave dangling. A phrase after an article, possessive
+  or degree word ("a just cause", "the most just") is an adjective rather
+  than a dismissive adverb and stays, as does "simply put"; an output that
+  would be left with nothing but punctuation is kept as it was
+
+Every phrase of every category is compiled into a single regex shaped like a
+trie (phrases sharing a prefix share a branch), so one scan of the text tests
+all phrases together instead of one substring search per phrase. Matching is
+case-insensitive, on whole words, and any run of whitespace matches the spaces
+inside a phrase. A batch of outputs is joined and scanned at once.
+
+The file is re-read when its modification time changes, so phrase lists can
+be edited without restarting the workers. `version` identifies the loaded
+lists (cached responses depend on it).
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+ACTIONS = ("annotate", "remove")
+
+# Seconds between checks of the config file's modification time
+RELOAD_CHECK_SECONDS = 1.0
+
+# Joins a batch of outputs for one scan: neither whitespace nor a word character,
+# so no phrase or word boundary spans two outputs
+_BATCH_SEPARATOR = "\x00"
+
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = (".", "!", "?")
+_CLAUSE_END = ",;:.!?)"
+# Words after which a `remove` phrase is an adjective ("a just cause"), so it stays
+_ADJECTIVE_CONTEXT = re.compile(
+    r"(?<!\w)(?:a|an|the|my|your|his|its|our|their|more|most|very|too)\s+$", re.IGNORECASE
+)
+# ... and the idiom "simply put", which frames what follows rather than dismissing it
+_IDIOM_AFTER = re.compile(r"\s+put\b", re.IGNORECASE)
+
+
+def normalize_phrase(phrase: str) -> str:
+    return _WHITESPACE.sub(" ", phrase).strip().lower()
+
+
+def trie_pattern(phrases: List[str]) -> str:
+    """Regex alternation of the phrases, factored into a trie so matching cost doesn't grow with their number."""
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        end = "" in node
+        branches = [(r"\s+" if char == " " else re.escape(char)) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if end else pattern
+
+    return build(trie)
+
+
+class PhraseMatcher:
+    """Compiled matcher over the categories of one config."""
+
+    def __init__(self, config: Dict[str, dict]):
+        self.categories: Dict[str, dict] = {}
+        self.phrases: Dict[str, str] = {}  # normalized phrase -> category
+        for name, category in config.items():
+            action = category.get("action")
+            if action not in ACTIONS:
+                raise ValueError(f"Guardrail category {name!r}: action must be one of {', '.join(ACTIONS)}")
+            if action == "annotate" and not category.get("note"):
+                raise ValueError(f"Guardrail category {name!r}: annotate needs a note")
+            self.categories[name] = category
+            for phrase in category.get("phrases", []):
+                normalized = normalize_phrase(phrase)
+                if normalized:
+                    # A phrase listed in several categories belongs to the first
+                    self.phrases.setdefault(normalized, name)
+
+        pattern = trie_pattern(list(self.phrases))
+        self.regex = re.compile(rf"(?<!\w)(?:{pattern})(?!\w)", re.IGNORECASE) if pattern else None
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """Non-overlapping (start, end, category) of the phrases in a text, longest phrase first at each position."""
+        return self.find_batch([text])[0]
+
+    def find_batch(self, texts: List[str]) -> List[List[Tuple[int, int, str]]]:
+        """`find` for every text, in one scan over the whole batch."""
+        matches: List[List[Tuple[int, int, str]]] = [[] for _ in texts]
+        if self.regex is None or not texts:
+            return matches
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(_BATCH_SEPARATOR)
+        joined = _BATCH_SEPARATOR.join(texts)
+        for match in self.regex.finditer(joined):
+            index = bisect.bisect_right(starts, match.start()) - 1
+            category = self.phrases[normalize_phrase(match.group())]
+            matches[index].append((match.start() - starts[index], match.end() - starts[index], category))
+        return matches
+
+    def apply(self, text: str, matches: List[Tuple[int, int, str]]) -> str:
+        """Rewrite a text given its matches: drop `remove` phrases, then add the notes of `annotate` categories."""
+        notes: List[str] = []
+        pieces: List[str] = []
+        position, capitalize = 0, False
+
+        def keep(piece: str) -> None:
+            nonlocal capitalize
+            if capitalize and piece:
+                piece, capitalize = piece[0].upper() + piece[1:], False
+            pieces.append(piece)
+
+        for start, end, name in matches:
+            category = self.categories[name]
+            if category["action"] == "annotate":
+                if category["note"] not in notes:
+                    notes.append(category["note"])
+                continue
+            if _ADJECTIVE_CONTEXT.search(text, max(0, start - 16), start) or _IDIOM_AFTER.match(text, end):
+                continue
+            before = text[position:start]
+            # Take the following whitespace with the phrase, or, when the phrase ends
+            # a clause, the whitespace and comma before it ("you, merely." -> "you.")
+            after = len(text) - len(text[end:].lstrip())
+            stripped = before.rstrip()
+            preceding = ("".join(pieces) + stripped).rstrip()
+            opens_sentence = not preceding or preceding.endswith(_SENTENCE_END)
+            if after < len(text) and text[after] == ")" and stripped.endswith("("):
+                # A phrase alone in brackets goes with them ("asked (simply)." -> "asked.")
+                before, position = stripped[:-1].rstrip(), after + 1
+            elif after < len(text) and text[after] in _SENTENCE_END and opens_sentence:
+                # ... and one that is a whole sentence with its full stop ("Simply." -> "")
+                before, position = stripped, after + 1
+            elif after < len(text) and text[after] == "," and stripped.endswith(","):
+                # A parenthetical goes with both its commas ("I think, simply, that")
+                before, position = stripped[:-1], after + 1
+            elif after < len(text) and text[after] == "," and opens_sentence:
+                # ... and an opening one with the comma after it ("Merely, the plan" -> "The plan")
+                position = len(text) - len(text[after + 1:].lstrip())
+            elif after == len(text) or text[after] in _CLAUSE_END:
+                before, position = stripped.rstrip(",;:").rstrip(), end
+            else:
+                position = after
+            keep(before)
+            # A phrase that started a sentence hands its capital letter on
+            if text[start].isupper() and opens_sentence:
+                capitalize = True
+        keep(text[position:])
+        clean_text = "".join(pieces).strip()
+        # Nothing but punctuation left ("Just." -> "."): keep the text as it was
+        if not any(char.isalnum() for char in clean_text):
+            clean_text = text
+        for note in notes:
+            clean_text += f" ({note})"
+        return clean_text
+
+
+class TruthGuardrail:
+    """Phrase matcher loaded from a JSON file and reloaded when the file changes."""
+
+    def __init__(self, path: str, check_seconds: float = RELOAD_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._mtime: Optional[float] = None
+        # Fails loudly at startup; a bad edit later keeps the previous lists
+        self.matcher, self.version = self._load()
+
+    def _load(self) -> Tuple[PhraseMatcher, str]:
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self._mtime = os.stat(self.path).st_mtime
+        config = json.loads(data)
+        version = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return PhraseMatcher(config), version
+
+    def maybe_reload(self) -> bool:
+        """Reload the phrase lists if the file changed since the last check; True if they were reloaded."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_seconds
+            try:
+                if os.stat(self.path).st_mtime == self._mtime:
+                    return False
+                self.matcher, self.version = self._load()
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Keeping guardrail {self.version}, could not reload {self.path}: {e}")
+                return False
+            self.reloads += 1
+            print(f"🔁 Guardrail reloaded: {len(self.matcher.phrases)} phrases, version {self.version}")
+            return True
+
+    def apply(self, text: str) -> str:
+        return self.apply_batch([text])[0]
+
+    def apply_batch(self, texts: List[str]) -> List[str]:
+        self.maybe_reload()
+        matcher = self.matcher
+        return [matcher.apply(text, matches) if matches else text
+                for text, matches in zip(texts, matcher.find_batch(texts))]
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "phrases": len(self.matcher.phrases),
+            "categories": {name: category["action"] for name, category in self.matcher.categories.items()},
+            "reloads": self.reloads,
+        }
@@ -3,14 +3,40 @@ VERITAS API - Truth Filter Backend
 A text sanitization service that strips corporate jargon and reveals clear meaning.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, ConfigDict
-from transformers import T5ForConditionalGeneration, T5Tokenizer, pipeline
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
+import asyncio
+import json
+import time
+import torch
 import uvicorn
 import os
 
+from generation import (
+    AUTO_PROFILES,
+    MODES,
+    STREAM_DECODING,
+    AsyncTextStreamer,
+    Generation,
+    decoding_for,
+    encode_prompts,
+    generate_from_ids,
+    generate_grouped,
+    input_text_tokens,
+    length_limits,
+    load_model_and_tokenizer,
+    stream_generation,
+)
+from guardrail import TruthGuardrail
+from ort_model import default_onnx_dir
+from result_cache import ResultCache, SqliteResultStore, cache_key, checkpoint_id
+from scheduler import GenerationScheduler, StreamStats
+from segmentation import split_document
+from weights import process_memory
+
 # Initialize FastAPI app
 app = FastAPI(
     title="VERITAS API",
@@ -31,48 +57,123 @@ app.add_middleware(
 
 # Model paths - use absolute path
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BACKEND_DIR, "..", "model", "veritas-t5-checkpoints", "checkpoint-11100")
+MODEL_PATH = os.environ.get(
+    "VERITAS_MODEL_PATH",
+    os.path.join(BACKEND_DIR, "..", "model", "veritas-t5-checkpoints", "checkpoint-11100"),
+)
+
+# Inference backend: torch (fp32), onnx or onnx-int8 (graphs from scripts/export_onnx.py)
+MODEL_BACKEND = os.environ.get("VERITAS_BACKEND", "torch")
+ONNX_DIR = os.environ.get("VERITAS_ONNX_DIR") or default_onnx_dir(MODEL_PATH)
+
+# Decoding mode when a request doesn't set one; "auto" picks fast/balanced/quality
+# by input length, switching at these input token counts
+DEFAULT_MODE = os.environ.get("VERITAS_DEFAULT_MODE", "auto")
+if DEFAULT_MODE not in MODES:
+    raise ValueError(f"VERITAS_DEFAULT_MODE must be one of {', '.join(MODES)}")
+AUTO_PROFILE_LIMITS = (
+    (int(os.environ.get("VERITAS_FAST_MAX_TOKENS", AUTO_PROFILES[0][0])), "fast"),
+    (int(os.environ.get("VERITAS_BALANCED_MAX_TOKENS", AUTO_PROFILES[1][0])), "balanced"),
+    (None, "quality"),
+)
+
+# Truth guardrail phrase lists, reloaded when the file changes
+GUARDRAIL_PHRASES = os.environ.get("VERITAS_GUARDRAIL_PHRASES", os.path.join(BACKEND_DIR, "guardrail_phrases.json"))
+
+# Batch endpoint limits: texts per request, and texts per generate() call
+MAX_BATCH_TEXTS = 128
+GENERATION_BATCH_SIZE = int(os.environ.get("VERITAS_GENERATION_BATCH_SIZE", "8"))
+
+# Long-document mode: words per chunk, and chunks per document
+CHUNK_WORDS = int(os.environ.get("VERITAS_CHUNK_WORDS", "48"))
+MAX_DOCUMENT_CHUNKS = 256
+
+# Result cache: in-memory LRU, plus an optional SQLite file that survives restarts
+CACHE_SIZE = int(os.environ.get("VERITAS_CACHE_SIZE", "10000"))
+CACHE_DB = os.environ.get("VERITAS_CACHE_DB")
+# Texts generated per step when warming the cache
+WARM_CHUNK_SIZE = 64
+# Required as X-Admin-Token on /admin endpoints when set
+ADMIN_TOKEN = os.environ.get("VERITAS_ADMIN_TOKEN")
 
 # Global model instances
-fixer = None
+model = None
 tokenizer = None
+result_cache = None
+cache_checkpoint = None
 
 
-@app.on_event("startup")
-async def load_model():
-    """Load model and tokenizer at startup."""
-    global fixer, tokenizer
+def run_generation(encoded: List[List[int]], decoding: dict):
+    """Run one scheduler batch as a single generate() call."""
+    return generate_from_ids(model, tokenizer, encoded, batch_size=len(encoded), decoding=decoding)
+
+
+# Concurrent /sanitize requests are grouped into batches by a background worker
+scheduler = GenerationScheduler(
+    run_generation,
+    max_batch_size=int(os.environ.get("VERITAS_MAX_BATCH_SIZE", "16")),
+    max_batch_tokens=int(os.environ.get("VERITAS_MAX_BATCH_TOKENS", "2048")),
+    max_wait_ms=float(os.environ.get("VERITAS_BATCH_WAIT_MS", "10")),
+)
+
+stream_stats = StreamStats()
+
+truth_guardrail = TruthGuardrail(GUARDRAIL_PHRASES)
+
+
+def load_weights():
+    """Load model and tokenizer once; workers forked by serve.py inherit them."""
+    global model, tokenizer
+    if model is not None:
+        return
     print("🔄 Loading VERITAS model...")
     print(f"📂 Model path: {MODEL_PATH}")
+    print(f"⚙️ Backend: {MODEL_BACKEND}")
     
-    # Load tokenizer using T5Tokenizer with legacy mode to avoid tokenizer.json issues
-    tokenizer = T5Tokenizer.from_pretrained(MODEL_PATH, legacy=True)
+    # Load model and tokenizer (fast tokenizer if it matches the legacy T5Tokenizer)
+    model, tokenizer = load_model_and_tokenizer(MODEL_PATH, MODEL_BACKEND, ONNX_DIR)
+    print(f"🔤 Tokenizer: {type(tokenizer).__name__}")
+
+
+@app.on_event("startup")
+async def load_model():
+    """Load model and tokenizer (unless preloaded) and start the per-process services."""
+    global result_cache, cache_checkpoint
+    load_weights()
     
-    # Load model
-    model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
+    # Cached responses are only valid for this checkpoint and backend (INT8 outputs can differ)
+    if MODEL_BACKEND == "torch":
+        cache_checkpoint = checkpoint_id(MODEL_PATH)
+    else:
+        cache_checkpoint = f"{MODEL_BACKEND}:{checkpoint_id(ONNX_DIR)}"
+    result_cache = ResultCache(CACHE_SIZE, SqliteResultStore(CACHE_DB) if CACHE_DB else None)
     
-    # Create pipeline with loaded model and tokenizer
-    # Lock deterministic decoding to prevent semantic drift
-    # But allow enough length for nuanced outputs
-    fixer = pipeline(
-        "text2text-generation",
-        model=model,
-        tokenizer=tokenizer,
-        do_sample=False,
-        num_beams=4,
-        early_stopping=True
-    )
+    await scheduler.start()
     print("✅ VERITAS model loaded successfully!")
 
 
+@app.on_event("shutdown")
+async def stop_scheduler():
+    """Fail queued requests and stop the generation worker."""
+    await scheduler.stop()
+    if result_cache is not None:
+        result_cache.close()
+
+
 # ==================== Pydantic Models ====================
 
+Mode = Literal["auto", "fast", "balanced", "quality"]
+
 class SanitizeRequest(BaseModel):
     text: str = Field(
         ..., 
         description="Text to sanitize",
         example="We are seeking a rockstar ninja who thrives in a fast-paced environment and wears many hats."
     )
+    mode: Optional[Mode] = Field(
+        None,
+        description="Decoding profile: fast (greedy), balanced (2 beams), quality (4 beams) or auto (by input length)"
+    )
 
 class SanitizeResponse(BaseModel):
     original_text: str
@@ -83,13 +184,24 @@ class SanitizeResponse(BaseModel):
     words_removed: int
     efficiency_gain: str
 
+class DocumentSanitizeResponse(SanitizeResponse):
+    chunks: int
+    segments: List[SanitizeResponse]
+
 class BatchSanitizeRequest(BaseModel):
-    texts: List[str] = Field(..., description="List of texts to sanitize", max_length=20)
+    texts: List[str] = Field(..., description="List of texts to sanitize", max_length=MAX_BATCH_TEXTS)
+    mode: Optional[Mode] = Field(None, description="Decoding profile for every text (see SanitizeRequest)")
 
 class BatchSanitizeResponse(BaseModel):
     results: List[SanitizeResponse]
     total_token_reduction: float
 
+class CacheWarmResponse(BaseModel):
+    texts: int
+    already_cached: int
+    generated: int
+    seconds: float
+
 class HealthResponse(BaseModel):
     model_config = ConfigDict(protected_namespaces=())
     
@@ -131,19 +243,115 @@ def get_efficiency_label(reduction: float) -> str:
         return "✅ Already clean"
 
 
-# Truth Policy Guardrail - clarifies overly generic outputs
-GENERIC_PHRASES = {
-    "things are changing",
-    "structures are being changed",
-    "you will receive little guidance",
-    "changes are happening",
-    "the situation is evolving",
-}
+def build_sanitize_result(
+    original_text: str,
+    clean_text: str,
+    original_tokens: Optional[int] = None,
+    clean_tokens: Optional[int] = None
+) -> dict:
+    """
+    Build a SanitizeResponse payload with token and word metrics.
+    
+    Token counts already known from generation are passed in; only missing
+    ones are counted by re-encoding the text.
+    """
+    if original_tokens is None:
+        original_tokens = count_tokens(original_text)
+    if clean_tokens is None:
+        clean_tokens = count_tokens(clean_text)
+    original_words = count_words(original_text)
+    clean_words = count_words(clean_text)
+    token_reduction = calculate_reduction(original_tokens, clean_tokens)
+    
+    return {
+        "original_text": original_text,
+        "clean_text": clean_text,
+        "original_tokens": original_tokens,
+        "clean_tokens": clean_tokens,
+        "token_reduction": token_reduction,
+        "words_removed": max(0, original_words - clean_words),
+        "efficiency_gain": get_efficiency_label(token_reduction)
+    }
+
+
+def finish_generations(original_texts: List[str], generations: List[Generation]) -> List[dict]:
+    """Apply the truth guardrail to a batch and build the responses from the generations' own token counts."""
+    clean_texts = apply_truth_guardrail([generation.text for generation in generations])
+    results = []
+    for original_text, clean_text, generation in zip(original_texts, clean_texts, generations):
+        # The guardrail may rewrite the output: only then does it need re-encoding
+        clean_tokens = generation.output_tokens if clean_text == generation.text else None
+        results.append(build_sanitize_result(original_text, clean_text, generation.input_tokens, clean_tokens))
+    return results
+
+
+def finish_generation(original_text: str, generation: Generation) -> dict:
+    return finish_generations([original_text], [generation])[0]
 
-# Dismissive words that inject opinion instead of neutrality
-DISMISSIVE_WORDS = {"basic", "just", "simply", "nothing new", "merely", "only"}
 
-def apply_truth_guardrail(clean_text: str) -> str:
+def result_key(text: str, decoding: dict) -> str:
+    """Cache key of a text's response for the loaded checkpoint, decoding and guardrail phrase lists."""
+    return cache_key(text, f"{cache_checkpoint}:{truth_guardrail.version}", decoding)
+
+
+def cached_result(original_text: str, decoding: dict) -> Optional[dict]:
+    """Return the cached response for a text, or None."""
+    payload = result_cache.get(result_key(original_text, decoding))
+    if payload is not None:
+        # Keyed on normalized text: echo this request's text
+        payload["original_text"] = original_text
+    return payload
+
+
+def request_decoding(input_ids: List[int], mode: Optional[str] = None) -> dict:
+    """Decoding for one tokenized prompt: the request's mode (or the default), lengths scaled to the input."""
+    return decoding_for(input_text_tokens(tokenizer, input_ids), mode or DEFAULT_MODE, AUTO_PROFILE_LIMITS)
+
+
+async def generate_and_cache(
+    original_texts: List[str],
+    encoded: List[List[int]],
+    decodings: List[dict]
+) -> Dict[str, dict]:
+    """Generate responses for tokenized texts in length-sorted mini-batches and cache them."""
+    generations = await asyncio.get_running_loop().run_in_executor(
+        scheduler.executor, generate_grouped, model, tokenizer, encoded, decodings, GENERATION_BATCH_SIZE
+    )
+    # Apply truth policy guardrail to the whole batch
+    results = {}
+    for original_text, decoding, result in zip(original_texts, decodings,
+                                               finish_generations(original_texts, generations)):
+        result_cache.put(result_key(original_text, decoding), result)
+        results[original_text] = result
+    return results
+
+
+async def sanitize_many(original_texts: List[str], mode: Optional[str] = None) -> List[dict]:
+    """Sanitize texts in order, generating only those not already cached."""
+    if not original_texts:
+        return []
+    encoded = encode_prompts(tokenizer, original_texts)
+    decodings = [request_decoding(input_ids, mode) for input_ids in encoded]
+    results = [cached_result(text, decoding) for text, decoding in zip(original_texts, decodings)]
+    
+    # First occurrence of each uncached text
+    missing: Dict[str, int] = {}
+    for i, (text, result) in enumerate(zip(original_texts, results)):
+        if result is None:
+            missing.setdefault(text, i)
+    if missing:
+        indices = list(missing.values())
+        generated = await generate_and_cache(
+            [original_texts[i] for i in indices],
+            [encoded[i] for i in indices],
+            [decodings[i] for i in indices]
+        )
+        results = [result if result is not None else dict(generated[text])
+                   for text, result in zip(original_texts, results)]
+    return results
+
+
+def apply_truth_guardrail(clean_texts: List[str]) -> List[str]:
     """
     Apply policy guardrail to prevent over-generic or dismissive outputs.
     
@@ -151,15 +359,11 @@ def apply_truth_guardrail(clean_text: str) -> str:
     - Neutral ≠ dismissive
     - Compressed ≠ vague
     
-    This is product philosophy, not model behavior.
+    This is product philosophy, not model behavior: generic phrases are
+    flagged and dismissive words removed wherever they occur (phrase lists in
+    guardrail_phrases.json, see guardrail.py).
     """
-    normalized = clean_text.lower().strip().rstrip(".")
-    
-    # Flag generic phrases
-    if normalized in GENERIC_PHRASES:
-        return clean_text + " (stated expectation)"
-    
-    return clean_text
+    return truth_guardrail.apply_batch(clean_texts)
 
 
 # ==================== API Endpoints ====================
@@ -178,12 +382,68 @@ async def root():
 async def health_check():
     """Health check endpoint."""
     return {
-        "status": "healthy" if fixer else "loading",
-        "is_model_loaded": fixer is not None,
+        "status": "healthy" if model else "loading",
+        "is_model_loaded": model is not None,
         "version": "1.0.0"
     }
 
 
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """Generation scheduler, result cache and worker process metrics."""
+    return {
+        "scheduler": scheduler.stats.snapshot(scheduler.queue_depth),
+        "cache": result_cache.stats() if result_cache is not None else None,
+        "streaming": stream_stats.snapshot(),
+        "guardrail": truth_guardrail.stats(),
+        "process": {
+            "pid": os.getpid(),
+            "worker": os.environ.get("VERITAS_WORKER"),
+            "threads": torch.get_num_threads(),
+            **process_memory(),
+        },
+    }
+
+
+@app.post("/admin/cache/warm", response_model=CacheWarmResponse, tags=["Admin"])
+async def warm_cache(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Warm the result cache from a file of texts, one per line.
+    
+    Send the file as the request body:
+    `curl --data-binary @texts.txt localhost:8000/admin/cache/warm`
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model still loading, please wait...")
+    
+    start = time.perf_counter()
+    body = (await request.body()).decode("utf-8", errors="replace")
+    texts = list(dict.fromkeys(line.strip() for line in body.splitlines() if line.strip()))
+    # Warmed under the default mode
+    encoded = encode_prompts(tokenizer, texts) if texts else []
+    decodings = [request_decoding(input_ids) for input_ids in encoded]
+    missing = [i for i, (text, decoding) in enumerate(zip(texts, decodings))
+               if result_key(text, decoding) not in result_cache]
+    
+    try:
+        for offset in range(0, len(missing), WARM_CHUNK_SIZE):
+            chunk = missing[offset:offset + WARM_CHUNK_SIZE]
+            await generate_and_cache(
+                [texts[i] for i in chunk], [encoded[i] for i in chunk], [decodings[i] for i in chunk]
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Inference error: {str(e)}")
+    
+    return {
+        "texts": len(texts),
+        "already_cached": len(texts) - len(missing),
+        "generated": len(missing),
+        "seconds": round(time.perf_counter() - start, 3)
+    }
+
+
 @app.post("/sanitize", response_model=SanitizeResponse, tags=["Sanitize"])
 async def sanitize_text(request: SanitizeRequest):
     """
@@ -192,104 +452,130 @@ async def sanitize_text(request: SanitizeRequest):
     Transforms corporate jargon, buzzwords, and fluff into clear, honest language.
     Returns the cleaned text along with token reduction metrics.
     """
-    if fixer is None:
+    if model is None:
         raise HTTPException(status_code=503, detail="Model still loading, please wait...")
     
     try:
         original_text = request.text.strip()
         
-        # Prepare input with prefix
-        model_input = f"neutralize: {original_text}"
+        # Prepare input with prefix; the decoding profile depends on its length
+        input_ids = encode_prompts(tokenizer, [original_text])[0]
+        decoding = request_decoding(input_ids, request.mode)
         
-        # Run inference with balanced decoding
-        # max_length=96 allows nuance without verbosity
-        # length_penalty=1.0 prevents over-compression
-        output = fixer(
-            model_input,
-            max_length=96,
-            min_length=10,
-            do_sample=False,
-            num_beams=4,
-            length_penalty=1.0,
-            early_stopping=True
-        )
-        clean_text = output[0]['generated_text']
+        # Identical inputs decode identically: serve repeats from the cache
+        cached = cached_result(original_text, decoding)
+        if cached is not None:
+            return cached
         
-        # Apply truth policy guardrail
-        clean_text = apply_truth_guardrail(clean_text)
+        # Run inference with the request's profile (see generation.DECODING_PROFILES),
+        # batched with other concurrent requests
+        generation = await scheduler.submit(input_ids, decoding)
         
-        # Calculate metrics
-        original_tokens = count_tokens(original_text)
-        clean_tokens = count_tokens(clean_text)
-        original_words = count_words(original_text)
-        clean_words = count_words(clean_text)
-        token_reduction = calculate_reduction(original_tokens, clean_tokens)
-        
-        return {
-            "original_text": original_text,
-            "clean_text": clean_text,
-            "original_tokens": original_tokens,
-            "clean_tokens": clean_tokens,
-            "token_reduction": token_reduction,
-            "words_removed": max(0, original_words - clean_words),
-            "efficiency_gain": get_efficiency_label(token_reduction)
-        }
+        # Apply truth policy guardrail and calculate metrics from the generation's ids
+        result = finish_generation(original_text, generation)
+        result_cache.put(result_key(original_text, decoding), result)
+        return result
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Inference error: {str(e)}")
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/sanitize/stream", tags=["Sanitize"])
+async def sanitize_stream(request: SanitizeRequest):
+    """
+    Sanitize a single text, streaming the output as server-sent events.
+    
+    Uses greedy decoding (the `fast` profile, whatever the request's `mode`) so
+    text can be sent as it is generated; the output may differ slightly from
+    the beam-search `/sanitize`. Events:
+    - `token`: `{"text": ...}` the next words of the output
+    - `done`: the full SanitizeResponse plus `time_to_first_token_ms` and `total_ms`
+    - `error`: `{"detail": ...}`
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model still loading, please wait...")
+    
+    original_text = request.text.strip()
+    input_ids = encode_prompts(tokenizer, [original_text])[0]
+    decoding = {**STREAM_DECODING, **length_limits(input_text_tokens(tokenizer, input_ids))}
+    
+    async def events():
+        start = time.perf_counter()
+        first_token = None
+        
+        cached = cached_result(original_text, decoding)
+        if cached is not None:
+            first_token = time.perf_counter() - start
+            yield sse_event("token", {"text": cached["clean_text"]})
+            result = cached
+        else:
+            loop = asyncio.get_running_loop()
+            streamer = AsyncTextStreamer(tokenizer, loop)
+            # Runs on the inference thread, between scheduler batches
+            pending = loop.run_in_executor(
+                scheduler.executor, stream_generation, model, tokenizer, input_ids, streamer, decoding
+            )
+            try:
+                while True:
+                    text = await streamer.queue.get()
+                    if text is None:
+                        break
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield sse_event("token", {"text": text})
+                generation = await pending
+            except Exception as e:
+                yield sse_event("error", {"detail": f"Inference error: {str(e)}"})
+                return
+            finally:
+                # Client went away: stop generating at the next token
+                streamer.cancelled = True
+            
+            # Apply truth policy guardrail
+            result = finish_generation(original_text, generation)
+            result_cache.put(result_key(original_text, decoding), result)
+        
+        total = time.perf_counter() - start
+        stream_stats.observe(first_token, total)
+        yield sse_event("done", {
+            **result,
+            "time_to_first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+            "total_ms": round(total * 1000, 1)
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/sanitize/batch", response_model=BatchSanitizeResponse, tags=["Sanitize"])
 async def sanitize_batch(request: BatchSanitizeRequest):
     """
     Sanitize multiple texts at once.
     
-    Accepts up to 20 texts and returns sanitized versions with metrics for each.
+    Accepts up to 128 texts and returns sanitized versions with metrics for each.
+    Texts are generated together in length-sorted mini-batches rather than one
+    beam search per text.
     """
-    if fixer is None:
+    if model is None:
         raise HTTPException(status_code=503, detail="Model still loading, please wait...")
     
     try:
-        results = []
-        total_original_tokens = 0
-        total_clean_tokens = 0
+        original_texts = [text.strip() for text in request.texts]
         
-        for text in request.texts:
-            original_text = text.strip()
-            model_input = f"neutralize: {original_text}"
-            output = fixer(
-                model_input,
-                max_length=96,
-                min_length=10,
-                do_sample=False,
-                num_beams=4,
-                length_penalty=1.0,
-                early_stopping=True
-            )
-            clean_text = output[0]['generated_text']
-            
-            # Apply truth policy guardrail
-            clean_text = apply_truth_guardrail(clean_text)
-            
-            original_tokens = count_tokens(original_text)
-            clean_tokens = count_tokens(clean_text)
-            original_words = count_words(original_text)
-            clean_words = count_words(clean_text)
-            token_reduction = calculate_reduction(original_tokens, clean_tokens)
-            
-            total_original_tokens += original_tokens
-            total_clean_tokens += clean_tokens
-            
-            results.append({
-                "original_text": original_text,
-                "clean_text": clean_text,
-                "original_tokens": original_tokens,
-                "clean_tokens": clean_tokens,
-                "token_reduction": token_reduction,
-                "words_removed": max(0, original_words - clean_words),
-                "efficiency_gain": get_efficiency_label(token_reduction)
-            })
+        # Cached texts are served directly, the rest are generated in batches
+        # on the inference thread; results come back in request order
+        results = await sanitize_many(original_texts, request.mode)
         
+        total_original_tokens = sum(result["original_tokens"] for result in results)
+        total_clean_tokens = sum(result["clean_tokens"] for result in results)
         total_reduction = calculate_reduction(total_original_tokens, total_clean_tokens)
         
         return {
@@ -301,6 +587,52 @@ async def sanitize_batch(request: BatchSanitizeRequest):
         raise HTTPException(status_code=500, detail=f"Inference error: {str(e)}")
 
 
+@app.post("/sanitize/document", response_model=DocumentSanitizeResponse, tags=["Sanitize"])
+async def sanitize_document(request: SanitizeRequest):
+    """
+    Sanitize a long document.
+    
+    The text is split into paragraphs, lines and sentence chunks that fit the
+    model's input budget. All chunks are generated together in batches (and
+    cached per chunk), then stitched back with the original layout. Metrics
+    are aggregated over the chunks; `segments` holds the per-chunk results.
+    """
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model still loading, please wait...")
+    
+    original_text = request.text.strip()
+    document = split_document(original_text, CHUNK_WORDS)
+    chunks = document.chunks
+    if len(chunks) > MAX_DOCUMENT_CHUNKS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Document splits into {len(chunks)} chunks, at most {MAX_DOCUMENT_CHUNKS} are allowed"
+        )
+    
+    try:
+        segments = await sanitize_many(chunks, request.mode)
+        clean_text = document.join([segment["clean_text"] for segment in segments])
+        
+        original_tokens = sum(segment["original_tokens"] for segment in segments)
+        clean_tokens = sum(segment["clean_tokens"] for segment in segments)
+        token_reduction = calculate_reduction(original_tokens, clean_tokens)
+        
+        return {
+            "original_text": original_text,
+            "clean_text": clean_text,
+            "original_tokens": original_tokens,
+            "clean_tokens": clean_tokens,
+            "token_reduction": token_reduction,
+            "words_removed": max(0, count_words(original_text) - count_words(clean_text)),
+            "efficiency_gain": get_efficiency_label(token_reduction),
+            "chunks": len(chunks),
+            "segments": segments
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Inference error: {str(e)}")
+
+
 # ==================== Run Server ====================
 
 if __name__ == "__main__":
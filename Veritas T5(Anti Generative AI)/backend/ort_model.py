@@ -0,0 +1,174 @@
+"""
+VERITAS ONNX Runtime model
+Serve the T5 checkpoint from the encoder/decoder graphs written by
+`scripts/export_onnx.py`.
+
+Three graphs are used, as in the usual seq2seq export with KV-cache:
+
+* encoder.onnx           - (input_ids, attention_mask) -> encoder hidden states
+* decoder.onnx           - first step: logits plus self- and cross-attention keys/values
+* decoder_with_past.onnx - later steps: one new token and the cached keys/values
+
+`OnnxT5ForConditionalGeneration` is a `PreTrainedModel` without weights whose
+forward() runs these graphs, so `generate()` (beam search, streamers,
+stopping criteria) works on it exactly as on the PyTorch model.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from transformers import GenerationConfig, PreTrainedModel, T5Config
+from transformers.modeling_outputs import BaseModelOutput, Seq2SeqLMOutput
+
+# File names written by scripts/export_onnx.py
+ONNX_ENCODER = "encoder.onnx"
+ONNX_DECODER = "decoder.onnx"
+ONNX_DECODER_WITH_PAST = "decoder_with_past.onnx"
+ONNX_GRAPHS = (ONNX_ENCODER, ONNX_DECODER, ONNX_DECODER_WITH_PAST)
+
+
+def default_onnx_dir(model_path: str) -> str:
+    """Where scripts/export_onnx.py writes a checkpoint's graphs by default."""
+    return os.path.normpath(model_path) + "-onnx"
+
+
+def onnx_file(onnx_dir: str, name: str, quantized: bool = False) -> str:
+    if quantized:
+        name = name.replace(".onnx", ".int8.onnx")
+    return os.path.join(onnx_dir, name)
+
+
+def past_names(num_layers: int, prefix: str, attention: Tuple[str, ...] = ("decoder", "encoder")) -> List[str]:
+    """Graph input/output names of the cache, in T5's per-layer (self k, self v, cross k, cross v) order."""
+    return [
+        f"{prefix}.{layer}.{kind}.{part}"
+        for layer in range(num_layers)
+        for kind in attention
+        for part in ("key", "value")
+    ]
+
+
+class _Graph:
+    """An ONNX Runtime session fed from torch tensors."""
+
+    def __init__(self, session):
+        self.session = session
+        # Graphs may drop inputs the export didn't use (e.g. encoder states once cross-attention is cached)
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    def run(self, feed: Dict[str, torch.Tensor]) -> List[np.ndarray]:
+        return self.session.run(None, {name: np.ascontiguousarray(value.numpy()) for name, value in feed.items()
+                                       if name in self.input_names})
+
+
+class OnnxT5Encoder(nn.Module):
+    """Callable like `model.get_encoder()`, as `generate()` expects."""
+
+    main_input_name = "input_ids"
+
+    def __init__(self, graph: _Graph):
+        super().__init__()
+        self.graph = graph
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: Optional[torch.Tensor] = None, **kwargs):
+        if attention_mask is None:
+            attention_mask = torch.ones_like(input_ids)
+        (hidden_states,) = self.graph.run({"input_ids": input_ids, "attention_mask": attention_mask})
+        return BaseModelOutput(last_hidden_state=torch.from_numpy(hidden_states))
+
+
+class OnnxT5ForConditionalGeneration(PreTrainedModel):
+    """T5 for `generate()`, running on ONNX Runtime (CPU) instead of PyTorch."""
+
+    config_class = T5Config
+    main_input_name = "input_ids"
+
+    def __init__(self, config: T5Config, encoder: _Graph, decoder: _Graph, decoder_with_past: _Graph):
+        super().__init__(config)
+        self.encoder = OnnxT5Encoder(encoder)
+        self.decoder_graph = decoder
+        self.decoder_with_past_graph = decoder_with_past
+        self.num_layers = config.num_decoder_layers
+
+    @property
+    def device(self) -> torch.device:
+        return torch.device("cpu")
+
+    def get_encoder(self):
+        return self.encoder
+
+    def prepare_inputs_for_generation(self, input_ids, past_key_values=None, attention_mask=None,
+                                      encoder_outputs=None, **kwargs):
+        # Only the newest token is fed once the cache holds the rest
+        if past_key_values is not None:
+            input_ids = input_ids[:, -1:]
+        return {
+            "decoder_input_ids": input_ids,
+            "past_key_values": past_key_values,
+            "encoder_outputs": encoder_outputs,
+            "attention_mask": attention_mask,
+            "use_cache": True,
+        }
+
+    def forward(
+        self,
+        input_ids: Optional[torch.Tensor] = None,
+        attention_mask: Optional[torch.Tensor] = None,
+        decoder_input_ids: Optional[torch.Tensor] = None,
+        encoder_outputs=None,
+        past_key_values=None,
+        **kwargs,
+    ) -> Seq2SeqLMOutput:
+        if encoder_outputs is None:
+            encoder_outputs = self.encoder(input_ids=input_ids, attention_mask=attention_mask)
+        encoder_hidden_states = encoder_outputs[0]
+        if attention_mask is None:
+            attention_mask = torch.ones(encoder_hidden_states.shape[:2], dtype=torch.long)
+        feed = {
+            "decoder_input_ids": decoder_input_ids,
+            "encoder_hidden_states": encoder_hidden_states,
+            "encoder_attention_mask": attention_mask,
+        }
+
+        if past_key_values is None:
+            logits, *present = self.decoder_graph.run(feed)
+            present = [torch.from_numpy(t) for t in present]
+            past = tuple(tuple(present[4 * i:4 * i + 4]) for i in range(self.num_layers))
+        else:
+            names = past_names(self.num_layers, "past_key_values")
+            feed.update(zip(names, (t for layer in past_key_values for t in layer)))
+            logits, *present = self.decoder_with_past_graph.run(feed)
+            # Cross-attention keys/values don't change after the first step
+            past = tuple(
+                (torch.from_numpy(present[2 * i]), torch.from_numpy(present[2 * i + 1]), layer[2], layer[3])
+                for i, layer in enumerate(past_key_values)
+            )
+        return Seq2SeqLMOutput(logits=torch.from_numpy(logits), past_key_values=past)
+
+    @staticmethod
+    def _reorder_cache(past_key_values, beam_idx):
+        return tuple(tuple(t.index_select(0, beam_idx) for t in layer) for layer in past_key_values)
+
+
+def load_onnx_model(onnx_dir: str, quantized: bool = False, num_threads: int = 0) -> OnnxT5ForConditionalGeneration:
+    """Load the exported graphs (the INT8 ones if `quantized`) with ONNX Runtime."""
+    import onnxruntime as ort  # optional dependency, only needed for the onnx backends
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = num_threads  # 0 lets ONNX Runtime choose
+    graphs = []
+    for name in ONNX_GRAPHS:
+        path = onnx_file(onnx_dir, name, quantized)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"ONNX graph not found at {path}; run scripts/export_onnx.py first")
+        graphs.append(_Graph(ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])))
+
+    model = OnnxT5ForConditionalGeneration(T5Config.from_pretrained(onnx_dir), *graphs)
+    if os.path.exists(os.path.join(onnx_dir, "generation_config.json")):
+        model.generation_config = GenerationConfig.from_pretrained(onnx_dir)
+    model.eval()
+    return model
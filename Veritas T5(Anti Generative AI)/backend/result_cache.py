@@ -0,0 +1,168 @@
+"""
+VERITAS result cache
+Content-addressed cache of full sanitize responses.
+
+Decoding is deterministic, so the same input always yields the same output for
+a given checkpoint and decoding parameters. Responses are cached under
+sha256(checkpoint + decoding parameters + normalized text) in two tiers:
+
+* an in-memory LRU (per process), and
+* an optional SQLite file that survives restarts and is shared by workers.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize Unicode and whitespace; case is kept since the model is case-sensitive."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def checkpoint_id(model_path: str) -> str:
+    """Identify a checkpoint directory by its path and the size/mtime of its files."""
+    parts = [os.path.realpath(model_path)]
+    if os.path.isdir(model_path):
+        for name in sorted(os.listdir(model_path)):
+            stat = os.stat(os.path.join(model_path, name))
+            parts.append(f"{name}:{stat.st_size}:{int(stat.st_mtime)}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(text: str, checkpoint: str, decoding: Dict) -> str:
+    params = json.dumps(decoding, sort_keys=True)
+    return hashlib.sha256(f"{checkpoint}\n{params}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class SqliteResultStore:
+    """Persistent tier: one row per cached response, oldest rows pruned past `max_entries`."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int = 1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)")
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, payload: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(payload), time.time()),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self) -> None:
+        count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """In-memory LRU in front of an optional SQLite store, with hit/miss counters."""
+
+    def __init__(self, max_entries: int = 10000, store: Optional[SqliteResultStore] = None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return dict(payload)
+
+        if self.store is not None:
+            payload = self.store.get(key)
+            if payload is not None:
+                self._remember(key, payload)
+                with self._lock:
+                    self.disk_hits += 1
+                return dict(payload)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, payload: dict) -> None:
+        self._remember(key, payload)
+        if self.store is not None:
+            self.store.put(key, payload)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.store is not None and self.store.get(key) is not None
+
+    def _remember(self, key: str, payload: dict) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = dict(payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+            }
+        if self.store is not None:
+            stats["disk_entries"] = len(self.store)
+        return stats
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,262 @@
+"""
+VERITAS generation scheduler
+Cross-request dynamic batching for single-text requests.
+
+Requests are queued by the async handlers. A single worker task groups jobs
+that share the same decoding parameters into one batch, up to `max_batch_size`
+jobs and a padded token budget of `max_batch_tokens` (batch size x longest
+prompt), waiting at most `max_wait_ms` for the batch to fill. The batch runs
+in a dedicated inference thread so the event loop keeps serving requests, and
+each caller's future is resolved with its own result. Jobs that don't fit the
+current batch (other decoding parameters, or over budget) keep their place at
+the front of the line for the next one.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Recent samples kept for percentiles in the metrics snapshot
+_RECENT = 1024
+
+
+class GenerationJob:
+    __slots__ = ("input_ids", "decoding", "key", "future", "enqueued_at")
+
+    def __init__(self, input_ids: List[int], decoding: Dict, future: asyncio.Future):
+        self.input_ids = input_ids
+        self.decoding = decoding
+        self.key = tuple(sorted(decoding.items()))
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+    @property
+    def tokens(self) -> int:
+        return len(self.input_ids)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class SchedulerStats:
+    """Queue wait, batch fill and throughput counters for /metrics."""
+
+    def __init__(self):
+        self.requests = 0
+        self.batches = 0
+        self.batch_errors = 0
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+        self.queue_waits: Deque[float] = deque(maxlen=_RECENT)
+        self.batch_sizes: Deque[int] = deque(maxlen=_RECENT)
+        self.fill_ratios: Deque[float] = deque(maxlen=_RECENT)
+
+    def snapshot(self, queue_depth: int) -> Dict[str, Any]:
+        waits = list(self.queue_waits)
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "batch_errors": self.batch_errors,
+            "queue_depth": queue_depth,
+            "queue_wait_ms": {
+                "mean": sum(waits) / len(waits) * 1000 if waits else 0.0,
+                "p50": _percentile(waits, 0.50) * 1000,
+                "p95": _percentile(waits, 0.95) * 1000,
+            },
+            "avg_batch_size": sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else 0.0,
+            "avg_batch_fill_ratio": sum(self.fill_ratios) / len(self.fill_ratios) if self.fill_ratios else 0.0,
+            "generated_tokens": self.generated_tokens,
+            "tokens_per_sec": self.generated_tokens / self.generation_seconds if self.generation_seconds else 0.0,
+        }
+
+
+class StreamStats:
+    """Time to first token and total latency of streamed generations, for /metrics."""
+
+    def __init__(self):
+        self.streams = 0
+        self.first_token: Deque[float] = deque(maxlen=_RECENT)
+        self.total: Deque[float] = deque(maxlen=_RECENT)
+
+    def observe(self, first_token: Optional[float], total: float) -> None:
+        self.streams += 1
+        if first_token is not None:
+            self.first_token.append(first_token)
+        self.total.append(total)
+
+    def snapshot(self) -> Dict[str, Any]:
+        first_token, total = list(self.first_token), list(self.total)
+        return {
+            "streams": self.streams,
+            "time_to_first_token_ms": {"p50": _percentile(first_token, 0.50) * 1000,
+                                       "p95": _percentile(first_token, 0.95) * 1000},
+            "total_ms": {"p50": _percentile(total, 0.50) * 1000, "p95": _percentile(total, 0.95) * 1000},
+        }
+
+
+class GenerationScheduler:
+    """Batches queued generation jobs and runs them off the event loop."""
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[List[int]], Dict], List[Any]],
+        max_batch_size: int = 16,
+        max_batch_tokens: int = 2048,
+        max_wait_ms: float = 10.0,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ):
+        if max_batch_size < 1 or max_batch_tokens < 1:
+            raise ValueError("max_batch_size and max_batch_tokens must be >= 1")
+        # process_batch(list of input ids, decoding) -> one result per input, in order
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        # A single inference thread: torch already parallelises inside an op
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="generation")
+        self.stats = SchedulerStats()
+        self._queue: Optional[asyncio.Queue] = None
+        self._backlog: Deque[GenerationJob] = deque()
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._backlog) + (self._queue.qsize() if self._queue is not None else 0)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = list(self._backlog)
+        self._backlog.clear()
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for job in pending:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("Generation scheduler stopped"))
+
+    async def submit(self, input_ids: List[int], decoding: Dict) -> Any:
+        """Queue one tokenized prompt and wait for its result."""
+        if not self.running:
+            raise RuntimeError("Generation scheduler is not running")
+        job = GenerationJob(input_ids, decoding, asyncio.get_running_loop().create_future())
+        self._queue.put_nowait(job)
+        self.stats.requests += 1
+        return await job.future
+
+    def _padded_tokens(self, batch: List[GenerationJob], job: GenerationJob) -> int:
+        return (len(batch) + 1) * max(job.tokens, max(j.tokens for j in batch))
+
+    async def _next_job(self, timeout: Optional[float]) -> Optional[GenerationJob]:
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if timeout is None:
+            return await self._queue.get()
+        if timeout <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _collect(self) -> List[GenerationJob]:
+        loop = asyncio.get_running_loop()
+        first = self._backlog.popleft() if self._backlog else await self._next_job(None)
+        batch = [first]
+        deferred: Deque[GenerationJob] = deque()
+        budget_full = False
+
+        def offer(job: GenerationJob) -> None:
+            nonlocal budget_full
+            if budget_full or job.key != first.key:
+                deferred.append(job)
+            elif self._padded_tokens(batch, job) > self.max_batch_tokens:
+                # Same parameters but no room left: it leads the next batch
+                budget_full = True
+                deferred.append(job)
+            else:
+                batch.append(job)
+
+        # Jobs held over from earlier batches go first
+        while self._backlog and len(batch) < self.max_batch_size and not budget_full:
+            offer(self._backlog.popleft())
+
+        deadline = loop.time() + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size and not budget_full:
+                job = await self._next_job(deadline - loop.time())
+                if job is None:
+                    break
+                offer(job)
+        except asyncio.CancelledError:
+            # Stopped while the batch filled: hand the jobs held here back to the
+            # backlog, where stop() fails them
+            self._backlog = deque([*batch, *deferred, *self._backlog])
+            raise
+
+        deferred.extend(self._backlog)
+        self._backlog = deferred
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (client disconnect) don't need a generate() call
+            batch = [job for job in batch if not job.future.done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for job in batch:
+                self.stats.queue_waits.append(started - job.enqueued_at)
+            self.stats.batch_sizes.append(len(batch))
+            self.stats.fill_ratios.append(len(batch) * max(j.tokens for j in batch) / self.max_batch_tokens)
+            self.stats.batches += 1
+
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, self.process_batch, [job.input_ids for job in batch], batch[0].decoding
+                )
+                if len(results) != len(batch):
+                    raise RuntimeError(f"process_batch returned {len(results)} results for {len(batch)} jobs")
+            except asyncio.CancelledError:
+                # Stopped mid-batch: the thread finishes on its own, but nobody will
+                # collect its results
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(RuntimeError("Generation scheduler stopped"))
+                raise
+            except Exception as e:
+                self.stats.batch_errors += 1
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                continue
+            finally:
+                self.stats.generation_seconds += time.perf_counter() - started
+
+            self.stats.generated_tokens += sum(getattr(r, "output_tokens", 0) for r in results)
+            for job, result in zip(batch, results):
+                if not job.future.done():
+                    job.future.set_result(result)
@@ -0,0 +1,105 @@
+"""
+Throughput comparison: one pipeline call per text vs. batched generation.
+
+Runs the same texts through the original path (the text2text-generation
+pipeline, one beam search per text) and through `generate_batch` at several
+mini-batch sizes, then reports texts/sec, speedup and how many outputs match
+the original path exactly.
+
+Usage (from the backend directory):
+    python -m scripts.bench_batch [--model-path ../model/veritas-t5-checkpoints/checkpoint-11100] \
+        [--texts texts.txt] [--count 64] [--batch-sizes 1 4 8 16] [--output batch.json]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import torch
+from transformers import pipeline
+
+from generation import DECODING, build_prompt, generate_batch, load_model_and_tokenizer
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "..", "model", "veritas-t5-checkpoints", "checkpoint-11100",
+)
+
+SAMPLE_TEXTS = [
+    "We are seeking a rockstar ninja who thrives in a fast-paced environment and wears many hats.",
+    "Join our dynamic team!",
+    "The ideal candidate is a self-starter with a passion for synergy and a proven track record of "
+    "leveraging cross-functional collaboration to move the needle on key deliverables.",
+    "Competitive salary.",
+    "You will be empowered to take ownership of exciting challenges in a family-like culture where "
+    "we work hard and play hard, so you must be comfortable with ambiguity and shifting priorities.",
+    "Must be a team player.",
+    "We move fast and break things.",
+    "This role offers unlimited growth potential for a highly motivated individual who is ready to "
+    "hit the ground running from day one and go above and beyond.",
+]
+
+
+def load_texts(path, count):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS
+    return [texts[i % len(texts)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.environ.get("VERITAS_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--texts", help="File with one text per line (defaults to built-in samples)")
+    parser.add_argument("--count", type=int, default=64, help="Number of texts per run")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16])
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model, tokenizer = load_model_and_tokenizer(args.model_path)
+    fixer = pipeline("text2text-generation", model=model, tokenizer=tokenizer)
+    texts = load_texts(args.texts, args.count)
+
+    # Warm-up
+    fixer(build_prompt(texts[0]), **DECODING)
+
+    start = time.perf_counter()
+    reference = [fixer(build_prompt(text), **DECODING)[0]["generated_text"] for text in texts]
+    sequential = time.perf_counter() - start
+    report = {
+        "texts": len(texts),
+        "threads": torch.get_num_threads(),
+        "sequential": {"seconds": sequential, "texts_per_sec": len(texts) / sequential},
+        "batched": {},
+    }
+    print(f"{'mode':<14} {'seconds':>8} {'texts/s':>8} {'speedup':>8} {'exact match':>12}")
+    print(f"{'sequential':<14} {sequential:>8.2f} {len(texts) / sequential:>8.1f} {'1.00x':>8} {'-':>12}")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        outputs = [g.text for g in generate_batch(model, tokenizer, texts, batch_size=batch_size)]
+        elapsed = time.perf_counter() - start
+        matches = sum(a == b for a, b in zip(outputs, reference))
+        report["batched"][str(batch_size)] = {
+            "seconds": elapsed,
+            "texts_per_sec": len(texts) / elapsed,
+            "speedup": sequential / elapsed,
+            "exact_match": matches / len(texts),
+        }
+        print(f"{'batch=' + str(batch_size):<14} {elapsed:>8.2f} {len(texts) / elapsed:>8.1f} "
+              f"{sequential / elapsed:>7.2f}x {matches:>6}/{len(texts):<5}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Truth guardrail latency against the number of phrases.
+
+For each phrase-list size the script writes a config with the shipped phrases
+plus synthetic generic phrases (2-5 words from a fixed vocabulary, some
+sharing prefixes), then times over the same outputs:
+
+* `naive`: one case-insensitive whole-word regex search per phrase (what
+  checking each phrase anywhere in the output costs without a combined matcher)
+* `single`: `TruthGuardrail.apply` per output
+* `batch`: `TruthGuardrail.apply_batch` over --batch-size outputs at a time
+
+and reports µs per output (mean and p99 for `single`) and the time to compile
+the matcher. Both matchers must flag the same outputs.
+
+Usage (from the backend directory):
+    python -m scripts.bench_guardrail [--sizes 10 100 1000 5000] [--batch-size 16] [--output guardrail.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import tempfile
+import time
+
+from guardrail import TruthGuardrail
+from scripts.bench_tokens import SAMPLE_PAIRS
+
+SHIPPED_PHRASES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "guardrail_phrases.json")
+
+VOCABULARY = (
+    "things changes structures priorities the situation team company role roles are is being will be "
+    "evolving shifting moving happening changed aligned expected required you we they receive get little "
+    "limited some more guidance support direction going forward at this time over time in general"
+).split()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def synthetic_phrases(count, seed=0):
+    rng = random.Random(seed)
+    phrases = set()
+    while len(phrases) < count:
+        phrases.add(" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(2, 5))))
+    return sorted(phrases)
+
+
+def write_config(path, extra_phrases):
+    with open(SHIPPED_PHRASES, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config["generic"]["phrases"] = config["generic"]["phrases"] + extra_phrases
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    return [phrase for category in config.values() for phrase in category["phrases"]]
+
+
+def time_per_output(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(texts)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def run(size, outputs, args, directory):
+    path = os.path.join(directory, f"phrases-{size}.json")
+    phrases = write_config(path, synthetic_phrases(size))
+
+    start = time.perf_counter()
+    guardrail = TruthGuardrail(path)
+    compile_ms = (time.perf_counter() - start) * 1000
+    naive = [re.compile(rf"(?<!\w){re.escape(phrase)}(?!\w)", re.IGNORECASE) for phrase in phrases]
+
+    def naive_flags(texts):
+        return [any(regex.search(text) for regex in naive) for text in texts]
+
+    matcher = guardrail.matcher
+    flags = [bool(matches) for matches in matcher.find_batch(outputs)]
+    if flags != naive_flags(outputs):
+        raise AssertionError(f"{size} phrases: combined matcher and per-phrase search disagree")
+
+    single = []
+    for _ in range(args.repeat):
+        for text in outputs:
+            start = time.perf_counter()
+            guardrail.apply(text)
+            single.append(time.perf_counter() - start)
+    batches = [outputs[i:i + args.batch_size] for i in range(0, len(outputs), args.batch_size)]
+    batch = time_per_output(lambda texts: [guardrail.apply_batch(chunk) for chunk in batches], outputs, args.repeat)
+    naive_time = time_per_output(naive_flags, outputs, max(1, args.repeat // 10))
+
+    return {
+        "phrases": len(matcher.phrases),
+        "compile_ms": compile_ms,
+        "flagged": sum(flags),
+        "naive_us": naive_time * 1e6,
+        "single_us": {"mean": sum(single) / len(single) * 1e6, "p99": percentile(single, 0.99) * 1e6},
+        "batch_us": batch * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 1000, 5000])
+    parser.add_argument("--count", type=int, default=256, help="Outputs per run")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    # Outputs in the style of the model's, a few containing generic or dismissive phrases
+    rng = random.Random(1)
+    base = [clean for _, clean in SAMPLE_PAIRS] + [
+        "Things are changing, so you will just have to adapt.",
+        "The situation is evolving and priorities may shift.",
+        "It is merely a reorganisation of the team.",
+    ]
+    outputs = [f"{rng.choice(base)} {rng.choice(base)}" if i % 3 else rng.choice(base) for i in range(args.count)]
+
+    report = {"outputs": len(outputs), "batch_size": args.batch_size, "runs": []}
+    print(f"{len(outputs)} outputs, mean {sum(map(len, outputs)) / len(outputs):.0f} chars")
+    print(f"{'phrases':>8} {'compile ms':>11} {'naive µs':>9} {'single µs':>10} {'p99 µs':>8} "
+          f"{'batch µs':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            result = run(size, outputs, args, directory)
+            report["runs"].append(result)
+            print(f"{result['phrases']:>8} {result['compile_ms']:>11.1f} {result['naive_us']:>9.1f} "
+                  f"{result['single_us']['mean']:>10.1f} {result['single_us']['p99']:>8.1f} "
+                  f"{result['batch_us']:>9.1f} {result['naive_us'] / result['batch_us']:>7.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Per-request CPU cost of response metrics: re-encoding vs. reusing ids.
+
+The old response path encoded the prompt for generation, then re-encoded the
+original and clean texts with the slow sentencepiece tokenizer to count
+tokens. The new path encodes the prompt once (with the fast tokenizer where it
+matches the slow one) and takes both counts from the prompt and output ids.
+
+The model is not run: each clean text is encoded into the ids generate()
+would return (decoder start token, text, </s>) and decoded once up front, so
+only tokenization and metric work is timed. Reports CPU µs per request for
+both paths, the saving, and how often the token counts agree.
+
+Usage (from the backend directory):
+    python -m scripts.bench_tokens [--model-path ../model/veritas-t5-checkpoints/checkpoint-11100] \
+        [--repeat 200] [--output tokens.json]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import torch
+from transformers import T5Tokenizer
+
+from generation import DECODING, encode_prompts, input_text_tokens, load_tokenizer, output_text_tokens
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "..", "model", "veritas-t5-checkpoints", "checkpoint-11100",
+)
+
+# (original, clean) pairs in the style of the training data
+SAMPLE_PAIRS = [
+    ("We are seeking a rockstar ninja who thrives in a fast-paced environment and wears many hats.",
+     "We need a capable person who can handle several roles in a busy team."),
+    ("The ideal candidate is a self-starter with a passion for synergy and a proven track record of "
+     "leveraging cross-functional collaboration to move the needle on key deliverables.",
+     "The candidate works independently and has worked well with other teams on results."),
+    ("You will be empowered to take ownership of exciting challenges in a family-like culture where "
+     "we work hard and play hard, so you must be comfortable with ambiguity and shifting priorities.",
+     "You will own your work. Expect long hours and priorities that change often."),
+    ("This role offers unlimited growth potential for a highly motivated individual who is ready to "
+     "hit the ground running from day one and go above and beyond.",
+     "The role has room to grow. You are expected to start quickly and work extra."),
+]
+
+
+def long_pair(words: int):
+    """A ~`words`-word original and a clean text capped at the decoding max_length."""
+    originals, cleans = [], []
+    while sum(len(text.split()) for text in originals) < words:
+        for original, clean in SAMPLE_PAIRS:
+            originals.append(original)
+            cleans.append(clean)
+    original = " ".join(" ".join(originals).split()[:words])
+    return original, " ".join(cleans)
+
+
+def generated_ids(tokenizer, clean_text: str) -> torch.Tensor:
+    """The ids generate() returns for `clean_text`: decoder start, text, </s>, capped at max_length."""
+    ids = tokenizer.encode(clean_text)[:DECODING["max_length"] - 2] + [tokenizer.eos_token_id]
+    return torch.tensor([[tokenizer.pad_token_id] + ids])
+
+
+def old_metrics(slow, original, clean):
+    # Prompt encoding for generate(), then both texts re-encoded for the counts
+    encode_prompts(slow, [original])
+    original_tokens = len(slow.encode(original, add_special_tokens=False))
+    clean_tokens = len(slow.encode(clean, add_special_tokens=False))
+    return original_tokens, clean_tokens, len(original.split()) - len(clean.split())
+
+
+def new_metrics(tokenizer, original, clean, output_ids):
+    input_ids = encode_prompts(tokenizer, [original])[0]
+    original_tokens = input_text_tokens(tokenizer, input_ids)
+    clean_tokens = output_text_tokens(tokenizer, output_ids)[0]
+    return original_tokens, clean_tokens, len(original.split()) - len(clean.split())
+
+
+def cpu_us(fn, repeat):
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.environ.get("VERITAS_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--repeat", type=int, default=200, help="Timed runs per input")
+    parser.add_argument("--long-words", type=int, default=1000, help="Words in the long input")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    slow = T5Tokenizer.from_pretrained(args.model_path, legacy=True)
+    tokenizer = load_tokenizer(args.model_path)
+    print(f"Tokenizer: {type(tokenizer).__name__}")
+
+    cases = {"typical": SAMPLE_PAIRS, f"{args.long_words}_words": [long_pair(args.long_words)]}
+    report = {"tokenizer": type(tokenizer).__name__, "repeat": args.repeat, "cases": {}}
+    print(f"{'input':<12} {'old µs':>10} {'new µs':>10} {'saved µs':>10} {'speedup':>8} {'counts agree':>13}")
+
+    for name, pairs in cases.items():
+        old_total = new_total = 0.0
+        agree = 0
+        for original, reference in pairs:
+            output_ids = generated_ids(slow, reference)
+            # The response's clean text is decoded from the output ids, as in generation.py
+            clean = slow.batch_decode(output_ids, skip_special_tokens=True, clean_up_tokenization_spaces=False)[0]
+            old = old_metrics(slow, original, clean)
+            new = new_metrics(tokenizer, original, clean, output_ids)
+            agree += int(old == new)
+            old_total += cpu_us(lambda: old_metrics(slow, original, clean), args.repeat)
+            new_total += cpu_us(lambda: new_metrics(tokenizer, original, clean, output_ids), args.repeat)
+
+        old_us, new_us = old_total / len(pairs), new_total / len(pairs)
+        report["cases"][name] = {
+            "old_us": old_us,
+            "new_us": new_us,
+            "saved_us": old_us - new_us,
+            "speedup": old_us / new_us if new_us else 0.0,
+            "count_agreement": agree / len(pairs),
+        }
+        print(f"{name:<12} {old_us:>10.1f} {new_us:>10.1f} {old_us - new_us:>10.1f} "
+              f"{old_us / new_us:>7.2f}x {agree:>7}/{len(pairs):<5}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Throughput scaling of serve.py across worker counts.
+
+For each worker count the script starts `serve.py` (cache disabled, one
+thread per worker's share of the cores), sends the same number of distinct
+/sanitize requests from `--concurrency` client threads and reports
+requests/sec, latency p50/p95, scaling relative to the first run, and the
+memory of every worker (RSS, PSS and shared) after the load.
+
+Usage (from the backend directory):
+    python -m scripts.bench_workers [--workers 1 2 4] [--requests 64] [--concurrency 8] \
+        [--model-path ../model/veritas-t5-checkpoints/checkpoint-11100] [--pin-cores] [--output workers.json]
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.bench_batch import DEFAULT_MODEL_PATH, SAMPLE_TEXTS
+from weights import process_memory
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def post(url, payload, timeout=300):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def child_pids(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def start_server(args, workers, port):
+    env = dict(os.environ, VERITAS_MODEL_PATH=args.model_path, VERITAS_CACHE_SIZE="0")
+    env.pop("VERITAS_CACHE_DB", None)
+    command = [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port),
+               "--host", "127.0.0.1", "--log-level", "warning", "--report-delay", "1e9"]
+    if args.pin_cores:
+        command.append("--pin-cores")
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"serve.py exited with status {server.returncode}")
+        try:
+            # One request per worker so every worker has loaded and warmed up
+            if len(child_pids(server.pid)) == workers:
+                with ThreadPoolExecutor(workers) as pool:
+                    list(pool.map(lambda i: post(f"http://127.0.0.1:{port}/sanitize",
+                                                 {"text": f"{SAMPLE_TEXTS[0]} warm-up {i}"}), range(workers)))
+                return server
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("serve.py did not become ready in time")
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def run(args, workers, port):
+    server = start_server(args, workers, port)
+    try:
+        url = f"http://127.0.0.1:{port}/sanitize"
+        # Distinct texts, so neither the result cache nor repeated inputs help
+        texts = [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(args.requests)]
+
+        def timed(text):
+            start = time.perf_counter()
+            post(url, {"text": text})
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            latencies = list(pool.map(timed, texts))
+        elapsed = time.perf_counter() - start
+        memory = [process_memory(pid) for pid in child_pids(server.pid)]
+    finally:
+        stop_server(server)
+
+    return {
+        "workers": workers,
+        "requests_per_sec": len(texts) / elapsed,
+        "latency_ms": {"p50": percentile(latencies, 0.50) * 1000, "p95": percentile(latencies, 0.95) * 1000},
+        "worker_memory": memory,
+        "total_pss_mb": round(sum(m.get("pss_mb", 0.0) for m in memory), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.environ.get("VERITAS_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pin-cores", action="store_true")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    cores = len(os.sched_getaffinity(0))
+    report = {"cores": cores, "requests": args.requests, "concurrency": args.concurrency, "runs": []}
+    print(f"{cores} core(s), {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'workers':>7} {'req/s':>8} {'scaling':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'RSS/worker':>11} {'PSS total':>10}")
+
+    baseline = None
+    for workers in args.workers:
+        result = run(args, workers, args.port)
+        baseline = baseline or result["requests_per_sec"]
+        result["scaling"] = result["requests_per_sec"] / baseline
+        report["runs"].append(result)
+        rss = [m.get("rss_mb", 0.0) for m in result["worker_memory"]]
+        print(f"{workers:>7} {result['requests_per_sec']:>8.2f} {result['scaling']:>7.2f}x "
+              f"{result['latency_ms']['p50']:>8.0f} {result['latency_ms']['p95']:>8.0f} "
+              f"{sum(rss) / max(1, len(rss)):>9.0f}MB {result['total_pss_mb']:>8.0f}MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
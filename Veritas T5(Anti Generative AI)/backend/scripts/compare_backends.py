@@ -0,0 +1,110 @@
+"""
+Output-parity and latency comparison of inference backends against fp32 PyTorch.
+
+Every backend generates for the same held-out texts. Relative to the fp32
+`torch` backend the script reports:
+
+* exact match (share of texts whose clean_text is identical; the guardrail is
+  a function of the generated text, so comparing generations is enough)
+* output length (mean generated tokens, and mean absolute difference per text)
+* latency per text (p50 / p95, one text per generate() call)
+* batched throughput (texts/sec at --batch-size, length-sorted as in /sanitize/batch)
+
+Usage (from the backend directory):
+    python -m scripts.export_onnx --quantize
+    python -m scripts.compare_backends --backends onnx onnx-int8 --texts heldout.txt [--greedy] [--output parity.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+
+from generation import BACKENDS, DECODING, STREAM_DECODING, generate_batch, load_model_and_tokenizer
+from scripts.bench_batch import DEFAULT_MODEL_PATH, load_texts
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_backend(name, args, texts, decoding):
+    model, tokenizer = load_model_and_tokenizer(args.model_path, name, args.onnx_dir)
+    # Warm-up
+    generate_batch(model, tokenizer, texts[:1], 1, decoding)
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        generate_batch(model, tokenizer, [text], 1, decoding)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    generations = generate_batch(model, tokenizer, texts, args.batch_size, decoding)
+    batched = time.perf_counter() - start
+    return generations, {
+        "latency_ms": {"p50": percentile(latencies, 0.50) * 1000, "p95": percentile(latencies, 0.95) * 1000},
+        "texts_per_sec": len(texts) / batched,
+        "mean_output_tokens": statistics.mean(g.output_tokens for g in generations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.environ.get("VERITAS_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--onnx-dir", help="Exported graphs (defaults to <model-path>-onnx)")
+    parser.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"], choices=BACKENDS)
+    parser.add_argument("--texts", help="Held-out texts, one per line (defaults to built-in samples)")
+    parser.add_argument("--count", type=int, default=1000, help="At most this many texts")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--greedy", action="store_true", help="Compare streaming (greedy) decoding instead of 4 beams")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    decoding = STREAM_DECODING if args.greedy else DECODING
+    texts = load_texts(args.texts, args.count)
+    # Distinct texts only: repeats would inflate the exact-match rate
+    texts = list(dict.fromkeys(texts))
+
+    reference, report_ref = run_backend("torch", args, texts, decoding)
+    report = {"texts": len(texts), "decoding": decoding, "backends": {"torch": report_ref}}
+
+    print(f"{'backend':<10} {'exact':>7} {'tokens':>7} {'|Δlen|':>7} {'p50 ms':>8} {'p95 ms':>8} {'texts/s':>8}")
+
+    def row(name, stats):
+        print(f"{name:<10} {stats.get('exact_match', 1.0):>7.1%} {stats['mean_output_tokens']:>7.1f} "
+              f"{stats.get('mean_abs_length_diff', 0.0):>7.2f} {stats['latency_ms']['p50']:>8.1f} "
+              f"{stats['latency_ms']['p95']:>8.1f} {stats['texts_per_sec']:>8.1f}")
+
+    row("torch", report_ref)
+    for name in args.backends:
+        if name == "torch":
+            continue
+        generations, stats = run_backend(name, args, texts, decoding)
+        stats["exact_match"] = sum(a.text == b.text for a, b in zip(reference, generations)) / len(texts)
+        stats["mean_abs_length_diff"] = statistics.mean(
+            abs(a.output_tokens - b.output_tokens) for a, b in zip(reference, generations)
+        )
+        stats["speedup_p50"] = report_ref["latency_ms"]["p50"] / stats["latency_ms"]["p50"]
+        stats["mismatches"] = [
+            {"text": text, "torch": a.text, name: b.text}
+            for text, a, b in zip(texts, reference, generations) if a.text != b.text
+        ][:10]
+        report["backends"][name] = stats
+        row(name, stats)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Quality and latency of the decoding profiles against the current fixed settings.
+
+Every text is generated once with the fixed `DECODING` (4 beams,
+max_length=96, min_length=10) as the reference, then with each profile
+(fast, balanced, quality and auto, all with lengths scaled to the input, see
+`generation.decoding_for`). Per profile the script reports:
+
+* exact match with the reference output
+* mean generated tokens
+* latency per text (p50 / p95, one text per generate() call) and p50 speedup
+
+and the same broken down by input length (short / medium / long, split at the
+auto profile limits).
+
+Usage (from the backend directory):
+    python -m scripts.eval_profiles [--texts heldout.txt] [--output profiles.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+
+from generation import (
+    AUTO_PROFILES,
+    DECODING,
+    MODES,
+    decoding_for,
+    encode_prompts,
+    generate_from_ids,
+    input_text_tokens,
+    load_model_and_tokenizer,
+)
+from scripts.bench_batch import DEFAULT_MODEL_PATH, SAMPLE_TEXTS
+
+# Short inputs, where the fixed settings cost the most relative to the output
+SHORT_TEXTS = [
+    "Rockstar developer wanted.",
+    "Fast-paced environment.",
+    "Wear many hats.",
+    "Family-like culture.",
+    "Hit the ground running.",
+    "Unlimited PTO.",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def band(input_tokens):
+    short_limit, medium_limit = AUTO_PROFILES[0][0], AUTO_PROFILES[1][0]
+    if input_tokens <= short_limit:
+        return "short"
+    return "medium" if input_tokens <= medium_limit else "long"
+
+
+def run(model, tokenizer, encoded, decodings):
+    generations, latencies = [], []
+    for input_ids, decoding in zip(encoded, decodings):
+        start = time.perf_counter()
+        generations.extend(generate_from_ids(model, tokenizer, [input_ids], 1, decoding))
+        latencies.append(time.perf_counter() - start)
+    return generations, latencies
+
+
+def summarize(indices, generations, latencies, reference, reference_latencies):
+    p50 = percentile([latencies[i] for i in indices], 0.50)
+    return {
+        "texts": len(indices),
+        "exact_match": sum(generations[i].text == reference[i].text for i in indices) / len(indices),
+        "mean_output_tokens": statistics.mean(generations[i].output_tokens for i in indices),
+        "latency_ms": {"p50": p50 * 1000, "p95": percentile([latencies[i] for i in indices], 0.95) * 1000},
+        "speedup_p50": percentile([reference_latencies[i] for i in indices], 0.50) / p50,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.environ.get("VERITAS_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--texts", help="Held-out texts, one per line (defaults to built-in samples)")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+    else:
+        texts = SHORT_TEXTS + SAMPLE_TEXTS
+
+    model, tokenizer = load_model_and_tokenizer(args.model_path)
+    encoded = encode_prompts(tokenizer, texts)
+    lengths = [input_text_tokens(tokenizer, input_ids) for input_ids in encoded]
+    bands = {}
+    for i, length in enumerate(lengths):
+        bands.setdefault(band(length), []).append(i)
+
+    # Warm-up
+    generate_from_ids(model, tokenizer, encoded[:1], 1, DECODING)
+    reference, reference_latencies = run(model, tokenizer, encoded, [DECODING] * len(texts))
+
+    everything = list(range(len(texts)))
+    report = {"texts": len(texts), "reference": DECODING, "profiles": {}}
+    print(f"{len(texts)} texts: " + ", ".join(f"{len(indices)} {name}" for name, indices in bands.items()))
+    print(f"{'profile':<10} {'exact':>7} {'tokens':>7} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    current = summarize(everything, reference, reference_latencies, reference, reference_latencies)
+    print(f"{'current':<10} {current['exact_match']:>7.1%} {current['mean_output_tokens']:>7.1f} "
+          f"{current['latency_ms']['p50']:>8.1f} {current['latency_ms']['p95']:>8.1f} {'1.00x':>8}")
+
+    for mode in MODES[1:] + MODES[:1]:
+        decodings = [decoding_for(length, mode) for length in lengths]
+        generations, latencies = run(model, tokenizer, encoded, decodings)
+        stats = summarize(everything, generations, latencies, reference, reference_latencies)
+        stats["by_length"] = {name: summarize(indices, generations, latencies, reference, reference_latencies)
+                              for name, indices in bands.items()}
+        report["profiles"][mode] = stats
+        print(f"{mode:<10} {stats['exact_match']:>7.1%} {stats['mean_output_tokens']:>7.1f} "
+              f"{stats['latency_ms']['p50']:>8.1f} {stats['latency_ms']['p95']:>8.1f} "
+              f"{stats['speedup_p50']:>7.2f}x")
+
+    print("\nauto profile by input length:")
+    for name, stats in report["profiles"]["auto"]["by_length"].items():
+        print(f"  {name:<8} {stats['texts']:>3} texts  exact {stats['exact_match']:>6.1%}  "
+              f"p50 {stats['latency_ms']['p50']:>7.1f} ms  speedup {stats['speedup_p50']:.2f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Export the T5 checkpoint to ONNX for the onnx backends (see ort_model.py).
+
+Writes three graphs with dynamic batch and sequence axes:
+
+* encoder.onnx           - (input_ids, attention_mask) -> encoder_hidden_states
+* decoder.onnx           - (decoder_input_ids, encoder_hidden_states, encoder_attention_mask)
+                           -> logits, present.* (self- and cross-attention keys/values)
+* decoder_with_past.onnx - the same plus past_key_values.*, one new token per row
+                           -> logits, present.* (self-attention keys/values)
+
+plus the checkpoint's config.json and generation_config.json. With --quantize,
+an INT8 dynamic-quantized copy of each graph (`*.int8.onnx`, MatMul weights
+only) is written next to it.
+
+Usage (from the backend directory):
+    python -m scripts.export_onnx [--model-path ../model/veritas-t5-checkpoints/checkpoint-11100] \
+        [--output-dir ../model/veritas-t5-checkpoints/checkpoint-11100-onnx] [--quantize]
+"""
+
+import argparse
+import inspect
+import os
+
+import torch
+import torch.nn as nn
+from transformers import T5ForConditionalGeneration
+
+from ort_model import (
+    ONNX_DECODER,
+    ONNX_DECODER_WITH_PAST,
+    ONNX_ENCODER,
+    ONNX_GRAPHS,
+    default_onnx_dir,
+    onnx_file,
+    past_names,
+)
+
+DEFAULT_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "..", "model", "veritas-t5-checkpoints", "checkpoint-11100",
+)
+
+OPSET = 14
+# The legacy (TorchScript) exporter traces the cache lengths as dynamic shapes. torch
+# 2.5 added the dynamo exporter, default since 2.9, and `dynamo=` to choose; before
+# that the legacy exporter is the only one and `dynamo=` is not accepted
+LEGACY_EXPORTER = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+
+def lm_logits(model, hidden_states):
+    # Same scaling as T5ForConditionalGeneration.forward with tied embeddings
+    if model.config.tie_word_embeddings:
+        hidden_states = hidden_states * (model.model_dim ** -0.5)
+    return model.lm_head(hidden_states)
+
+
+class Encoder(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.get_encoder()
+
+    def forward(self, input_ids, attention_mask):
+        return self.encoder(input_ids=input_ids, attention_mask=attention_mask, return_dict=False)[0]
+
+
+class Decoder(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask):
+        outputs = self.model.get_decoder()(
+            input_ids=decoder_input_ids,
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_attention_mask=encoder_attention_mask,
+            use_cache=True,
+            return_dict=True,
+        )
+        present = tuple(t for layer in outputs.past_key_values for t in layer)
+        return (lm_logits(self.model, outputs.last_hidden_state),) + present
+
+
+class DecoderWithPast(nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask, *past):
+        past_key_values = tuple(tuple(past[4 * i:4 * i + 4]) for i in range(len(past) // 4))
+        outputs = self.model.get_decoder()(
+            input_ids=decoder_input_ids,
+            encoder_hidden_states=encoder_hidden_states,
+            encoder_attention_mask=encoder_attention_mask,
+            past_key_values=past_key_values,
+            use_cache=True,
+            return_dict=True,
+        )
+        # Only self-attention grows; cross-attention keys/values are kept by the caller
+        present = tuple(t for layer in outputs.past_key_values for t in layer[:2])
+        return (lm_logits(self.model, outputs.last_hidden_state),) + present
+
+
+def export(model, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    config = model.config
+    num_layers = config.num_decoder_layers
+    batch, source, target = 2, 12, 5
+
+    input_ids = torch.randint(5, config.vocab_size, (batch, source), dtype=torch.long)
+    attention_mask = torch.ones_like(input_ids)
+    attention_mask[1, -3:] = 0
+    decoder_input_ids = torch.randint(5, config.vocab_size, (batch, target), dtype=torch.long)
+
+    torch.onnx.export(
+        Encoder(model), (input_ids, attention_mask), onnx_file(output_dir, ONNX_ENCODER),
+        input_names=["input_ids", "attention_mask"], output_names=["encoder_hidden_states"],
+        dynamic_axes={"input_ids": {0: "batch", 1: "encoder_sequence"},
+                      "attention_mask": {0: "batch", 1: "encoder_sequence"},
+                      "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"}},
+        opset_version=OPSET, **LEGACY_EXPORTER,
+    )
+    encoder_hidden_states = Encoder(model)(input_ids, attention_mask)
+
+    present = past_names(num_layers, "present")
+    cache_axes = {name: {0: "batch", 2: "past_sequence" if ".decoder." in name else "encoder_sequence"}
+                  for name in present}
+    common_axes = {"decoder_input_ids": {0: "batch", 1: "decoder_sequence"},
+                   "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"},
+                   "encoder_attention_mask": {0: "batch", 1: "encoder_sequence"},
+                   "logits": {0: "batch", 1: "decoder_sequence"}}
+    torch.onnx.export(
+        Decoder(model), (decoder_input_ids, encoder_hidden_states, attention_mask),
+        onnx_file(output_dir, ONNX_DECODER),
+        input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask"],
+        output_names=["logits"] + present,
+        dynamic_axes={**common_axes, **cache_axes},
+        opset_version=OPSET, **LEGACY_EXPORTER,
+    )
+
+    past = Decoder(model)(decoder_input_ids, encoder_hidden_states, attention_mask)[1:]
+    past_inputs = past_names(num_layers, "past_key_values")
+    self_present = past_names(num_layers, "present", attention=("decoder",))
+    torch.onnx.export(
+        DecoderWithPast(model), (decoder_input_ids[:, -1:], encoder_hidden_states, attention_mask, *past),
+        onnx_file(output_dir, ONNX_DECODER_WITH_PAST),
+        input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask"] + past_inputs,
+        output_names=["logits"] + self_present,
+        dynamic_axes={
+            **common_axes,
+            **{name: {0: "batch", 2: "past_sequence" if ".decoder." in name else "encoder_sequence"}
+               for name in past_inputs},
+            **{name: {0: "batch", 2: "past_sequence + 1"} for name in self_present},
+        },
+        opset_version=OPSET, **LEGACY_EXPORTER,
+    )
+
+    model.config.save_pretrained(output_dir)
+    model.generation_config.save_pretrained(output_dir)
+
+
+def quantize(output_dir):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    for name in ONNX_GRAPHS:
+        quantize_dynamic(
+            onnx_file(output_dir, name),
+            onnx_file(output_dir, name, quantized=True),
+            op_types_to_quantize=["MatMul"],
+            weight_type=QuantType.QInt8,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", default=os.environ.get("VERITAS_MODEL_PATH", DEFAULT_MODEL_PATH))
+    parser.add_argument("--output-dir", help="Defaults to <model-path>-onnx")
+    parser.add_argument("--quantize", action="store_true", help="Also write INT8 dynamic-quantized graphs")
+    args = parser.parse_args()
+    output_dir = args.output_dir or default_onnx_dir(args.model_path)
+
+    model = T5ForConditionalGeneration.from_pretrained(args.model_path)
+    model.eval()
+    with torch.no_grad():
+        export(model, output_dir)
+    print(f"Exported ONNX graphs to {output_dir}")
+
+    if args.quantize:
+        quantize(output_dir)
+        print(f"Wrote INT8 graphs to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
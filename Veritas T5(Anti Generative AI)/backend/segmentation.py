@@ -0,0 +1,96 @@
+"""
+VERITAS document segmentation
+Split long inputs into model-sized chunks and stitch the outputs back.
+
+The model is trained on sentence-length inputs and generates at most 96
+tokens, so a long document is split into paragraphs (blank lines), lines
+(bullets, list items) and packs of whole sentences of at most `max_words`
+words. Each chunk is sanitized on its own and the results are joined with
+the original paragraph and line layout. Bullet and number markers are kept
+out of the prompt and restored on output.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List
+
+DEFAULT_MAX_CHUNK_WORDS = 48
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_LIST_MARKER = re.compile(r"^\s*((?:[-*•]|\d+[.)])\s+)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@dataclass
+class DocumentLine:
+    marker: str  # bullet or number prefix, restored as is
+    chunks: List[str]
+
+
+@dataclass
+class Document:
+    paragraphs: List[List[DocumentLine]]
+
+    @property
+    def chunks(self) -> List[str]:
+        return [chunk for paragraph in self.paragraphs for line in paragraph for chunk in line.chunks]
+
+    def join(self, outputs: List[str]) -> str:
+        """Rebuild the document from one output per chunk, in `chunks` order."""
+        remaining = iter(outputs)
+        paragraphs = []
+        for paragraph in self.paragraphs:
+            lines = [line.marker + " ".join(next(remaining).strip() for _ in line.chunks) for line in paragraph]
+            paragraphs.append("\n".join(lines))
+        return "\n\n".join(paragraphs)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+def pack_sentences(sentences: List[str], max_words: int = DEFAULT_MAX_CHUNK_WORDS) -> List[str]:
+    """Group consecutive sentences into chunks of at most `max_words` words."""
+    chunks: List[str] = []
+    current: List[str] = []
+    count = 0
+
+    def flush():
+        nonlocal current, count
+        if current:
+            chunks.append(" ".join(current))
+        current, count = [], 0
+
+    for sentence in sentences:
+        words = sentence.split()
+        # A sentence longer than the budget is cut at word boundaries
+        while len(words) > max_words:
+            flush()
+            chunks.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        if not words:
+            continue
+        if count + len(words) > max_words:
+            flush()
+        current.append(" ".join(words))
+        count += len(words)
+    flush()
+    return chunks
+
+
+def split_document(text: str, max_words: int = DEFAULT_MAX_CHUNK_WORDS) -> Document:
+    """Split a document into paragraphs, lines and sentence chunks."""
+    if max_words < 1:
+        raise ValueError("max_words must be >= 1")
+    paragraphs = []
+    for block in _PARAGRAPH_BREAK.split(text.strip()):
+        lines = []
+        for raw_line in block.splitlines():
+            match = _LIST_MARKER.match(raw_line)
+            marker = match.group(1) if match else ""
+            chunks = pack_sentences(split_sentences(raw_line[match.end():] if match else raw_line), max_words)
+            if chunks:
+                lines.append(DocumentLine(marker=marker, chunks=chunks))
+        if lines:
+            paragraphs.append(lines)
+    return Document(paragraphs=paragraphs)
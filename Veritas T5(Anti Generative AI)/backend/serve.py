@@ -0,0 +1,181 @@
+"""
+VERITAS production launcher
+Pre-fork multi-worker server sharing one copy of the model weights.
+
+The parent process loads the model once (parameters memory-mapped from
+model.safetensors, see weights.py), binds the listening socket and forks
+`--workers` uvicorn workers that inherit the loaded model. The weight pages
+are shared, so another worker costs its activations and Python heap rather
+than another copy of the weights.
+
+Each worker gets `--threads` intra-op threads (cores / workers by default)
+and, with `--pin-cores`, its own set of cores, so workers don't oversubscribe
+the CPU. The parent restarts workers that exit and logs each worker's RSS,
+PSS and shared memory; `GET /metrics` reports the same for the worker that
+serves it.
+
+The onnx backends are loaded in each worker instead: ONNX Runtime sessions
+and their thread pools don't survive fork().
+
+Usage (from the backend directory):
+    python serve.py --workers 4 [--host 0.0.0.0] [--port 8000] [--threads 2] [--pin-cores]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+import torch
+import uvicorn
+
+import main as veritas
+from weights import process_memory
+
+# A worker that exits sooner than this after starting is not restarted right away
+RESTART_BACKOFF_SECONDS = 5.0
+
+
+def worker_cores(index: int, workers: int) -> List[int]:
+    """Disjoint slice of the available cores for one worker (all cores if there are fewer than workers)."""
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < workers:
+        return cores
+    per_worker = len(cores) // workers
+    return cores[index * per_worker:(index + 1) * per_worker]
+
+
+def run_worker(index: int, sock: socket.socket, args) -> None:
+    """Child process: pin threads (and cores) and serve the app on the shared socket."""
+    os.environ["VERITAS_WORKER"] = str(index)
+    if args.pin_cores:
+        os.sched_setaffinity(0, worker_cores(index, args.workers))
+    torch.set_num_threads(args.threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before the first inter-op parallel work
+        pass
+    config = uvicorn.Config(veritas.app, log_level=args.log_level, timeout_keep_alive=5)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def format_memory(memory: Dict[str, float]) -> str:
+    return " ".join(f"{name[:-3]}={value:.0f}MB" for name, value in memory.items())
+
+
+class Supervisor:
+    """Forks the workers, restarts the ones that exit and forwards shutdown signals."""
+
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers: Dict[int, int] = {}  # pid -> worker index
+        self.started: Dict[int, float] = {}  # worker index -> start time
+        self.stopping = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(index, self.sock, self.args)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = index
+        self.started[index] = time.monotonic()
+
+    def stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report_memory(self) -> None:
+        parent = process_memory()
+        print(f"📊 parent pid={os.getpid()} {format_memory(parent)}")
+        for pid, index in sorted(self.workers.items(), key=lambda item: item[1]):
+            print(f"📊 worker {index} pid={pid} {format_memory(process_memory(pid))}")
+        sys.stdout.flush()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.args.workers):
+            self.spawn(index)
+
+        next_report: Optional[float] = time.monotonic() + self.args.report_delay
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                index = self.workers.pop(pid)
+                if not self.stopping:
+                    print(f"⚠️ Worker {index} (pid {pid}) exited with status {status}, restarting")
+                    if time.monotonic() - self.started[index] < RESTART_BACKOFF_SECONDS:
+                        time.sleep(RESTART_BACKOFF_SECONDS)
+                    self.spawn(index)
+                continue
+
+            now = time.monotonic()
+            if next_report is not None and now >= next_report and not self.stopping:
+                self.report_memory()
+                next_report = now + self.args.report_interval if self.args.report_interval > 0 else None
+            time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("VERITAS_WORKERS", "1")))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("VERITAS_THREADS", "0")),
+                        help="Intra-op threads per worker (default: available cores / workers)")
+    parser.add_argument("--pin-cores", action="store_true", help="Give each worker its own set of cores")
+    parser.add_argument("--report-delay", type=float, default=10.0,
+                        help="Seconds after startup to log per-worker memory")
+    parser.add_argument("--report-interval", type=float, default=0.0,
+                        help="Log per-worker memory every this many seconds (0: once)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    cores = len(os.sched_getaffinity(0))
+    args.threads = args.threads or max(1, cores // args.workers)
+    print(f"🚀 {args.workers} worker(s) x {args.threads} thread(s) on {cores} core(s)")
+
+    # Workers are the unit of parallelism: no extra tokenizer threads, which also
+    # can't be used safely after the tokenizer has been used before fork()
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    # Load before forking so every worker shares the same weight pages
+    if veritas.MODEL_BACKEND == "torch":
+        veritas.load_weights()
+
+    sock = bind_socket(args.host, args.port)
+    Supervisor(sock, args).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+VERITAS weight loading
+Build the PyTorch model on top of a memory-mapped safetensors file.
+
+`from_pretrained` reads the checkpoint into freshly allocated memory, so every
+worker process holds its own copy of the weights. Here `model.safetensors`
+is mapped copy-on-write and each parameter is a view into the mapping: the
+weights live in the page cache, are read from disk on first use, and are
+shared by all processes that map the same file (including workers forked
+after loading). Inference never writes to the weights, so pages stay shared.
+"""
+
+import itertools
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Optional, Union
+
+import torch
+from transformers import GenerationConfig, T5Config, T5ForConditionalGeneration
+
+SAFETENSORS_FILE = "model.safetensors"
+
+_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def safetensors_path(model_path: str) -> Optional[str]:
+    path = os.path.join(model_path, SAFETENSORS_FILE)
+    return path if os.path.exists(path) else None
+
+
+def mmap_state_dict(path: str) -> Dict[str, torch.Tensor]:
+    """Map a safetensors file and return its tensors as views into the mapping (nothing is copied)."""
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+        # Copy-on-write: pages stay shared with the page cache unless a tensor is written to
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        if start == end:
+            state_dict[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + start)
+        state_dict[name] = tensor.view(info["shape"])
+    return state_dict
+
+
+def load_mmap_model(model_path: str) -> T5ForConditionalGeneration:
+    """Load the checkpoint with its parameters backed by the mapped `model.safetensors`."""
+    path = safetensors_path(model_path)
+    if path is None:
+        raise FileNotFoundError(f"{SAFETENSORS_FILE} not found in {model_path}")
+    config = T5Config.from_pretrained(model_path)
+    # Build on the meta device so no memory is allocated for the initial weights
+    with torch.device("meta"):
+        model = T5ForConditionalGeneration(config)
+    _, unexpected = model.load_state_dict(mmap_state_dict(path), strict=False, assign=True)
+    # Embeddings shared with `shared.weight` are saved once: tie them to the loaded tensor
+    model.tie_weights()
+    missing = [name for name, tensor in itertools.chain(model.named_parameters(), model.named_buffers())
+               if tensor.is_meta]
+    if missing or unexpected:
+        raise ValueError(f"Checkpoint does not match the model: missing {missing}, unexpected {unexpected}")
+    if os.path.exists(os.path.join(model_path, "generation_config.json")):
+        model.generation_config = GenerationConfig.from_pretrained(model_path)
+    model.eval()
+    return model
+
+
+def process_memory(pid: Union[int, str] = "self") -> Dict[str, float]:
+    """
+    Memory of a process in MB: RSS, plus PSS, shared and private pages on Linux.
+
+    RSS counts shared weight pages in every worker; PSS splits them between the
+    processes mapping them, so the PSS of all workers adds up to real usage.
+    """
+    fields = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb",
+              "Private_Clean": "private_mb", "Private_Dirty": "private_mb"}
+    memory: Dict[str, float] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    name = fields[key]
+                    memory[name] = memory.get(name, 0.0) + int(value.split()[0]) / 1024
+    except OSError:
+        if pid == "self":
+            import resource  # peak RSS only, where /proc is unavailable
+            memory["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {name: round(value, 1) for name, value in memory.items()}